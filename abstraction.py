@@ -0,0 +1,197 @@
+from hand_ranges import RANGE_CODES_2, RANGE_INDEX_2
+from hand_strength import STREETS
+from isomorphism import CODE_PERMUTATIONS, board_keys, canonical_board, hand_permutations
+from math import comb
+import numpy as np
+import os
+
+# Bucket of hands that can't be bucketed: they share a card with the board,
+# or their board wasn't computed in the hand strength tables
+NO_BUCKET = np.iinfo(np.uint16).max
+DEFAULT_BUCKETS = { 'flop': 200, 'turn': 200, 'river': 200 }
+# Points k-means is fitted on, every point is then assigned to its nearest center
+DEFAULT_SAMPLE_SIZE = 200000
+# Boards whose hands are assigned to buckets at once
+BOARD_CHUNK = 256
+
+def nearest(points, centers):
+    """
+    Index of the nearest center (squared euclidean distance) of each point.
+    """
+    labels = np.empty(len(points), np.intp)
+    # |x - c|^2 = |x|^2 - 2 x.c + |c|^2, and |x|^2 doesn't change the argmin
+    center_norms = (centers * centers).sum(axis=1)
+    for start in range(0, len(points), 1 << 16):
+        chunk = points[start:start + (1 << 16)]
+        labels[start:start + len(chunk)] = np.argmin(center_norms - 2 * chunk.dot(centers.T), axis=1)
+    return labels
+
+def kmeans(points, k, iterations=50, seed=0):
+    """
+    Lloyd's k-means with k-means++ seeding. Returns the (k, d) centers and
+    the label of each point.
+    """
+    points = np.asarray(points, np.float64)
+    rng = np.random.RandomState(seed)
+    k = min(k, len(points))
+    centers = np.empty((k, points.shape[1]))
+    centers[0] = points[rng.randint(len(points))]
+    distances = ((points - centers[0]) ** 2).sum(axis=1)
+    for i in range(1, k):
+        # Seed each center with probability proportional to the squared distance to the nearest one so far
+        total = distances.sum()
+        index = rng.choice(len(points), p=distances / total) if total > 0 else rng.randint(len(points))
+        centers[i] = points[index]
+        distances = np.minimum(distances, ((points - centers[i]) ** 2).sum(axis=1))
+    for _ in range(iterations):
+        labels = nearest(points, centers)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, points)
+        # Centers left without points stay where they are
+        moved = centers.copy()
+        moved[counts > 0] = sums[counts > 0] / counts[counts > 0, None]
+        if np.allclose(moved, centers):
+            break
+        centers = moved
+    return centers, nearest(points, centers)
+
+def live_hands(boards):
+    """
+    (len(boards), 1326) mask of the hands that share no card with each board.
+    """
+    dealt = np.zeros((len(boards), 52), np.bool_)
+    dealt[np.arange(len(boards))[:, None], boards] = True
+    return ~(dealt[:, RANGE_CODES_2[:, 0]] | dealt[:, RANGE_CODES_2[:, 1]])
+
+def street_features(tables, rows):
+    """
+    Clustering features and E[HS] of every hand on the boards in rows.
+    Cumulative histograms make euclidean distance close to the earth
+    mover's distance between histograms. The river has E[HS] alone.
+    """
+    ehs = np.asarray(tables['ehs'][rows], np.float64)
+    if 'histogram' not in tables:
+        return ehs[:, :, None], ehs
+    histogram = np.asarray(tables['histogram'][rows], np.float64)
+    cumulative = np.cumsum(histogram, axis=2) / np.maximum(histogram.sum(axis=2, keepdims=True), 1)
+    return cumulative, ehs
+
+def preflop_buckets():
+    """
+    The 169 strategically different hole cards: hands that a suit
+    permutation sends to one another share a bucket.
+    """
+    canonical = hand_permutations().min(axis=0)
+    return np.unique(canonical, return_inverse=True)[1].astype(np.uint16)
+
+class CardAbstraction(object):
+    """
+    Maps hole cards on a board to a bucket of strategically similar hands,
+    with one precomputed table per street read in O(1). Tables are indexed
+    like HandStrengthTables, by canonical board then range index (see
+    hand_ranges.cards_to_range_index) of the suit permuted hole cards.
+    """
+    def __init__(self, buckets):
+        # buckets['preflop'] is indexed by range index alone
+        self.buckets = buckets
+        self.keys = {}
+        for street in STREETS:
+            if street in buckets:
+                self.keys[street] = board_keys(buckets[street + '_boards'])
+
+    def __deepcopy__(self, memo):
+        # Trees deep-copy their rules, whose infoset_format is bound to the
+        # abstraction, and they all read the same (memory-mapped) tables
+        return self
+
+    def board_buckets(self, board):
+        """
+        Bucket of every range index on board (Cards), e.g. to sum CFR reach
+        probabilities by bucket with np.bincount.
+        """
+        if len(board) == 0:
+            return self.buckets['preflop']
+        street, row, permutation = self.board_row(board)
+        # Hand i on board is hand_permutations()[permutation][i] on the canonical board
+        return self.buckets[street][row][hand_permutations()[permutation]]
+
+    def board_row(self, board):
+        street = { size: name for name, size in STREETS.items() }[len(board)]
+        key, permutation = canonical_board(board)
+        row = int(np.searchsorted(self.keys[street], board_keys([key])[0]))
+        return street, row, permutation
+
+    def bucket(self, holecards, board):
+        if len(board) == 0:
+            return int(self.buckets['preflop'][RANGE_INDEX_2[holecards[0].to_code(), holecards[1].to_code()]])
+        street, row, permutation = self.board_row(board)
+        codes = CODE_PERMUTATIONS[permutation]
+        bucket = int(self.buckets[street][row, RANGE_INDEX_2[codes[holecards[0].to_code()], codes[holecards[1].to_code()]]])
+        if bucket == NO_BUCKET:
+            raise KeyError("No {0} bucket for {1} on {2}".format(street, holecards, board))
+        return bucket
+
+    def infoset_format(self, player, holecards, board, bet_history):
+        """
+        GameRules.infoset_format keyed on the bucket of every street so far
+        instead of the exact cards, so hands in one bucket share regrets
+        and strategies.
+        """
+        buckets = [self.bucket(holecards, board[:size]) for size in [0] + sorted(STREETS.values()) if size <= len(board)]
+        return "{0}:{1}:".format(".".join(str(b) for b in buckets), bet_history)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, table in self.buckets.items():
+            np.save(os.path.join(directory, 'buckets_{0}.npy'.format(name)), table)
+
+    def load(directory):
+        """
+        Memory-map the bucket tables that save wrote.
+        """
+        buckets = {}
+        for name in os.listdir(directory):
+            if name.startswith('buckets_') and name.endswith('.npy'):
+                buckets[name[len('buckets_'):-len('.npy')]] = np.load(os.path.join(directory, name), mmap_mode='r')
+        return CardAbstraction(buckets)
+    load = staticmethod(load)
+
+    def build(tables, bucket_counts=DEFAULT_BUCKETS, sample_size=DEFAULT_SAMPLE_SIZE, seed=0):
+        """
+        Cluster the hands of each street in bucket_counts with k-means on
+        the features of HandStrengthTables tables (a directory written by
+        hand_strength.precompute). Buckets are numbered from the weakest
+        center (lowest mean E[HS]) up. Preflop uses the 169 lossless
+        buckets of preflop_buckets.
+        """
+        buckets = { 'preflop': preflop_buckets() }
+        rng = np.random.RandomState(seed)
+        for street, k in bucket_counts.items():
+            street_tables = tables.load(street)
+            boards = street_tables['boards']
+            done = np.flatnonzero(street_tables['done'])
+
+            # Fit on a sample of the live hands of enough computed boards
+            rows = np.sort(rng.choice(done, min(len(done), -(-sample_size // comb(52 - STREETS[street], 2))), replace=False))
+            features, ehs = street_features(street_tables, rows)
+            live = live_hands(boards[rows])
+            points = features[live]
+            sample = rng.choice(len(points), min(len(points), sample_size), replace=False)
+            centers, labels = kmeans(points[sample], k, seed=seed)
+            order = np.argsort(np.bincount(labels, ehs[live][sample], len(centers)) / np.maximum(np.bincount(labels, minlength=len(centers)), 1))
+            rank = np.empty(len(centers), np.uint16)
+            rank[order] = np.arange(len(centers))
+
+            table = np.full((len(boards), len(RANGE_CODES_2)), NO_BUCKET, np.uint16)
+            for start in range(0, len(done), BOARD_CHUNK):
+                rows = done[start:start + BOARD_CHUNK]
+                features, _ = street_features(street_tables, rows)
+                live = live_hands(boards[rows])
+                chunk = table[rows]
+                chunk[live] = rank[nearest(features[live], centers)]
+                table[rows] = chunk
+            buckets[street] = table
+            buckets[street + '_boards'] = np.asarray(boards)
+        return CardAbstraction(buckets)
+    build = staticmethod(build)
@@ -0,0 +1,36 @@
+import sys
+import os
+import time
+sys.path.insert(0,os.path.realpath('.'))
+from hand_evaluator import *
+import random
+import numpy as np
+
+# Ranks every hole card pair on many boards, the way showdowns do, with the
+# batch evaluators on whole hands and with BoardState built once per board.
+
+BOARDS = 1000
+
+def deals(board_size):
+    deals = []
+    for _ in range(BOARDS):
+        board = random.sample(range(52), board_size)
+        remaining = np.setdiff1d(np.arange(52), board)
+        first, second = np.triu_indices(len(remaining), 1)
+        deals.append((board, np.column_stack([remaining[first], remaining[second]])))
+    return deals
+
+def timed(fn):
+    start = time.time()
+    result = fn()
+    return result, time.time() - start
+
+print('Benchmarking showdown ranking per board ({0} boards)'.format(BOARDS))
+print('{0:<8} {1:>14} {2:>14} {3:>8}'.format('board', 'whole hands s', 'BoardState s', 'speedup'))
+random.seed(0)
+for board_size in (3, 4, 5):
+    boards = deals(board_size)
+    expected, whole = timed(lambda: [HandEvaluator.evaluate_rank_batch(np.column_stack([holes, np.tile(board, (len(holes), 1))])) for board, holes in boards])
+    actual, incremental = timed(lambda: [BoardState(board).complete_rank_batch(holes) for board, holes in boards])
+    assert(all(np.array_equal(e, a) for e, a in zip(expected, actual)))
+    print('{0:<8} {1:>14.4f} {2:>14.4f} {3:>7.1f}x'.format(board_size, whole, incremental, whole / incremental))
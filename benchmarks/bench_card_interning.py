@@ -0,0 +1,33 @@
+import sys
+import os
+import time
+import tracemalloc
+sys.path.insert(0,os.path.realpath('.'))
+from pokergames import *
+import numpy as np
+
+# Time and memory of building the Leduc and Royal trees. The GameTree
+# builders (leduc_gametree, royal_gametree) stop at GameTree.showdown, so
+# the public trees the solvers use are measured.
+
+print('{0:<20} {1:>10} {2:>14} {3:>10}'.format('tree', 'seconds', 'peak MB', 'Cards'))
+for name, build in [('leduc_publictree', leduc_publictree), ('royal_publictree', royal_publictree)]:
+    times = []
+    for _ in range(3):
+        start = time.time()
+        build()
+        times.append(time.time() - start)
+    tracemalloc.start()
+    tree = build()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # Distinct Card objects the tree holds on to
+    cards = set()
+    stack = [tree.root]
+    while stack:
+        node = stack.pop()
+        for hc in node.holecards:
+            cards.update(id(card) for hands in hc for card in (hands if isinstance(hands, tuple) else (hands,)))
+        cards.update(id(card) for card in node.board)
+        stack.extend(getattr(node, 'children', None) or [])
+    print('{0:<20} {1:>10.3f} {2:>14.1f} {3:>10}'.format(name, min(times), peak / 1e6, len(cards)))
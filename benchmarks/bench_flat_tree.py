@@ -0,0 +1,33 @@
+import sys
+import os
+import time
+import tracemalloc
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import leduc_rules, royal_rules
+import gc
+
+# Memory held by a PublicTree built as Node objects and as a flattree.FlatTree.
+# Each tree is built once first so imports and module caches aren't counted.
+# The memory of a tree is what its build leaves allocated, which includes
+# the BoardHands and ShowdownRankings both kinds of tree keep.
+
+def measure(rules, flat):
+    PublicTree(rules).build(flat=flat)
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    tree = PublicTree(rules)
+    tree.build(flat=flat)
+    seconds = time.time() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tree, seconds, current, peak
+
+print('{0:<8} {1:>8} {2:>12} {3:>12} {4:>12} {5:>12} {6:>8}'.format('game', 'nodes', 'objects MB', 'flat MB', 'objects s', 'flat s', 'ratio'))
+for name, rules in [('Leduc', leduc_rules()), ('Royal', royal_rules())]:
+    objects, object_seconds, object_bytes, _ = measure(rules, False)
+    flat, flat_seconds, flat_bytes, _ = measure(rules, True)
+    print('{0:<8} {1:>8} {2:>12.2f} {3:>12.2f} {4:>12.2f} {5:>12.2f} {6:>7.1f}x'.format(name, len(flat.flat), object_bytes / 1e6, flat_bytes / 1e6,
+        object_seconds, flat_seconds, object_bytes / float(flat_bytes)))
@@ -0,0 +1,58 @@
+import sys
+import os
+import time
+sys.path.insert(0,os.path.realpath('.'))
+from hand_ranges import *
+from pokergames import holdem_rules, royal_rules
+import numpy as np
+
+# The scans hand_ranges used before combinadic indexing, without their lru_cache
+
+def scan_cards_to_range_index_2(cards):
+    c_indicies = [card.to_code() for card in sort_cards(cards)]
+    count_so_far = 0
+    for i in range(0, 52):
+        for j in range(i+1, 52):
+            if c_indicies[1] == i and c_indicies[0] == j or c_indicies[0] == i and c_indicies[1] == j:
+                return count_so_far
+            count_so_far += 1
+    assert(False)
+
+def scan_range_index_to_cards_2(index):
+    count_so_far = 0
+    for i in range(0, 52):
+        for j in range(i + 1, 52):
+            if count_so_far == index:
+                return (Card.from_code(i), Card.from_code(j))
+            count_so_far += 1
+    assert(False)
+
+def scan_cards_to_range_index_1(rules, cards):
+    for i in range(0, len(rules.deck)):
+        if rules.deck[i] == cards[0]:
+            return i
+    assert(False)
+
+def rate(name, count, fn):
+    start = time.time()
+    fn()
+    elapsed = time.time() - start
+    print('{0:<44} {1:>14,.0f} hands/s'.format(name, count / elapsed))
+
+holdem = holdem_rules(2)
+royal = royal_rules()
+hands = [range_index_to_cards_2(i) for i in range(1326)]
+singles = [(card,) for card in royal.deck] * 200
+codes = np.asarray(RANGE_CODES_2)[np.random.RandomState(0).randint(1326, size=1000000)]
+
+print('Benchmarking range indexing over every 2-card hand')
+rate('scan cards_to_range_index_2', len(hands), lambda: [scan_cards_to_range_index_2(hc) for hc in hands])
+rate('combinadic index', len(hands), lambda: [hand_indexer(2).index([c.to_code() for c in hc]) for hc in hands])
+rate('cards_to_range_index', len(hands), lambda: [cards_to_range_index(holdem, hc) for hc in hands])
+rate('scan range_index_to_cards_2', len(hands), lambda: [scan_range_index_to_cards_2(i) for i in range(1326)])
+rate('combinadic cards', len(hands), lambda: [hand_indexer(2).cards(i) for i in range(1326)])
+rate('scan cards_to_range_index_1 (Royal)', len(singles), lambda: [scan_cards_to_range_index_1(royal, hc) for hc in singles])
+royal_indexer = range_indexer(royal)
+rate('combinadic index (Royal)', len(singles), lambda: [royal_indexer.index([hc[0].to_code()]) for hc in singles])
+rate('range_indexes (vectorized)', len(codes), lambda: range_indexes(holdem, codes))
+rate('range_codes (vectorized)', len(codes), lambda: range_codes(holdem, np.arange(len(codes)) % 1326))
@@ -0,0 +1,44 @@
+import sys
+import os
+import time
+sys.path.insert(0,os.path.realpath('.'))
+from hand_evaluator import *
+from hand_ranks import HandRanks
+from card import Card
+import random
+import numpy as np
+
+def throughput(name, count, fn):
+    start = time.time()
+    result = fn()
+    elapsed = time.time() - start
+    print('{0:<40} {1:>12,.0f} hands/s'.format(name, count / elapsed))
+    return result
+
+print('Benchmarking HandRanks state table against HandEvaluator')
+
+if not os.path.exists(HandRanks.path):
+    print('Generating {0}'.format(HandRanks.path))
+    HandRanks.generate()
+start = time.time()
+HandRanks.load()
+print('Loaded table in {0:.4f}s'.format(time.time() - start))
+
+random.seed(0)
+batch_size = 500000
+scalar_size = 20000
+hands = np.array([random.sample(range(52), 7) for _ in range(batch_size)], np.uint8)
+card_hands = [[Card.from_code(c) for c in hand] for hand in hands[:scalar_size]]
+
+expected = throughput('HandEvaluator.Seven.evaluate_rank', scalar_size, lambda: [HandEvaluator.Seven.evaluate_rank(h) for h in card_hands])
+actual = throughput('HandRanks.evaluate_rank', scalar_size, lambda: [HandRanks.evaluate_rank(h) for h in card_hands])
+assert(expected == actual)
+
+expected = throughput('HandEvaluator.Seven.evaluate_rank_batch', batch_size, lambda: HandEvaluator.Seven.evaluate_rank_batch(hands))
+actual = throughput('HandRanks.evaluate_rank_batch', batch_size, lambda: HandRanks.evaluate_rank_batch(hands))
+assert(np.array_equal(expected, actual))
+
+five_hands = hands[:, :5]
+expected = throughput('HandEvaluator.Five.evaluate_rank_batch', batch_size, lambda: HandEvaluator.Five.evaluate_rank_batch(five_hands))
+actual = throughput('HandRanks.evaluate_rank_batch (5 cards)', batch_size, lambda: HandRanks.evaluate_rank_batch(five_hands))
+assert(np.array_equal(expected, actual))
@@ -0,0 +1,60 @@
+import sys
+import os
+import time
+import random
+import tracemalloc
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import royal_rules, holdem_rules
+import gc
+
+# Memory and time of sampling random paths through lazy trees, the way
+# Monte Carlo CFR walks a tree. Royal compares against building the whole
+# tree. The Hold'em public tree is far too big to build, so only the lazy
+# tree is walked, down to the river deal, so that ranking showdown boards
+# doesn't count against the tree.
+
+WALKS = 1000
+HOLDEM_WALKS = 200
+
+def walk(tree, walks, stop=lambda node: False):
+    random.seed(0)
+    for _ in range(walks):
+        node = tree.root
+        while not isinstance(node, TerminalNode) and not stop(node):
+            node = random.choice(node.children)
+
+def measure(build, walks, stop=lambda node: False):
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    tree = build()
+    walk(tree, walks, stop)
+    seconds = time.time() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tree, seconds, current, peak
+
+def public_tree(rules, **kwargs):
+    tree = PublicTree(rules)
+    tree.build(**kwargs)
+    return tree
+
+# Imports and module caches aren't counted
+walk(public_tree(royal_rules(), lazy=True), 1)
+
+print('{0:<8} {1:<22} {2:>8} {3:>10} {4:>10} {5:>10} {6:>10}'.format('game', 'tree', 'walks', 'seconds', 'MB', 'peak MB', 'built'))
+for name, kwargs in [('objects', {}), ('lazy', { 'lazy': True }), ('lazy, 1 MB budget', { 'lazy': True, 'max_bytes': 1 << 20 }),
+        ('lazy, 128 KB budget', { 'lazy': True, 'max_bytes': 128 << 10 })]:
+    tree, seconds, current, peak = measure(lambda: public_tree(royal_rules(), **kwargs), WALKS)
+    built = tree.lazy.stats()['misses'] if tree.lazy else ''
+    print('{0:<8} {1:<22} {2:>8} {3:>10.2f} {4:>10.2f} {5:>10.2f} {6:>10}'.format('Royal', name, WALKS, seconds, current / 1e6, peak / 1e6, built))
+
+rules = holdem_rules(2)
+rules.suit_isomorphism = True
+river = lambda node: len(node.board) == 5
+for max_bytes in (32 << 20, 8 << 20):
+    tree, seconds, current, peak = measure(lambda: public_tree(rules, lazy=True, max_bytes=max_bytes), HOLDEM_WALKS, river)
+    print('{0:<8} {1:<22} {2:>8} {3:>10.2f} {4:>10.2f} {5:>10.2f} {6:>10}'.format("Hold'em", 'lazy, {0} MB budget'.format(max_bytes >> 20),
+        HOLDEM_WALKS, seconds, current / 1e6, peak / 1e6, tree.lazy.stats()['misses']))
@@ -0,0 +1,38 @@
+import sys
+import os
+import time
+sys.path.insert(0,os.path.realpath('.'))
+from hand_evaluator import *
+import random
+import numpy as np
+
+# Hands ranked per second on random boards by the Omaha batch evaluator
+# (60 five-card hands per hand on the river), next to the Hold'em batch
+# paths: BoardState for the same board and Seven on whole hands.
+
+BOARDS = 200
+HANDS = 1000
+
+def timed(fn):
+    start = time.time()
+    fn()
+    return time.time() - start
+
+print('Benchmarking batch hand ranking ({0} boards x {1} hands)'.format(BOARDS, HANDS))
+print('{0:<8} {1:>16} {2:>16} {3:>16}'.format('board', 'Omaha hands/s', 'BoardState h/s', 'Seven h/s'))
+random.seed(0)
+for board_size in (3, 4, 5):
+    deals = []
+    for _ in range(BOARDS):
+        board = random.sample(range(52), board_size)
+        remaining = np.setdiff1d(np.arange(52), board)
+        holes = np.array([random.sample(list(remaining), 4) for _ in range(HANDS)])
+        deals.append((board, holes))
+    omaha = timed(lambda: [HandEvaluator.Omaha.evaluate_rank_batch(holes, board) for board, holes in deals])
+    holdem = timed(lambda: [HandEvaluator.evaluate_board_batch(board, holes[:, :2]) for board, holes in deals])
+    line = '{0:<8} {1:>16.0f} {2:>16.0f}'.format(board_size, BOARDS * HANDS / omaha, BOARDS * HANDS / holdem)
+    if board_size == 5:
+        sevens = [np.column_stack([holes[:, :2], np.tile(board, (len(holes), 1))]) for board, holes in deals]
+        seven = timed(lambda: [HandEvaluator.Seven.evaluate_rank_batch(hands) for hands in sevens])
+        line += ' {0:>16.0f}'.format(BOARDS * HANDS / seven)
+    print(line)
@@ -0,0 +1,40 @@
+import sys
+import os
+import time
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import royal_rules
+
+# Wall time to build a flat PublicTree in one process and with the deals of
+# the first board cards farmed out to 1, 2, 4 and 8 worker processes. The
+# workers can only run at once on as many CPUs as there are, see the
+# count printed first.
+
+RUNS = 3
+PROCESSES = [1, 2, 4, 8]
+
+def royal_bets_rules(maxbets):
+    # Royal with more raises a round, for a bigger tree
+    rules = royal_rules()
+    for r in rules.roundinfo:
+        r.maxbets = [maxbets] * rules.players
+    return rules
+
+def measure(rules, processes):
+    best = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        tree = PublicTree(rules)
+        tree.build(flat=True, processes=processes)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return tree, best
+
+print('CPUs: {0}'.format(len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()))
+print('{0:<16} {1:>8} {2:>10} {3:>10} {4:>8}'.format('game', 'nodes', 'processes', 'seconds', 'speedup'))
+for name, rules in [('Royal', royal_rules()), ('Royal, 4 bets', royal_bets_rules(4))]:
+    tree, serial = measure(rules, None)
+    print('{0:<16} {1:>8} {2:>10} {3:>10.2f} {4:>7.2f}x'.format(name, len(tree.flat), '-', serial, 1.0))
+    for processes in PROCESSES:
+        _, seconds = measure(rules, processes)
+        print('{0:<16} {1:>8} {2:>10} {3:>10.2f} {4:>7.2f}x'.format(name, len(tree.flat), processes, seconds, serial / seconds))
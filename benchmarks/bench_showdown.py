@@ -0,0 +1,72 @@
+import sys
+import os
+import time
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import holdem_rules
+from pokercfr import CounterfactualRegretMinimizer
+from showdown import BoardHands, ShowdownRanking, matchup_payoffs
+from hand_ranges import RANGE_CODES_2
+import random
+import numpy as np
+
+# One 2 card showdown terminal and one fold terminal on a river board, every
+# hand still possible, with the matchup loop over TerminalNode.payoffs that
+# cfr_terminal_node used and with the showdown.py kernels.
+
+random.seed(0)
+board = tuple(Card.from_code(c) for c in random.sample(range(52), 5))
+hands = [tuple(Card.from_code(c) for c in codes) for codes in RANGE_CODES_2 if not overlap([Card.from_code(c) for c in codes], board)]
+# Higher scores win, like handeval
+scores = np.zeros(len(RANGE_CODES_2))
+live = ~np.isin(RANGE_CODES_2, [c.to_code() for c in board]).any(axis=1)
+scores[live] = -HandEvaluator.evaluate_board_batch([c.to_code() for c in board], RANGE_CODES_2[live])
+committed = [8, 8]
+
+rules = holdem_rules(2)
+start = time.time()
+ranking = ShowdownRanking(None, hands, scores)
+ranking_build = time.time() - start
+start = time.time()
+payoffs = matchup_payoffs(ranking, [hands, hands], [True, True], committed)
+dict_build = time.time() - start
+# The matchup loop reads the stored dict, the kernel the ranking
+matchup_terminal = TerminalNode(None, committed, [hands, hands], board, [], '', payoffs, [True, True])
+terminal = TerminalNode(None, committed, [hands, hands], board, [], '', None, [True, True], ranking)
+
+# Only the terminal node methods, without building the whole Hold'em tree
+cfr = CounterfactualRegretMinimizer.__new__(CounterfactualRegretMinimizer)
+cfr.rules = rules
+reachprobs = np.random.RandomState(0).rand(2, len(RANGE_CODES_2))
+
+start = time.time()
+matchup = cfr.cfr_matchup_terminal_node(matchup_terminal, reachprobs)
+matchup_time = time.time() - start
+runs = 100
+start = time.time()
+for _ in range(runs):
+    vectorized = cfr.cfr_terminal_node(terminal, reachprobs)
+vectorized_time = (time.time() - start) / runs
+assert(np.allclose(matchup, vectorized))
+
+# The same hands after player 1 folds
+fold = TerminalNode(None, committed, [hands, hands], board, [], '', None, [True, False], BoardHands(None, hands))
+fold_matchup_terminal = TerminalNode(None, committed, [hands, hands], board, [], '', fold.payoffs, [True, False])
+start = time.time()
+fold_matchup = cfr.cfr_matchup_terminal_node(fold_matchup_terminal, reachprobs)
+fold_matchup_time = time.time() - start
+start = time.time()
+for _ in range(runs):
+    fold_vectorized = cfr.cfr_terminal_node(fold, reachprobs)
+fold_vectorized_time = (time.time() - start) / runs
+assert(np.allclose(fold_matchup, fold_vectorized))
+
+print('Benchmarking a river showdown terminal, {0} hands, {1} matchups'.format(len(hands), len(payoffs)))
+print('{0:<34} {1:>12}'.format('', 'seconds'))
+print('{0:<34} {1:>12.4f}'.format('build matchup payoff dict', dict_build))
+print('{0:<34} {1:>12.4f}'.format('build ShowdownRanking', ranking_build))
+print('{0:<34} {1:>12.4f}'.format('cfr_matchup_terminal_node', matchup_time))
+print('{0:<34} {1:>12.6f}'.format('cfr_terminal_node (ranking)', vectorized_time))
+print('{0:<34} {1:>12.4f}'.format('fold cfr_matchup_terminal_node', fold_matchup_time))
+print('{0:<34} {1:>12.6f}'.format('fold cfr_terminal_node', fold_vectorized_time))
+print('showdown speedup {0:.0f}x, fold speedup {1:.0f}x'.format(matchup_time / vectorized_time, fold_matchup_time / fold_vectorized_time))
@@ -0,0 +1,76 @@
+import sys
+import os
+import subprocess
+import tempfile
+sys.path.insert(0,os.path.realpath('.'))
+from lookup_tables import LookupTables, SPARSE_KEY_SHIFT, SPARSE_VALUE_MASK
+import numpy as np
+
+# Compares process startup with lazily memory-mapped lookup tables against
+# the old lookup_tables.py, a module of Python literals, which is rebuilt
+# here from the same tables so both sides hold identical data.
+
+RUNS = 5
+# VmHWM rather than ru_maxrss, which Linux carries over from the parent across fork and exec
+MEASURE = '''
+import time
+start = time.perf_counter()
+{0}
+elapsed = time.perf_counter() - start
+rss = [line.split()[1] for line in open('/proc/self/status') if line.startswith('VmHWM')][0]
+print(elapsed, rss)
+'''
+
+def measure(code, path, flags=()):
+    """
+    Best wall time and peak RSS (KB) of running code in a fresh interpreter.
+    """
+    results = []
+    for _ in range(RUNS):
+        env = dict(os.environ, PYTHONPATH=path)
+        output = subprocess.check_output([sys.executable] + list(flags) + ['-c', MEASURE.format(code)], env=env, cwd=path)
+        elapsed, rss = output.decode().split()
+        results.append((float(elapsed), int(rss)))
+    return min(results)
+
+def sparse_dict(table):
+    return {int(entry) >> SPARSE_KEY_SHIFT: int(entry) & SPARSE_VALUE_MASK for entry in table}
+
+def legacy_module():
+    lines = ['class LookupTables:']
+    for cls in (LookupTables.Five, LookupTables.Six, LookupTables.Seven):
+        lines.append('    class {0}:'.format(cls.__name__))
+        for name in sorted(os.listdir(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'tables'))):
+            if not name.startswith(cls.prefix + '_') or name == 'hand_ranks.npy':
+                continue
+            table = getattr(cls, name[len(cls.prefix) + 1:-len('.npy')])
+            if table.dtype == np.int64 and 'card_to_binary' not in name:
+                value = sparse_dict(table)
+            else:
+                value = table.tolist()
+            lines.append('        {0} = {1!r}'.format(name[len(cls.prefix) + 1:-len('.npy')], value))
+    return '\n'.join(lines) + '\n'
+
+print('Benchmarking process startup ({0} runs each, best of)'.format(RUNS))
+
+repo = os.path.realpath('.')
+legacy = tempfile.mkdtemp()
+legacy_source_only = tempfile.mkdtemp()
+for path in (legacy, legacy_source_only):
+    with open(os.path.join(path, 'lookup_tables.py'), 'w') as f:
+        f.write(legacy_module())
+# Compile once so the cached .pyc case matches a normal install
+measure('import lookup_tables', legacy)
+
+cases = [
+    ('legacy literal lookup_tables (no .pyc)', 'import lookup_tables', legacy_source_only, ['-B']),
+    ('legacy literal lookup_tables (.pyc)', 'import lookup_tables', legacy, []),
+    ('import lookup_tables', 'import lookup_tables', repo, []),
+    ('import pokergames', 'import pokergames', repo, []),
+    ('import pokergames + Seven.evaluate_rank', 'import pokergames\nfrom card import Card\npokergames.HandEvaluator.Seven.evaluate_rank([Card.from_code(c) for c in range(0, 28, 4)])', repo, []),
+    ('python baseline', 'pass', repo, []),
+]
+print('{0:<45} {1:>10} {2:>12}'.format('', 'seconds', 'max RSS KB'))
+for name, code, path, flags in cases:
+    elapsed, rss = measure(code, path, flags)
+    print('{0:<45} {1:>10.4f} {2:>12,}'.format(name, elapsed, rss))
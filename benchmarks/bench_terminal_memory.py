@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import leduc_rules, royal_rules
+import numpy as np
+
+# Bytes per PublicTree terminal, before with a payoff per holecard matchup
+# and a copy of the holecards and deck in every terminal, and now with the
+# BoardHands or ShowdownRanking and the cards shared by the terminals.
+
+def deep_size(obj, seen):
+    # Objects in seen are already counted, parents and children are left out
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, np.ndarray):
+        return size if obj.base is None else size + deep_size(obj.base, seen)
+    if isinstance(obj, dict):
+        return size + sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return size + sum(deep_size(x, seen) for x in obj)
+    if hasattr(obj, '__dict__'):
+        return size + deep_size({ k: v for k, v in vars(obj).items() if k not in ('parent', 'children') }, seen)
+    return size
+
+def terminals(node):
+    if type(node) is TerminalNode:
+        yield node
+        return
+    for child in node.children:
+        yield from terminals(child)
+
+print('{0:<8} {1:>10} {2:>16} {3:>16} {4:>8}'.format('game', 'terminals', 'bytes before', 'bytes now', 'ratio'))
+for name, rules in [('Leduc', leduc_rules()), ('Royal', royal_rules())]:
+    tree = PublicTree(rules)
+    tree.build()
+    nodes = list(terminals(tree.root))
+    seen = set()
+    now = sum(deep_size(t, seen) for t in nodes)
+    before = 0
+    for t in nodes:
+        # Without hands, a terminal copies its cards and stores the matchup payoffs
+        old = TerminalNode(None, t.committed, t.holecards, t.board, t.deck, t.bet_history, t.payoffs, t.players_in)
+        before += deep_size(old, set())
+    print('{0:<8} {1:>10} {2:>16.0f} {3:>16.0f} {4:>7.1f}x'.format(name, len(nodes), before / float(len(nodes)), now / float(len(nodes)), before / float(now)))
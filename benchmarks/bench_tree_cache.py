@@ -0,0 +1,44 @@
+import sys
+import os
+import subprocess
+import tempfile
+sys.path.insert(0,os.path.realpath('.'))
+
+# Time for a fresh process to get a built PublicTree: building it as Node
+# objects, building it flat, and loading it from a tree_directory, where
+# the first process to build it saved it.
+
+RUNS = 3
+MEASURE = '''
+import time
+import pokergames
+from pokertrees import PublicTree
+rules = pokergames.{0}_rules()
+rules.tree_directory = {1!r}
+start = time.perf_counter()
+tree = PublicTree(rules)
+tree.build(flat={2})
+elapsed = time.perf_counter() - start
+rss = [line.split()[1] for line in open('/proc/self/status') if line.startswith('VmHWM')][0]
+print(elapsed, rss)
+'''
+
+def measure(game, directory, flat):
+    """
+    Best build time and peak RSS (KB) in a fresh interpreter.
+    """
+    results = []
+    for _ in range(RUNS):
+        output = subprocess.check_output([sys.executable, '-c', MEASURE.format(game, directory, flat)], cwd=os.path.realpath('.'))
+        elapsed, rss = output.decode().split()
+        results.append((float(elapsed), int(rss)))
+    return min(results)
+
+directory = tempfile.mkdtemp()
+print('{0:<8} {1:<20} {2:>10} {3:>12}'.format('game', '', 'seconds', 'max RSS KB'))
+for game in ('leduc', 'royal'):
+    # The first run saves the tree, the others load it
+    measure(game, directory, True)
+    for name, tree_directory, flat in (('objects', None, False), ('flat', None, True), ('tree_directory', directory, False)):
+        elapsed, rss = measure(game, tree_directory, flat)
+        print('{0:<8} {1:<20} {2:>10.4f} {3:>12,}'.format(game, name, elapsed, rss))
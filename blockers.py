@@ -0,0 +1,89 @@
+from cardset import masks_batch
+from hand_ranges import hand_indexer, range_indexer
+from functools import lru_cache
+import numpy as np
+
+class RangeSupport(object):
+    """
+    Which cards every range index holds, to tell which hands a board or
+    another hand blocks with array operations instead of overlap() on
+    Card tuples. codes holds the card codes of each range index, one row
+    per index (see hand_ranges.range_codes).
+    """
+    def __init__(self, codes):
+        self.codes = np.asarray(codes, np.intp)
+        self.size = len(self.codes)
+        # incidence[i, c] is whether range index i holds card code c
+        self.incidence = np.zeros((self.size, 52), np.bool_)
+        self.incidence[np.arange(self.size)[:, None], self.codes] = True
+        # The same as one card set per range index
+        self.bits = masks_batch(self.codes)
+        self.board_masks = {}
+        self.conflict_matrix = None
+
+    def board_mask(self, board):
+        """
+        Whether each range index shares no card with board (Cards or card
+        codes), cached by board.
+        """
+        key = tuple(sorted(c.to_code() if hasattr(c, 'to_code') else int(c) for c in board))
+        if key not in self.board_masks:
+            mask = ~self.incidence[:, list(key)].any(axis=1)
+            mask.setflags(write=False)
+            self.board_masks[key] = mask
+        return self.board_masks[key]
+
+    def conflicts(self, index=None):
+        """
+        Whether each pair of range indexes shares a card, or only the row
+        of index. The full matrix is size x size, built on first use.
+        """
+        if index is not None:
+            return (self.bits & self.bits[index]) != 0
+        if self.conflict_matrix is None:
+            self.conflict_matrix = (self.bits[:, None] & self.bits[None, :]) != 0
+        return self.conflict_matrix
+
+    def conflict(self, a, b):
+        return bool(self.bits[a] & self.bits[b])
+
+    def mask(self, reach, board):
+        """
+        reach (indexed by range index, the last axis) with the hands board blocks zeroed.
+        """
+        return np.where(self.board_mask(board), reach, 0)
+
+    def normalize(self, reach, board):
+        """
+        mask, scaled to sum to 1 over the hands board leaves.
+        """
+        masked = self.mask(reach, board)
+        total = masked.sum(axis=-1, keepdims=True)
+        return masked / np.where(total == 0, 1, total)
+
+    def unblocked(self, reach):
+        """
+        For each range index, the sum of reach over the hands that share no
+        card with it. Card totals take out the hands sharing a card, which
+        counts a hand sharing both of a 2-card hand's cards (itself) twice.
+        """
+        reach = np.asarray(reach)
+        if self.codes.shape[1] > 2:
+            return reach.sum() - self.conflicts().dot(reach)
+        card_totals = np.zeros(52, reach.dtype)
+        for column in self.codes.T:
+            np.add.at(card_totals, column, reach)
+        return reach.sum() - card_totals[self.codes].sum(axis=1) + (self.codes.shape[1] - 1) * reach
+
+@lru_cache(maxsize=None)
+def support_for(indexer):
+    return RangeSupport(indexer.codes)
+
+def range_support(rules, hole_count=None):
+    """
+    The RangeSupport of rules' range indexes, one per range layout. rules
+    may be None for hands of 2 or more cards, which don't depend on it.
+    """
+    if hole_count is not None and hole_count > 1:
+        return support_for(hand_indexer(hole_count))
+    return support_for(range_indexer(rules, hole_count))
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+class BoardCache(object):
+    """
+    Least recently used cache of per-board entries, bounded by the total
+    size in bytes of the cached entries rather than by their count.
+    build(key) makes the entry for a missing key and must return an object
+    with an nbytes attribute, such as a numpy array.
+    """
+    def __init__(self, build, max_bytes):
+        self.build = build
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = self.build(key)
+        self.entries[key] = entry
+        self.nbytes += entry.nbytes
+        self.evict()
+        return entry
+
+    def evict(self):
+        # The newest entry is always kept, even when it alone is over the cap
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            self.nbytes -= entry.nbytes
+            self.evictions += 1
+
+    def resize(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.evict()
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        return { 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+            'entries': len(self.entries), 'bytes': self.nbytes, 'max_bytes': self.max_bytes }
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
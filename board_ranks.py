@@ -0,0 +1,144 @@
+from hand_ranges import range_codes, range_size
+from lookup_tables import TABLE_DIR
+from itertools import combinations
+from math import comb
+import hashlib
+import numpy as np
+import os
+import sys
+import time
+
+DEFAULT_DIRECTORY = os.path.join(TABLE_DIR, 'board_ranks')
+# Ranks of the hands on a board fit in 16 bits, 0 is a hand that can't be held
+RANK_DTYPE = np.int16
+
+def board_ranks(rules, board):
+    """
+    Integer rank of every range index (see hand_ranges.cards_to_range_index)
+    on board (Cards): hands that rules.handeval scores higher get higher
+    ranks, equal scores the same rank, from 1 up. Hands with a card outside
+    the deck or on the board get 0. Hands are scored all at once by
+    rules.handeval_batch.
+    """
+    ranks = np.zeros(range_size(rules), RANK_DTYPE)
+    codes = range_codes(rules, np.arange(len(ranks)))
+    board = [card.to_code() for card in board]
+    live = np.isin(codes, np.setdiff1d([card.to_code() for card in rules.deck], board)).all(axis=1)
+    scores = np.asarray(rules.handeval_batch(codes[live], np.array(board, np.intp)))
+    ranks[live] = np.unique(scores, return_inverse=True)[1].reshape(-1) + 1
+    return ranks
+
+def game_key(rules):
+    """
+    Hash of what the ranks of a game depend on: its deck, in order since
+    single hole cards are indexed by their deck position, its number of
+    hole cards and its handeval (by name and bytecode).
+    """
+    handeval = rules.handeval
+    code = getattr(getattr(handeval, '__code__', None), 'co_code', b'')
+    name = '{0}.{1}'.format(getattr(handeval, '__module__', ''), getattr(handeval, '__qualname__', repr(handeval)))
+    content = repr((name, rules.roundinfo[0].holecard_count, [card.to_code() for card in rules.deck])).encode() + code
+    return hashlib.sha1(content).hexdigest()[:16]
+
+def showdown_board_size(rules):
+    """
+    Number of board cards at a showdown, which only comes after the last round.
+    """
+    return sum(r.boardcards for r in rules.roundinfo)
+
+class BoardRankStore(object):
+    """
+    board_ranks of every showdown board of a game, computed once and kept
+    in a memory-mapped file under directory/<game_key>, so every process
+    and every tree of the game shares them. Row i of the table holds the
+    board with colexicographic index i among the deck's boards, followed by
+    a column that is set once the row has been flushed.
+    Boards missing from the table are computed when first looked up.
+    """
+    stores = {}
+
+    def __init__(self, rules, directory=DEFAULT_DIRECTORY):
+        self.rules = rules
+        self.directory = os.path.join(directory, game_key(rules))
+        self.size = range_size(rules)
+        codes = sorted(card.to_code() for card in rules.deck)
+        # Position of each card code in the deck, which boards are indexed by
+        self.positions = { code: i for i, code in enumerate(codes) }
+        self.cards = [card for code in codes for card in rules.deck if card.to_code() == code]
+        self.tables = {}
+
+    def open(rules, directory=DEFAULT_DIRECTORY):
+        """
+        The store of rules' game in directory, one per process.
+        """
+        key = (os.path.abspath(directory), game_key(rules))
+        if key not in BoardRankStore.stores:
+            BoardRankStore.stores[key] = BoardRankStore(rules, directory)
+        return BoardRankStore.stores[key]
+    open = staticmethod(open)
+
+    def table(self, size):
+        if size not in self.tables:
+            path = os.path.join(self.directory, 'ranks_{0}.npy'.format(size))
+            shape = (comb(len(self.cards), size), self.size + 1)
+            if not os.path.exists(path):
+                # Create it under another name first, so other processes never open a partly written header
+                os.makedirs(self.directory, exist_ok=True)
+                partial = '{0}.{1}.tmp'.format(path, os.getpid())
+                np.lib.format.open_memmap(partial, mode='w+', dtype=RANK_DTYPE, shape=shape).flush()
+                if os.path.exists(path):
+                    os.remove(partial)
+                else:
+                    os.replace(partial, path)
+            table = np.load(path, mmap_mode='r+')
+            if table.shape != shape or table.dtype != RANK_DTYPE:
+                raise ValueError("{0} holds a {1} {2} table, expected {3} {4}".format(path, table.shape, table.dtype, shape, np.dtype(RANK_DTYPE)))
+            self.tables[size] = table
+        return self.tables[size]
+
+    def row(self, board):
+        positions = sorted(self.positions[card.to_code()] for card in board)
+        return sum(comb(p, i + 1) for i, p in enumerate(positions))
+
+    def ranks(self, board):
+        """
+        board_ranks of board, read from the table, or computed and saved to
+        it the first time.
+        """
+        table = self.table(len(board))
+        row = self.row(board)
+        if not table[row, -1]:
+            self.save(table, row, board_ranks(self.rules, board))
+        return table[row, :-1]
+
+    def save(self, table, row, ranks):
+        table[row, :-1] = ranks
+        table.flush()
+        # Only mark the row done once its ranks are on disk
+        table[row, -1] = 1
+        table.flush()
+
+    def precompute(self, max_boards=None):
+        """
+        Compute every showdown board of the game not in the tables yet, or
+        at most max_boards of them. Returns how many were computed.
+        """
+        computed = 0
+        size = showdown_board_size(self.rules)
+        table = self.table(size)
+        for positions in combinations(range(len(self.cards)), size):
+            if max_boards is not None and computed >= max_boards:
+                break
+            row = sum(comb(p, i + 1) for i, p in enumerate(positions))
+            if not table[row, -1]:
+                self.save(table, row, board_ranks(self.rules, tuple(self.cards[p] for p in positions)))
+                computed += 1
+        return computed
+
+if __name__ == '__main__':
+    import pokergames
+    game = sys.argv[1] if len(sys.argv) > 1 else 'leduc'
+    directory = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DIRECTORY
+    start = time.time()
+    computed = BoardRankStore(getattr(pokergames, game + '_rules')(), directory).precompute()
+    print('{0}: {1} boards in {2:.1f}s'.format(game, computed, time.time() - start))
@@ -1,6 +1,4 @@
-import re
-
-class Card:
+class Card(object):
     SUIT_TO_STRING = {
         1: "s",
         2: "h",
@@ -32,30 +30,63 @@ class Card:
     STRING_TO_SUIT = dict([(v, k) for k, v in list(SUIT_TO_STRING.items())])
     STRING_TO_RANK = dict([(v, k) for k, v in list(RANK_TO_STRING.items())])
     
-    REPR_RE = re.compile(r'\((.*?)\)')
-    
-    def __init__(self, rank, suit):
-        """Create a card. Rank is 2-14, representing 2-A,
-        while suit is 1-4 representing spades, hearts, diamonds, clubs"""
-        self.rank = rank
-        self.suit = suit
-    
+    # The 52 interned cards, by code
+    CARDS = []
+
+    __slots__ = ('rank', 'suit', 'code')
+
+    def __new__(cls, rank, suit):
+        """Return the card of rank 2-14, representing 2-A, and suit 1-4,
+        representing spades, hearts, diamonds, clubs. There is one Card
+        per card, so equality is identity and copies are the card itself."""
+        if not (2 <= rank <= 14 and 1 <= suit <= 4):
+            raise ValueError("No card of rank {0} and suit {1}".format(rank, suit))
+        return cls.CARDS[(rank - 2) * 4 + (suit - 1)]
+
     def __repr__(self):
         return "%s%s" % (self.RANK_TO_STRING[self.rank], self.SUIT_TO_STRING[self.suit])
-    
-    def __eq__(self, other):
-        return (isinstance(other, self.__class__) and self.rank == other.rank and self.suit == other.suit)
-    
+
     def __hash__(self):
-        return hash((self.rank, self.suit))
-    
+        return self.code
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (Card, (self.rank, self.suit))
+
+    def to_code(self):
+        """Return the 0..51 integer code of this card, (rank - 2) * 4 + (suit - 1).
+        Codes are what the batch evaluators and range indexing work with."""
+        return self.code
+
+    @classmethod
+    def from_code(cls, code):
+        """Return a card instance from its 0..51 integer code."""
+        return cls.CARDS[int(code)]
+
+    @classmethod
+    def from_string(cls, string):
+        """Return a card instance from its repr, e.g. 'As'."""
+        return cls.CARDS[(cls.STRING_TO_RANK[string[0].upper()] - 2) * 4 + cls.STRING_TO_SUIT[string[1].lower()] - 1]
+
     @classmethod
     def from_repr(cls, repr):
         """Return a card instance from repr.
-        This is really dirty--it just matches between the parens.
+        This is really dirty--it just takes what is between the parens.
         It's meant for debugging."""
-        between_parens = re.search(cls.REPR_RE, repr).group(1)
-        rank = cls.STRING_TO_RANK[between_parens[0].upper()]
-        suit = cls.STRING_TO_SUIT[between_parens[1].lower()]
-        return Card(rank, suit)
-        
\ No newline at end of file
+        start = repr.index('(') + 1
+        return cls.from_string(repr[start:repr.index(')', start)])
+
+def intern_cards():
+    for code in range(52):
+        card = object.__new__(Card)
+        card.rank = code // 4 + 2
+        card.suit = code % 4 + 1
+        card.code = code
+        Card.CARDS.append(card)
+
+intern_cards()
@@ -0,0 +1,93 @@
+from card import Card
+import numpy as np
+
+# A set of cards is an int with bit c set for each card code c (see
+# Card.to_code) in it, so set operations are single integer operations.
+# Arrays of sets are uint64.
+EMPTY = 0
+FULL_DECK = (1 << 52) - 1
+
+def card_bit(card):
+    return 1 << (card.code if isinstance(card, Card) else int(card))
+
+def to_mask(cards):
+    """
+    The set of cards (Cards or card codes).
+    """
+    mask = 0
+    for card in cards:
+        mask |= card_bit(card)
+    return mask
+
+def to_codes(mask):
+    """
+    Card codes in the set, lowest first.
+    """
+    codes = []
+    while mask:
+        low = mask & -mask
+        codes.append(low.bit_length() - 1)
+        mask ^= low
+    return codes
+
+def to_cards(mask):
+    return [Card.from_code(code) for code in to_codes(mask)]
+
+def popcount(mask):
+    return mask.bit_count()
+
+def overlaps(a, b):
+    return (a & b) != 0
+
+def remove_cards(cards, mask):
+    """
+    cards (Cards) without the ones in the set, in the same order.
+    """
+    return [card for card in cards if not card_bit(card) & mask]
+
+def masks_batch(codes):
+    """
+    The set of each row of an (N, k) array of card codes, as uint64.
+    """
+    codes = np.asarray(codes, np.uint64).reshape(len(codes), -1)
+    return np.bitwise_or.reduce(np.left_shift(np.uint64(1), codes), axis=1, initial=np.uint64(0))
+
+# Number of bits set in each byte, for numpy without bitwise_count
+BYTE_POPCOUNT = np.array([bin(x).count('1') for x in range(256)], np.uint8)
+
+def popcount_batch(masks):
+    """
+    Vectorized popcount over a uint64 array of sets.
+    """
+    masks = np.asarray(masks, np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(masks)
+    return BYTE_POPCOUNT[masks[..., None].view(np.uint8)].sum(axis=-1, dtype=np.uint8)
+
+# Rank code (rank - 2) and suit code (suit - 1) of each ASCII character, -1 for others
+RANK_CHARS = np.full(256, -1, np.intp)
+SUIT_CHARS = np.full(256, -1, np.intp)
+for rank, char in Card.RANK_TO_STRING.items():
+    RANK_CHARS[[ord(char), ord(char.lower())]] = rank - 2
+for suit, char in Card.SUIT_TO_STRING.items():
+    SUIT_CHARS[[ord(char), ord(char.upper())]] = suit - 1
+
+def parse_codes(strings):
+    """
+    Card codes of card strings like 'AsKh', an (N, cards) array for N
+    strings, all at once. Strings shorter than the longest are padded with
+    -1, and so is anything that isn't a card.
+    """
+    width = max([len(s) for s in strings] + [0])
+    width += width % 2
+    chars = np.frombuffer(''.join(s.ljust(width) for s in strings).encode('ascii'), np.uint8).reshape(len(strings), width)
+    ranks = RANK_CHARS[chars[:, 0::2]]
+    suits = SUIT_CHARS[chars[:, 1::2]]
+    return np.where((ranks >= 0) & (suits >= 0), ranks * 4 + suits, -1)
+
+def infoset_codes(infosets):
+    """
+    parse_codes of the cards of infoset keys in the holdem_format style,
+    hole cards then board then ':' and the bet history.
+    """
+    return parse_codes([infoset.split(':', 1)[0] for infoset in infosets])
@@ -0,0 +1,72 @@
+from math import comb
+import numpy as np
+
+class HandIndexer(object):
+    """
+    Ranks the k-card hands of a deck (an ordered list of card codes, see
+    Card.to_code) from 0 to comb(len(deck), k) - 1 in O(k) with the
+    combinatorial number system. Hands are ordered lexicographically by the
+    deck positions of their cards, lowest first, so 2-card hands of the
+    full 52-card deck are ranked like np.triu_indices(52, 1).
+    """
+    def __init__(self, deck, k):
+        self.deck = np.asarray(deck, np.intp)
+        self.k = k
+        n = len(self.deck)
+        self.size = comb(n, k)
+        # Deck position of each card code, -1 for codes not in the deck
+        self.positions = np.full(52, -1, np.intp)
+        self.positions[self.deck] = np.arange(n)
+        # binomials[m, j] = comb(m, j)
+        self.binomials = np.array([[comb(m, j) for j in range(k + 1)] for m in range(n + 1)], np.int64)
+        # Card codes of every hand, one row per index
+        self.codes = self.deck[self.unrank_batch(np.arange(self.size))]
+        self.codes.setflags(write=False)
+
+    def rank(self, positions):
+        """
+        Index of the hand holding the cards at sorted deck positions.
+        """
+        # Lexicographic rank: the hands after it are the combinations of the positions reversed
+        n = len(self.deck)
+        after = 0
+        for i, p in enumerate(positions):
+            after += comb(n - 1 - p, self.k - i)
+        return self.size - 1 - after
+
+    def index(self, codes):
+        """
+        Index of the hand holding card codes, in any order.
+        """
+        return self.rank(sorted(int(self.positions[c]) for c in codes))
+
+    def index_batch(self, codes):
+        """
+        Vectorized index over an (N, k) array of card codes, in any order.
+        """
+        positions = np.sort(self.positions[np.asarray(codes, np.intp)], axis=1)
+        n = len(self.deck)
+        after = self.binomials[n - 1 - positions, self.k - np.arange(self.k)].sum(axis=1)
+        return self.size - 1 - after
+
+    def unrank_batch(self, indexes):
+        """
+        Sorted deck positions of the hand at each index, an (N, k) array.
+        """
+        n = len(self.deck)
+        # Walking the positions reversed, the hands after each one are a colexicographic rank
+        after = self.size - 1 - np.asarray(indexes, np.int64)
+        positions = np.empty((len(after), self.k), np.intp)
+        # The largest reversed position whose binomial fits in what's left, for each card in turn
+        for i in range(self.k):
+            column = self.binomials[:, self.k - i]
+            reversed_position = np.searchsorted(column, after, 'right') - 1
+            positions[:, i] = n - 1 - reversed_position
+            after = after - column[reversed_position]
+        return positions
+
+    def cards(self, index):
+        """
+        Card codes of the hand at index, lowest deck position first.
+        """
+        return tuple(int(c) for c in self.codes[index])
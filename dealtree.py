@@ -0,0 +1,191 @@
+from pokertrees import PublicTree, all_unique
+from flattree import TERMINAL, ACTION, Interned
+from cardset import remove_cards, to_mask
+from itertools import combinations, islice, permutations
+import numpy as np
+import random
+
+# Deals DealTraversal.expected_value walks at once
+BATCH_SIZE = 1024
+
+class DealTraversal(object):
+    """
+    Walks deals through the flat tree of a GameTree (see GameTree.build
+    with flat), a deal being the holecards of each player and the board
+    cards. Every chance node of the tree deals each outcome to its own
+    child, and a deal only keeps the child dealing its cards. So the nodes
+    of a batch of deals are found level by level from the root, with array
+    operations over the whole level, and values are summed back up the
+    same levels. Sampling solvers and simulators visit the deals they
+    sample without walking the rest of the tree, and without a Python call
+    per node.
+    """
+    def __init__(self, tree):
+        if tree.flat is None or isinstance(tree, PublicTree):
+            raise ValueError("DealTraversal walks the flat tree of a GameTree, build it with flat=True")
+        if tree.rules.suit_isomorphism:
+            raise ValueError("With suit_isomorphism a deal stands for others, build the tree without it")
+        self.rules = tree.rules
+        self.flat = flat = tree.flat
+        self.first_child = flat.first_child.astype(np.intp)
+        self.child_count = flat.child_count.astype(np.intp)
+        # Whether each node is the child of a chance node, which only the deal it was dealt in keeps
+        self.dealt = (flat.parent >= 0) & (flat.kind[np.maximum(flat.parent, 0)] != ACTION)
+        # The number of cards and card set of each player's holecards and of each board in the tree's tables
+        self.holecard_counts = np.array([[len(hc) for hc in holecards] for holecards in flat.holecards], np.intp)
+        self.holecard_masks = np.array([[to_mask(hc) for hc in holecards] for holecards in flat.holecards], np.uint64)
+        self.board_counts = np.array([len(board) for board in flat.boards], np.intp)
+        self.board_masks = np.array([to_mask(board) for board in flat.boards], np.uint64)
+
+    def walk(self, deals):
+        """
+        The nodes of each of deals, a list of (holes, board) where each
+        player holds holes[player] and board is dealt, both listing the
+        cards of each round in turn. Returns a list of levels from the
+        root down, each a pair of arrays: the nodes of the level and the
+        position of each one's parent in the level above. Position d of the
+        first level is the root in deal d.
+        """
+        flat = self.flat
+        # The cards each deal has dealt to each player and to the board after each number of cards
+        holes = [[to_mask(hole[:n]) for n in range(self.holecard_counts.max(initial=0) + 1)] for holes, _ in deals for hole in holes]
+        holes = np.array(holes, np.uint64).reshape(len(deals), self.rules.players, -1)
+        boards = np.array([[to_mask(board[:n]) for n in range(self.board_counts.max(initial=0) + 1)] for _, board in deals], np.uint64)
+        # Whether each deal holds each entry of the holecards and board tables
+        holes_ok = np.ones((len(deals), len(self.holecard_masks)), np.bool_)
+        for player in range(self.rules.players):
+            holes_ok &= holes[:, player, self.holecard_counts[:, player]] == self.holecard_masks[:, player]
+        boards_ok = boards[:, self.board_counts] == self.board_masks
+
+        nodes = np.zeros(len(deals), np.intp)
+        owners = np.arange(len(deals))
+        levels = [(nodes, np.full(len(deals), -1, np.intp))]
+        while True:
+            counts = self.child_count[nodes]
+            total = counts.sum()
+            if not total:
+                return levels
+            # The children of each node are the consecutive rows from its first_child
+            parents = np.repeat(np.arange(len(nodes)), counts)
+            children = np.repeat(self.first_child[nodes] - np.cumsum(counts) + counts, counts) + np.arange(total)
+            owners = owners[parents]
+            keep = ~self.dealt[children] | (holes_ok[owners, flat.holecards_id[children]] & boards_ok[owners, flat.board_id[children]])
+            nodes = children[keep]
+            owners = owners[keep]
+            levels.append((nodes, parents[keep]))
+
+    def child_weights(self, strategies):
+        """
+        The probability of going from each node's parent to the node when
+        each player plays by strategies[player] (see pokerstrategy.Strategy):
+        the probability of the action leading to it, and 1 for the child
+        of a chance node, which the deal decides.
+        """
+        flat = self.flat
+        actions = np.flatnonzero(flat.kind == ACTION)
+        player = flat.player[actions].astype(np.intp)
+        # Action nodes differing only in the other players' cards share an infoset, which is looked up once
+        hands = Interned()
+        hand_ids = np.array([[hands.index(hc) for hc in holecards] for holecards in flat.holecards], np.intp)
+        sizes = (self.rules.players, len(hands.values), len(flat.boards), len(flat.bet_histories))
+        keys = np.ravel_multi_index((player, hand_ids[flat.holecards_id[actions], player], flat.board_id[actions], flat.bet_history_id[actions]), sizes)
+        keys, inverse = np.unique(keys, return_inverse=True)
+        infoset_probs = np.array([strategies[p].probs(self.rules.infoset_format(p, hands.values[hand], flat.boards[board], flat.bet_histories[bet_history]))
+            for p, hand, board, bet_history in zip(*(index.tolist() for index in np.unravel_index(keys, sizes)))], np.float64).reshape(len(keys), 3)
+        probs = np.zeros((len(flat), 3))
+        probs[actions] = infoset_probs[inverse.reshape(-1)]
+        weights = np.ones(len(flat))
+        acted = flat.action >= 0
+        weights[acted] = probs[flat.parent[acted], flat.action[acted]]
+        return weights
+
+    def values(self, levels, weights):
+        """
+        The expected payoffs of each player at every node of walked deals
+        (see walk) when each child is reached with its weight (see
+        child_weights), as an array for each level. The first holds the
+        expected payoffs of each deal.
+        """
+        flat = self.flat
+        values = [None] * len(levels)
+        for depth in range(len(levels) - 1, -1, -1):
+            nodes = levels[depth][0]
+            level = np.zeros((len(nodes), self.rules.players))
+            terminal = np.flatnonzero(flat.kind[nodes] == TERMINAL)
+            level[terminal] = flat.payoffs[flat.payoffs_id[nodes[terminal]]]
+            if depth + 1 < len(levels):
+                children, parents = levels[depth + 1]
+                below = weights[children, None] * values[depth + 1]
+                for player in range(self.rules.players):
+                    level[:, player] += np.bincount(parents, below[:, player], len(nodes))
+            values[depth] = level
+        return values
+
+    def reach(self, levels, weights):
+        """
+        The probability that each player plays to every node of walked
+        deals: the product of the weights of their own actions above it,
+        as an array for each level.
+        """
+        flat = self.flat
+        reach = [np.ones((len(levels[0][0]), self.rules.players))]
+        for nodes, parents in levels[1:]:
+            level = reach[-1][parents]
+            acted = np.flatnonzero(flat.action[nodes] >= 0)
+            level[acted, flat.player[flat.parent[nodes[acted]]]] *= weights[nodes[acted]]
+            reach.append(level)
+        return reach
+
+    def deals(self):
+        """
+        Every deal of the game as (holes, board), each as likely as the
+        others, in the order the tree deals them.
+        """
+        players = self.rules.players
+        def deal_rounds(round_idx, holes, board, deck):
+            if round_idx == len(self.rules.roundinfo):
+                yield holes, board
+                return
+            cur_round = self.rules.roundinfo[round_idx]
+            all_hc = [x for x in permutations(combinations(deck, cur_round.holecard_count), players) if all_unique(x)] if cur_round.holecard_count else [((),) * players]
+            for hc in all_hc:
+                cur_holes = [hole + cards for hole, cards in zip(holes, hc)]
+                cur_deck = remove_cards(deck, to_mask([card for cards in hc for card in cards]))
+                for bc in combinations(cur_deck, cur_round.boardcards):
+                    for deal in deal_rounds(round_idx + 1, cur_holes, board + bc, remove_cards(cur_deck, to_mask(bc))):
+                        yield deal
+        return deal_rounds(0, [()] * players, (), self.rules.deck)
+
+    def sample_deal(self, rng=random):
+        """
+        A deal drawn uniformly at random with rng, like deals gives.
+        """
+        deck = list(self.rules.deck)
+        rng.shuffle(deck)
+        holes = [()] * self.rules.players
+        board = ()
+        for cur_round in self.rules.roundinfo:
+            for player in range(self.rules.players):
+                holes[player] += tuple(deck[:cur_round.holecard_count])
+                del deck[:cur_round.holecard_count]
+            board += tuple(deck[:cur_round.boardcards])
+            del deck[:cur_round.boardcards]
+        return holes, board
+
+    def expected_value(self, strategies, deals=None):
+        """
+        The expected payoffs of each player when each plays by
+        strategies[player], averaged over deals, every deal of the game
+        by default. Sampled deals (see sample_deal) give a simulation.
+        Deals are walked BATCH_SIZE at a time.
+        """
+        weights = self.child_weights(strategies)
+        deals = iter(self.deals() if deals is None else deals)
+        total = np.zeros(self.rules.players)
+        count = 0
+        while True:
+            batch = list(islice(deals, BATCH_SIZE))
+            if not batch:
+                return total / count
+            total += self.values(self.walk(batch), weights)[0].sum(axis=0)
+            count += len(batch)
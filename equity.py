@@ -0,0 +1,67 @@
+from hand_evaluator import BoardState, HandLengthException
+from hand_ranges import RANGE_CODES_2
+from showdown import card_removal_sums, score_positions
+from itertools import combinations
+import numpy as np
+
+# Hands are indexed like hand_ranges.cards_to_range_index, so ranges are
+# arrays of RANGE_SIZE weights, the same shape as CFR reach vectors.
+RANGE_SIZE = len(RANGE_CODES_2)
+
+def equity_vs_range(board, my_range, opp_range):
+    """
+    Showdown equity of each of the 1326 hole-card hands against the weighted
+    opp_range on a board of 3, 4 or 5 cards, with ties counting half. Flop
+    and turn boards enumerate every runout. Opponent hands that share a card
+    with our hand or the runout are left out. Hands with no weight in
+    my_range, or that share a card with the board, get 0.
+    """
+    wins, totals = showdown_sums(board, opp_range)
+    my_range = np.asarray(my_range)
+    played = (my_range > 0) & (totals > 0)
+    equity = np.zeros(RANGE_SIZE)
+    equity[played] = wins[played] / totals[played]
+    return equity
+
+def showdown_sums(board, opp_range):
+    """
+    For each hand, the opponent weight it beats (ties counting half) and the
+    opponent weight it can face, summed over every runout of the board.
+    """
+    if len(board) not in (3, 4, 5):
+        raise HandLengthException("Only 3, 4 or 5 board cards are supported by equity_vs_range")
+    board = [card.to_code() for card in board]
+    opp_range = np.asarray(opp_range, np.float64)
+    if opp_range.shape != (RANGE_SIZE,):
+        raise ValueError("Ranges must have {0} weights, see hand_ranges.cards_to_range_index".format(RANGE_SIZE))
+
+    wins = np.zeros(RANGE_SIZE)
+    totals = np.zeros(RANGE_SIZE)
+    deck = [code for code in range(52) if code not in board]
+    for runout in combinations(deck, 5 - len(board)):
+        river_wins, river_totals = river_showdown_sums(board + list(runout), opp_range)
+        wins += river_wins
+        totals += river_totals
+    return wins, totals
+
+def river_showdown_sums(board, opp_range):
+    """
+    showdown_sums on a 5-card board of card codes, with the card removal
+    sums of showdown.card_removal_sums, so each hand costs O(1) after the
+    O(n log n) sort.
+    """
+    live = ~np.isin(RANGE_CODES_2, board).any(axis=1)
+    codes = RANGE_CODES_2[live]
+    weights = opp_range[live]
+    # Lower Cactus Kev ranks are better, so negate them as scores
+    scores = -BoardState(board).complete_rank_batch(codes)
+    beaten, tied = card_removal_sums(*score_positions(scores), codes, weights)
+    # The opponent weight that shares no card with each hand, ours counted back in
+    card_totals = np.bincount(codes.ravel(), np.repeat(weights, 2), 52)
+    facing = weights.sum() - card_totals[codes].sum(axis=1) + weights
+
+    wins = np.zeros(RANGE_SIZE)
+    totals = np.zeros(RANGE_SIZE)
+    wins[live] = beaten + 0.5 * tied
+    totals[live] = facing
+    return wins, totals
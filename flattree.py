@@ -0,0 +1,530 @@
+from pokertrees import FOLD, CALL, RAISE, TerminalNode, HolecardChanceNode, BoardcardChanceNode, ActionNode, add_frame_views
+from card import Card
+from cardset import to_mask
+from hand_ranges import range_size
+from showdown import BoardHands, ShowdownRanking
+from lookup_tables import TABLE_DIR
+from collections.abc import Mapping
+from functools import partial
+import numpy as np
+import hashlib
+import json
+import os
+import struct
+
+# Node kinds of FlatTree.kind
+TERMINAL = 0
+HOLECARD_CHANCE = 1
+BOARDCARD_CHANCE = 2
+ACTION = 3
+KINDS = { TerminalNode: TERMINAL, HolecardChanceNode: HOLECARD_CHANCE, BoardcardChanceNode: BOARDCARD_CHANCE, ActionNode: ACTION }
+
+# Saved trees are FORMAT_MAGIC, FORMAT_VERSION and the length of a JSON
+# header (little endian uint32 and uint64), the header, then the arrays it
+# lists, each at an offset that is a multiple of ALIGNMENT.
+FORMAT_MAGIC = b'PYCFRTRE'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+DEFAULT_TREE_DIRECTORY = os.path.join(TABLE_DIR, 'trees')
+# FlatTree arrays saved as they are
+NODE_ARRAYS = ('kind', 'parent', 'first_child', 'child_count', 'player', 'action', 'todeal', 'deck_mask', 'players_in',
+    'committed_id', 'board_id', 'holecards_id', 'bet_history_id', 'hands_id', 'symmetries_id', 'payoffs_id',
+    'action_child', 'committed_values')
+
+def index_dtype(count):
+    # Smallest signed type holding the indexes of count entries and -1
+    for dtype in (np.int8, np.int16, np.int32):
+        if count <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+class FlatRef(object):
+    """
+    What the tree builder holds on to for a node written to a
+    FlatTreeBuilder while it builds the node's children.
+    """
+    __slots__ = ('index', 'player')
+
+    def __init__(self, index, player):
+        self.index = index
+        self.player = player
+
+class Interned(object):
+    """
+    A table of distinct values and the index of each, by key.
+    """
+    def __init__(self):
+        self.values = []
+        self.indexes = {}
+
+    def index(self, value, key=None):
+        key = value if key is None else key
+        index = self.indexes.get(key)
+        if index is None:
+            index = self.indexes[key] = len(self.values)
+            self.values.append(value)
+        return index
+
+class FlatTreeBuilder(object):
+    """
+    Collects the nodes GameTree.build(flat=True) creates as rows, see
+    GameTree.new_action_node and friends, and turns them into a FlatTree.
+    """
+    def __init__(self, rules):
+        self.rules = rules
+        self.columns = { name: [] for name in ('kind', 'parent', 'player', 'action', 'todeal', 'committed', 'board',
+            'holecards', 'deck_mask', 'bet_history', 'players_in', 'hands', 'payoffs', 'symmetries') }
+        self.committed = Interned()
+        self.boards = Interned()
+        self.holecards = Interned()
+        self.bet_histories = Interned()
+        self.hands = Interned()
+        self.payoffs = []
+        self.symmetries = Interned()
+        # Index of the child each node got last
+        self.last_child = {}
+        # The builder shares holecards between the nodes of a deal and never
+        # changes them, so each list is only compared by content once. The
+        # lists are kept so their ids aren't reused.
+        self.holecards_by_id = {}
+        self.holecards_seen = []
+
+    def holecards_index(self, holecards):
+        index = self.holecards_by_id.get(id(holecards))
+        if index is None:
+            index = self.holecards.index(holecards, tuple(tuple(hc) for hc in holecards))
+            self.holecards_by_id[id(holecards)] = index
+            self.holecards_seen.append(holecards)
+        return index
+
+    def add(self, cls, root, committed, holecards, board, deck, bet_history, todeal=0, player=-1, payoffs=None, players_in=None, hands=None):
+        index = len(self.columns['kind'])
+        parent = root.index if root is not None else -1
+        if root is not None:
+            self.last_child[parent] = index
+        row = {
+            'kind': KINDS[cls], 'parent': parent, 'player': player, 'action': -1, 'todeal': todeal,
+            'committed': self.committed.index(tuple(committed)),
+            'board': self.boards.index(tuple(board)),
+            'holecards': self.holecards_index(holecards),
+            'deck_mask': to_mask(deck),
+            'bet_history': self.bet_histories.index(bet_history),
+            'players_in': sum(1 << i for i, v in enumerate(players_in) if v) if players_in is not None else 0,
+            'hands': self.hands.index(hands, id(hands)) if hands is not None else -1,
+            'payoffs': -1, 'symmetries': -1,
+        }
+        if payoffs is not None:
+            row['payoffs'] = len(self.payoffs)
+            self.payoffs.append(payoffs)
+        for name, value in row.items():
+            self.columns[name].append(value)
+        return FlatRef(index, player)
+
+    def set_action(self, root, action):
+        self.columns['action'][self.last_child[root.index]] = action
+
+    def set_symmetries(self, bnode, symmetries):
+        self.columns['symmetries'][self.last_child[bnode.index]] = self.symmetries.index(list(symmetries), tuple(symmetries))
+
+    def finish(self):
+        """
+        The FlatTree of the nodes added, renumbered so the children of
+        every node are consecutive, each node's block right after its
+        parent's siblings. Nodes added without a parent come first, in the
+        order they were added, as the roots of a forest.
+        """
+        parent = np.array(self.columns['parent'], np.int64)
+        n = len(parent)
+        # Nodes were added in preorder, so each node's children are in order among the nodes with that parent
+        by_parent = np.argsort(parent, kind='stable')
+        child_counts = np.bincount(parent[parent >= 0], minlength=n)
+        roots = np.flatnonzero(parent < 0)
+        first_child_old = np.concatenate([[0], np.cumsum(child_counts)])[:-1] + len(roots)
+        order = np.empty(n, np.int64)
+        order[:len(roots)] = roots
+        first_child = np.full(n, -1, np.int64)
+        next_index = len(roots)
+        stack = roots[::-1].tolist()
+        while stack:
+            old = stack.pop()
+            count = child_counts[old]
+            if count:
+                children = by_parent[first_child_old[old]:first_child_old[old] + count]
+                first_child[old] = next_index
+                order[next_index:next_index + count] = children
+                next_index += count
+                stack.extend(children[::-1].tolist())
+        new_index = np.empty(n, np.int64)
+        new_index[order] = np.arange(n)
+
+        tree = FlatTree(self.rules)
+        structure = index_dtype(n)
+        tree.kind = np.array(self.columns['kind'], np.int8)[order]
+        tree.parent = np.where(parent[order] < 0, -1, new_index[np.maximum(parent[order], 0)]).astype(structure)
+        tree.first_child = np.where(first_child[order] < 0, -1, first_child[order]).astype(structure)
+        tree.child_count = child_counts[order].astype(index_dtype(child_counts.max(initial=0)))
+        tree.player = np.array(self.columns['player'], np.int8)[order]
+        tree.action = np.array(self.columns['action'], np.int8)[order]
+        tree.todeal = np.array(self.columns['todeal'], np.int8)[order]
+        tree.deck_mask = np.array(self.columns['deck_mask'], np.uint64)[order]
+        tree.players_in = np.array(self.columns['players_in'], np.uint64)[order]
+        for name, table in (('committed', self.committed), ('board', self.boards), ('holecards', self.holecards),
+                ('bet_history', self.bet_histories), ('hands', self.hands), ('symmetries', self.symmetries)):
+            setattr(tree, name + '_id', np.array(self.columns[name], index_dtype(len(table.values)))[order])
+        tree.payoffs_id = np.array(self.columns['payoffs'], index_dtype(len(self.payoffs)))[order]
+        # action_child[i, a] is the child action a leads to, -1 if it isn't allowed
+        tree.action_child = np.full((n, 3), -1, structure)
+        labelled = np.flatnonzero(tree.action >= 0)
+        tree.action_child[tree.parent[labelled], tree.action[labelled]] = labelled
+        tree.committed_values = np.array(self.committed.values)
+        tree.boards = self.boards.values
+        tree.holecards = self.holecards.values
+        tree.bet_histories = self.bet_histories.values
+        tree.hands = self.hands.values
+        # The stored payoffs of each player, one row per terminal that has them
+        tree.payoffs = np.array(self.payoffs, np.float64).reshape(len(self.payoffs), self.rules.players)
+        tree.symmetries = self.symmetries.values
+        return tree
+
+def callable_key(f):
+    """
+    The name and bytecode of a function, or of a functools.partial and the
+    functions it is given, which stay the same across processes.
+    """
+    if isinstance(f, partial):
+        parts = [callable_key(f.func)] + [callable_key(arg) if callable(arg) else (repr(arg), b'') for arg in f.args]
+        return 'partial({0})'.format(', '.join(name for name, _ in parts)), b''.join(code for _, code in parts)
+    name = '{0}.{1}'.format(getattr(f, '__module__', ''), getattr(f, '__qualname__', repr(f)))
+    return name, getattr(getattr(f, '__code__', None), 'co_code', b'')
+
+def tree_key(tree):
+    """
+    Hash of what a built tree depends on: the class of tree, its depth
+    limit and its rules, down to the bytecode of handeval and
+    infoset_format. handeval_batch and rank_directory only change how fast
+    a tree is built.
+    """
+    rules = tree.rules
+    functions = [callable_key(rules.handeval), callable_key(rules.infoset_format)]
+    if tree.max_depth_approx is not None:
+        functions.append(callable_key(tree.max_depth_approx))
+    content = repr((FORMAT_VERSION, type(tree).__name__, tree.max_depth, rules.players, [card.to_code() for card in rules.deck],
+        [(r.holecard_count, r.boardcards, r.betsize, list(r.maxbets)) for r in rules.roundinfo], rules.ante, rules.blinds,
+        rules.suit_isomorphism, [name for name, _ in functions])).encode()
+    return hashlib.sha1(content + b''.join(code for _, code in functions)).hexdigest()[:16]
+
+def pack_hands(lists):
+    """
+    Lists of card tuples as their card codes, one after another, with the
+    number of tuples in each list and their length.
+    """
+    counts = np.array([len(hands) for hands in lists], np.int64)
+    widths = np.array([len(hands[0]) if hands else 0 for hands in lists], np.int8)
+    codes = np.array([card.to_code() for hands in lists for hand in hands for card in hand], np.int8)
+    return codes, counts, widths
+
+def unpack_hands(codes, counts, widths):
+    lists = []
+    start = 0
+    for count, width in zip(counts.tolist(), widths.tolist()):
+        end = start + count * width
+        cards = [Card.CARDS[code] for code in codes[start:end].tolist()]
+        lists.append([tuple(cards[i:i + width]) for i in range(0, end - start, width)] if width else [()] * count)
+        start = end
+    return lists
+
+def aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+class FlatTree(object):
+    """
+    A game tree as one row per node in NumPy arrays, built by
+    GameTree.build(flat=True). The children of node i are the consecutive
+    rows first_child[i] to first_child[i] + child_count[i], so solvers can
+    walk the tree over arrays. Values many nodes share (committed chips,
+    boards, holecards, bet histories, terminal hands) are kept once in a
+    table and rows hold their index, <name>_id. The payoffs GameTree
+    terminals store are the rows of payoffs, a (terminals, players) array.
+    node(i) is a view of row i that works like the Node objects GameTree
+    builds otherwise.
+    """
+    def __init__(self, rules):
+        self.rules = rules
+
+    def __len__(self):
+        return len(self.kind)
+
+    @property
+    def root(self):
+        return self.node(0)
+
+    def node(self, index):
+        return VIEWS[self.kind[index]](self, int(index))
+
+    def children(self, index):
+        first = int(self.first_child[index])
+        return range(first, first + int(self.child_count[index])) if first >= 0 else range(0)
+
+    def pot(self):
+        # Chips committed at each node
+        return self.committed_values.sum(axis=1)[self.committed_id]
+
+    def information_sets(self):
+        """
+        The action node views of each information set, keyed by player
+        view like GameTree.information_sets.
+        """
+        information_sets = {}
+        for index in np.flatnonzero(self.kind == ACTION):
+            node = self.node(index)
+            information_sets.setdefault(node.player_view, []).append(node)
+        if self.rules.suit_isomorphism:
+            add_frame_views(information_sets, self.root, self.rules)
+        return information_sets
+
+    def nbytes(self):
+        # Bytes held by the node arrays
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+
+    def save(self, path, key=''):
+        """
+        Write the tree to path (see FORMAT_MAGIC), with key in the header for
+        load to check, see tree_key. Boards, holecards and terminal hands
+        are written as card codes and bet histories and symmetries in the
+        header.
+        """
+        arrays = { name: getattr(self, name) for name in NODE_ARRAYS }
+        arrays['board_codes'], _, arrays['board_widths'] = pack_hands([[board] for board in self.boards])
+        # Each player holds a range of holecards in a PublicTree, and one hand otherwise
+        public = isinstance(self.holecards[0][0], list)
+        arrays['holecard_codes'], arrays['holecard_counts'], arrays['holecard_widths'] = pack_hands(
+            [hands if public else [hands] for holecards in self.holecards for hands in holecards])
+        arrays['hand_codes'], arrays['hand_counts'], arrays['hand_widths'] = pack_hands([hands.hands for hands in self.hands])
+        ranked = [hands for hands in self.hands if isinstance(hands, ShowdownRanking)]
+        arrays['hand_ranked'] = np.array([isinstance(hands, ShowdownRanking) for hands in self.hands], np.bool_)
+        arrays['hand_scores'] = np.concatenate([hands.scores for hands in ranked]) if ranked else np.zeros(0, np.int16)
+        arrays['payoffs'] = self.payoffs
+        header = { 'key': key, 'players': self.rules.players, 'public': public, 'bet_histories': self.bet_histories,
+            'symmetries': [[int(p) for p in symmetries] for symmetries in self.symmetries], 'arrays': {} }
+        offset = 0
+        for name, array in arrays.items():
+            header['arrays'][name] = [array.dtype.str, list(array.shape), offset]
+            offset = aligned(offset + array.nbytes)
+        encoded = json.dumps(header).encode()
+        start = aligned(len(FORMAT_MAGIC) + 12 + len(encoded))
+        with open(path, 'wb') as f:
+            f.write(FORMAT_MAGIC + struct.pack('<IQ', FORMAT_VERSION, len(encoded)) + encoded)
+            for name, array in arrays.items():
+                f.seek(start + header['arrays'][name][2])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(start + offset)
+
+    def load(path, rules, mmap=True, key=None):
+        """
+        The FlatTree saved to path by save. With mmap its arrays are
+        read-only views of the file, so processes loading it share their
+        pages. Raises ValueError if path holds no tree, one of another
+        format version, or one saved with a key other than key.
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(FORMAT_MAGIC)) != FORMAT_MAGIC:
+                raise ValueError("{0} is not a saved tree".format(path))
+            version, length = struct.unpack('<IQ', f.read(12))
+            if version != FORMAT_VERSION:
+                raise ValueError("{0} holds a version {1} tree, expected version {2}".format(path, version, FORMAT_VERSION))
+            header = json.loads(f.read(length).decode())
+        if key is not None and header['key'] != key:
+            raise ValueError("{0} holds the tree with key {1}, expected {2}".format(path, header['key'], key))
+        if header['players'] != rules.players:
+            raise ValueError("{0} holds a {1} player tree, expected {2}".format(path, header['players'], rules.players))
+        data = np.memmap(path, np.uint8, 'r') if mmap else np.fromfile(path, np.uint8)
+        start = aligned(len(FORMAT_MAGIC) + 12 + length)
+        arrays = {}
+        for name, (dtype, shape, offset) in header['arrays'].items():
+            dtype = np.dtype(dtype)
+            size = int(np.prod(shape)) * dtype.itemsize
+            arrays[name] = data[start + offset:start + offset + size].view(dtype).reshape(shape)
+
+        tree = FlatTree(rules)
+        for name in NODE_ARRAYS:
+            setattr(tree, name, arrays[name])
+        tree.boards = [hands[0] for hands in unpack_hands(arrays['board_codes'], np.ones(len(arrays['board_widths']), np.int64), arrays['board_widths'])]
+        holecards = unpack_hands(arrays['holecard_codes'], arrays['holecard_counts'], arrays['holecard_widths'])
+        if not header['public']:
+            holecards = [hands[0] for hands in holecards]
+        tree.holecards = [holecards[i:i + rules.players] for i in range(0, len(holecards), rules.players)]
+        tree.bet_histories = header['bet_histories']
+        tree.hands = []
+        scores = arrays['hand_scores']
+        scored = 0
+        for hands, ranked in zip(unpack_hands(arrays['hand_codes'], arrays['hand_counts'], arrays['hand_widths']), arrays['hand_ranked']):
+            board_hands = BoardHands(rules, hands)
+            if ranked:
+                # ShowdownRanking takes the scores of every range index
+                full = np.zeros(range_size(rules), scores.dtype)
+                full[board_hands.indexes] = scores[scored:scored + len(hands)]
+                scored += len(hands)
+                board_hands = ShowdownRanking(rules, hands, full)
+            tree.hands.append(board_hands)
+        tree.payoffs = arrays['payoffs']
+        tree.symmetries = header['symmetries']
+        return tree
+
+    load = staticmethod(load)
+
+class FlatNode(object):
+    """
+    A row of a FlatTree read through the attributes of Node. Mixed in
+    before the Node class of the row's kind.
+    """
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, FlatNode) and other.tree is self.tree and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    @property
+    def parent(self):
+        parent = self.tree.parent[self.index]
+        return self.tree.node(parent) if parent >= 0 else None
+
+    @property
+    def children(self):
+        return [self.tree.node(child) for child in self.tree.children(self.index)]
+
+    @property
+    def committed(self):
+        return self.tree.committed_values[self.tree.committed_id[self.index]].tolist()
+
+    @property
+    def holecards(self):
+        return self.tree.holecards[self.tree.holecards_id[self.index]]
+
+    @property
+    def board(self):
+        return self.tree.boards[self.tree.board_id[self.index]]
+
+    @property
+    def deck_mask(self):
+        return int(self.tree.deck_mask[self.index])
+
+    @property
+    def bet_history(self):
+        return self.tree.bet_histories[self.tree.bet_history_id[self.index]]
+
+class FlatTerminalNode(FlatNode, TerminalNode):
+    @property
+    def stored_payoffs(self):
+        index = self.tree.payoffs_id[self.index]
+        return self.tree.payoffs[index] if index >= 0 else None
+
+    @property
+    def players_in(self):
+        bits = int(self.tree.players_in[self.index])
+        return [bool(bits >> i & 1) for i in range(self.tree.rules.players)]
+
+    @property
+    def hands(self):
+        index = self.tree.hands_id[self.index]
+        return self.tree.hands[index] if index >= 0 else None
+
+class FlatHolecardChanceNode(FlatNode, HolecardChanceNode):
+    @property
+    def todeal(self):
+        return int(self.tree.todeal[self.index])
+
+class FlatBoardcardChanceNode(FlatNode, BoardcardChanceNode):
+    @property
+    def todeal(self):
+        return int(self.tree.todeal[self.index])
+
+    @property
+    def symmetries(self):
+        return [self.tree.symmetries[self.tree.symmetries_id[child]] for child in self.tree.children(self.index)]
+
+class FlatActionNode(FlatNode, ActionNode):
+    def action_node(self, action):
+        child = self.tree.action_child[self.index, action]
+        return self.tree.node(child) if child >= 0 else None
+
+    @property
+    def player(self):
+        return int(self.tree.player[self.index])
+
+    @property
+    def fold_action(self):
+        return self.action_node(FOLD)
+
+    @property
+    def call_action(self):
+        return self.action_node(CALL)
+
+    @property
+    def raise_action(self):
+        return self.action_node(RAISE)
+
+    @property
+    def player_view(self):
+        return self.tree.rules.infoset_format(self.player, self.holecards[self.player], self.board, self.bet_history)
+
+class FlatInformationSets(Mapping):
+    """
+    FlatTree.information_sets, built the first time it is read, so a
+    loaded tree computes no player views until a solver asks for them.
+    """
+    def __init__(self, flat):
+        self.flat = flat
+        self.sets = None
+
+    def table(self):
+        if self.sets is None:
+            self.sets = self.flat.information_sets()
+        return self.sets
+
+    def __getitem__(self, key):
+        return self.table()[key]
+
+    def __iter__(self):
+        return iter(self.table())
+
+    def __len__(self):
+        return len(self.table())
+
+class TreeCache(object):
+    """
+    Flat trees saved under directory/<tree_key>.tree, see
+    GameRules.tree_directory. Every process building the same tree loads
+    the same file.
+    """
+    def __init__(self, directory=DEFAULT_TREE_DIRECTORY):
+        self.directory = directory
+
+    def path(self, tree):
+        return os.path.join(self.directory, tree_key(tree) + '.tree')
+
+    def load(self, tree, mmap=True):
+        """
+        The saved FlatTree of tree, None if it hasn't been saved or was
+        saved by another format version.
+        """
+        path = self.path(tree)
+        if not os.path.exists(path):
+            return None
+        try:
+            return FlatTree.load(path, tree.rules, mmap, tree_key(tree))
+        except ValueError:
+            return None
+
+    def save(self, tree):
+        # Write it under another name first, so other processes never load a partly written tree
+        path = self.path(tree)
+        os.makedirs(self.directory, exist_ok=True)
+        partial_path = '{0}.{1}.tmp'.format(path, os.getpid())
+        tree.flat.save(partial_path, tree_key(tree))
+        os.replace(partial_path, path)
+
+VIEWS = { TERMINAL: FlatTerminalNode, HOLECARD_CHANCE: FlatHolecardChanceNode, BOARDCARD_CHANCE: FlatBoardcardChanceNode, ACTION: FlatActionNode }
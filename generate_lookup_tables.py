@@ -0,0 +1,272 @@
+"""
+Generates the LookupTables.Five, Six and Seven hand evaluator tables from
+first principles and writes them to tables/ as .npy files, which
+LookupTables memory-maps on first use.
+
+Ranks follow Cactus Kev's ordering: 1 is a royal flush, 7462 is 7-5-4-3-2.
+Usage: python generate_lookup_tables.py [output directory]
+"""
+from lookup_tables import LookupTables, TABLE_DIR, SPARSE_KEY_SHIFT
+from hand_evaluator import HandEvaluator
+from card import Card
+from itertools import combinations
+from functools import reduce
+from operator import mul
+import numpy as np
+import os
+import sys
+import time
+
+PRIMES = LookupTables.primes
+SUIT_PRIMES = PRIMES[:4]
+ACE = 12
+
+STRAIGHT_FLUSH, QUADS, FULL_HOUSE, FLUSH, STRAIGHT, TRIPS, TWO_PAIR, PAIR, HIGH_CARD = range(9)
+
+def rank_multisets(size, limit=4):
+    """
+    Every multiset of size ranks (0 is a deuce, 12 an ace), sorted ascending,
+    in which no rank appears more than limit times.
+    """
+    def helper(prefix, start):
+        if len(prefix) == size:
+            yield tuple(prefix)
+            return
+        for rank in range(start, 13):
+            if prefix[-limit:] != [rank] * limit:
+                yield from helper(prefix + [rank], rank)
+    return helper([], 0)
+
+def straight_high(ranks):
+    """
+    The top rank of a straight made by 5 distinct ranks, or None.
+    """
+    ranks = sorted(ranks)
+    if ranks == [0, 1, 2, 3, ACE]:
+        return 3
+    if ranks[4] - ranks[0] == 4 and len(set(ranks)) == 5:
+        return ranks[4]
+    return None
+
+def hand_strength(ranks, flush):
+    """
+    Sort key of a 5-card hand, smaller is better.
+    """
+    counts = sorted(set(ranks), key=lambda r: (ranks.count(r), r), reverse=True)
+    shape = sorted([ranks.count(r) for r in set(ranks)], reverse=True)
+    high = straight_high(ranks) if len(counts) == 5 else None
+    if high is not None:
+        return (STRAIGHT_FLUSH if flush else STRAIGHT, -high)
+    if flush:
+        category = FLUSH
+    elif shape[0] == 4:
+        category = QUADS
+    elif shape[:2] == [3, 2]:
+        category = FULL_HOUSE
+    elif shape[0] == 3:
+        category = TRIPS
+    elif shape[:2] == [2, 2]:
+        category = TWO_PAIR
+    elif shape[0] == 2:
+        category = PAIR
+    else:
+        category = HIGH_CARD
+    return (category,) + tuple(-r for r in counts)
+
+def five_card_ranks():
+    """
+    Map (ranks, flush) of every distinct 5-card hand class to its rank.
+    """
+    hands = [(ranks, False) for ranks in rank_multisets(5)]
+    hands += [(ranks, True) for ranks in combinations(range(13), 5)]
+    hands.sort(key=lambda hand: hand_strength(*hand))
+    return {hand: rank + 1 for rank, hand in enumerate(hands)}
+
+def rank_mask(ranks):
+    return reduce(lambda mask, r: mask | (1 << r), ranks, 0)
+
+def prime_product(ranks):
+    return reduce(mul, [PRIMES[r] for r in ranks], 1)
+
+def xors(ranks):
+    """
+    odd_xor and even_xor as computed by the Six and Seven evaluators.
+    """
+    odd_xor = reduce(lambda x, r: x ^ (1 << r), ranks, 0)
+    return odd_xor, rank_mask(ranks) ^ odd_xor
+
+def popcount(x):
+    return bin(x).count('1')
+
+def best_nonflush_ranks(five, size):
+    """
+    Best non-flush rank of every rank multiset of size cards.
+    """
+    return {ranks: min(five[(sub, False)] for sub in combinations(ranks, 5)) for ranks in rank_multisets(size)}
+
+def best_flush_ranks(five, size):
+    """
+    Best flush rank of every rank mask of 5 to size cards.
+    """
+    flushes = {}
+    for flush_size in range(5, size + 1):
+        for ranks in combinations(range(13), flush_size):
+            flushes[rank_mask(ranks)] = min(five[(sub, True)] for sub in combinations(ranks, 5))
+    return flushes
+
+def flush_suits(size):
+    """
+    Suit prime products of every size card hand holding 5 or more of one suit.
+    """
+    table = {}
+    for suits in rank_multisets(size, limit=size):
+        if max(suits) > 3:
+            continue
+        for suit in range(4):
+            if suits.count(suit) >= 5:
+                table[reduce(mul, [SUIT_PRIMES[s] for s in suits])] = SUIT_PRIMES[suit]
+    return table
+
+def rank_percentiles(five, size):
+    """
+    For every rank, the fraction of size card hands that rank strictly worse.
+    A hand's rank only depends on its rank multiset and on the ranks of a suit
+    holding 5 or more cards, so count hands per multiset instead of dealing them.
+    """
+    nonflush, flushes = best_nonflush_ranks(five, size), best_flush_ranks(five, size)
+    counts = np.zeros(7463, np.int64)
+    for ranks, rank in nonflush.items():
+        shape = [ranks.count(r) for r in set(ranks)]
+        hands = reduce(mul, [choose(4, c) for c in shape])
+        for flush_size in range(5, size + 1):
+            for flush in combinations(sorted(set(ranks)), flush_size):
+                # The flush suit holds exactly these ranks, the rest are in the other 3 suits
+                ways = 4 * reduce(mul, [choose(3, ranks.count(r) - (r in flush)) for r in set(ranks)])
+                counts[min(rank, flushes[rank_mask(flush)])] += ways
+                hands -= ways
+        counts[rank] += hands
+    total = counts.sum()
+    assert(total == choose(52, size))
+    return (total - np.cumsum(counts)[1:]) / float(total)
+
+def choose(n, k):
+    if k < 0 or k > n:
+        return 0
+    return reduce(mul, range(n - k + 1, n + 1), 1) // reduce(mul, range(1, k + 1), 1)
+
+def dense(table, size):
+    array = np.zeros(size, np.int16)
+    for key, value in table.items():
+        array[key] = value
+    return array
+
+def sparse(table):
+    """
+    A dict as one sorted int64 array of (key << SPARSE_KEY_SHIFT) | value, see lookup_tables.lookup.
+    """
+    return np.array(sorted((key << SPARSE_KEY_SHIFT) | value for key, value in table.items()), np.int64)
+
+def card_to_binary(evaluator):
+    return np.array([evaluator.card_to_binary(Card.from_code(code)) for code in range(52)], np.int64)
+
+def five_tables(five):
+    flushes = {}
+    unique5 = {}
+    pairs = {}
+    for (ranks, flush), rank in five.items():
+        if flush:
+            flushes[rank_mask(ranks)] = rank
+        elif len(set(ranks)) == 5:
+            unique5[rank_mask(ranks)] = rank
+        else:
+            pairs[prime_product(ranks)] = rank
+    tables = {
+        'card_to_binary': card_to_binary(HandEvaluator.Five),
+        'flushes': dense(flushes, 7937),
+        'unique5': dense(unique5, 7937),
+        'pairs': sparse(pairs),
+    }
+    for size in (5, 6, 7):
+        tables['rank_to_percentile_{0}'.format(size)] = rank_percentiles(five, size)
+    return tables
+
+def six_tables(five):
+    nonflush, flushes = best_nonflush_ranks(five, 6), best_flush_ranks(five, 6)
+    odd_xors = {}
+    even_xors = {}
+    pair_xors = {}
+    prime_products = {}
+    # Same odd-even cases as HandEvaluator.Six.evaluate_rank
+    for ranks, rank in nonflush.items():
+        odd_xor, even_xor = xors(ranks)
+        odd_popcount, even_popcount = popcount(odd_xor), popcount(even_xor)
+        if even_xor == 0:
+            if odd_popcount == 4:
+                prime_products[prime_product(ranks)] = rank
+            else:
+                odd_xors[odd_xor] = rank
+        elif odd_xor == 0:
+            if even_popcount == 2:
+                prime_products[prime_product(ranks)] = rank
+            else:
+                even_xors[even_xor] = rank
+        elif odd_popcount == 4 or even_popcount == 2:
+            pair_xors[(even_xor << 13) | odd_xor] = rank
+        else:
+            prime_products[prime_product(ranks)] = rank
+    return {
+        'card_to_binary': card_to_binary(HandEvaluator.Six),
+        'prime_products_to_flush': sparse(flush_suits(6)),
+        'flush_rank_bits_to_rank': dense(flushes, 1 << 13),
+        'prime_products_to_rank': sparse(prime_products),
+        'odd_xors_to_rank': dense(odd_xors, 1 << 13),
+        'even_xors_to_rank': dense(even_xors, 1 << 13),
+        'even_xors_to_odd_xors_to_rank': sparse(pair_xors),
+    }
+
+def seven_tables(five):
+    nonflush, flushes = best_nonflush_ranks(five, 7), best_flush_ranks(five, 7)
+    odd_xors = {}
+    pair_xors = {}
+    prime_products = {}
+    # Same odd-even cases as HandEvaluator.Seven.evaluate_rank
+    for ranks, rank in nonflush.items():
+        odd_xor, even_xor = xors(ranks)
+        odd_popcount, even_popcount = popcount(odd_xor), popcount(even_xor)
+        if even_xor == 0:
+            if odd_popcount == 7:
+                odd_xors[odd_xor] = rank
+            else:
+                prime_products[prime_product(ranks)] = rank
+        elif odd_popcount == 5 or (odd_popcount == 3 and even_popcount == 2) or (odd_popcount == 1 and even_popcount != 2):
+            pair_xors[(even_xor << 13) | odd_xor] = rank
+        else:
+            prime_products[prime_product(ranks)] = rank
+    # Every 5, 6 and 7-card rank multiset by prime product, see BoardState
+    multiset_ranks = {}
+    for size in (5, 6, 7):
+        for ranks, rank in (nonflush if size == 7 else best_nonflush_ranks(five, size)).items():
+            multiset_ranks[prime_product(ranks)] = rank
+    return {
+        'card_to_binary': card_to_binary(HandEvaluator.Seven),
+        'nonflush_prime_products_to_rank': sparse(multiset_ranks),
+        'prime_products_to_flush': sparse(flush_suits(7)),
+        'flush_rank_bits_to_rank': dense(flushes, 1 << 13),
+        'odd_xors_to_rank': dense(odd_xors, 1 << 13),
+        'prime_products_to_rank': sparse(prime_products),
+        'even_xors_to_odd_xors_to_rank': sparse(pair_xors),
+    }
+
+def generate(directory=TABLE_DIR):
+    five = five_card_ranks()
+    assert(len(five) == 7462)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    for prefix, tables in [('five', five_tables(five)), ('six', six_tables(five)), ('seven', seven_tables(five))]:
+        for name, table in tables.items():
+            np.save(os.path.join(directory, '{0}_{1}.npy'.format(prefix, name)), table)
+
+if __name__ == '__main__':
+    start = time.time()
+    generate(*sys.argv[1:])
+    print('Generated lookup tables in {0:.1f}s'.format(time.time() - start))
@@ -1,12 +1,118 @@
-from lookup_tables import LookupTables
+from lookup_tables import LookupTables, lookup_batch
+from board_cache import BoardCache
+from isomorphism import CODE_PERMUTATIONS, canonical_board
 from popcount import PopCount
-from itertools import combinations
+from preflop_equity import PreflopEquity
 from operator import mul, __or__, __and__, __xor__
 from functools import reduce
+from itertools import combinations
+import numpy as np
+
+# Memory cap of HandEvaluator.board_ranks, resize it to change
+BOARD_CACHE_BYTES = 64 * 1024 * 1024
+# Rank of an impossible hand, worse than every real one
+NO_HAND = 7463
+RANK_PRIMES = np.array(LookupTables.primes, np.int64)
+# Product of the rank primes of each pair of hole ranks, indexed by 13 * rank + rank
+HOLE_RANK_PRIME_PRODUCTS = np.multiply.outer(RANK_PRIMES, RANK_PRIMES).ravel()
+# SUIT_RANK_BITS[suit][code] is the rank bit of card code if it is in suit (Card.suit - 1), else 0
+SUIT_RANK_BITS = np.where(np.arange(52) & 3 == np.arange(4)[:, None], 1 << (np.arange(52) >> 2), 0)
+# The 6 pairs of an Omaha hand's 4 hole cards, by column
+OMAHA_HOLE_PAIRS = np.array(list(combinations(range(4), 2)), np.intp)
 
 class HandLengthException(Exception):
     pass
 
+class BoardState(object):
+    """
+    A board of 3, 4 or 5 card codes reduced once (prime product of its ranks,
+    suit counts, rank bits of its most common suit) so it can be completed by
+    many pairs of hole cards. Without a flush the rank of a hand only depends
+    on its rank multiset, so the board keeps the rank of each of the 13 x 13
+    pairs of hole ranks and most hands are a single array read. Hands that
+    make a flush are ranked from the rank bits in the flush suit.
+    """
+    def __init__(self, board):
+        if len(board) not in (3, 4, 5):
+            raise HandLengthException("Only 3, 4 or 5-card boards are supported by BoardState")
+        self.board = np.asarray(board, np.intp)
+        ranks, suits = self.board >> 2, self.board & 3
+        prime_product = int(np.prod(RANK_PRIMES[ranks]))
+        self.nonflush_ranks = lookup_batch(LookupTables.Seven.nonflush_prime_products_to_rank,
+            prime_product * HOLE_RANK_PRIME_PRODUCTS).astype(np.int32)
+        # At most 7 cards, so only the board's most common suit can make a flush
+        suit_counts = np.bincount(suits, minlength=4)
+        self.flush_suit = int(np.argmax(suit_counts))
+        self.flush_holes_needed = 5 - int(suit_counts[self.flush_suit])
+        self.flush_bits = int(np.bitwise_or.reduce(1 << ranks[suits == self.flush_suit]))
+
+    def complete_rank_batch(self, holes):
+        """
+        Rank the board completed by each row of an (N, 2) array of hole
+        card codes. Returns an (N,) int32 array of ranks.
+        """
+        holes = np.asarray(holes, np.intp)
+        if holes.ndim != 2 or holes.shape[1] != 2:
+            raise HandLengthException("Only (N, 2) hole card code arrays are supported by complete_rank_batch")
+        ranks = self.nonflush_ranks[(holes[:, 0] >> 2) * 13 + (holes[:, 1] >> 2)]
+        if self.flush_holes_needed <= 2:
+            suit_rank_bits = SUIT_RANK_BITS[self.flush_suit]
+            bits = self.flush_bits | suit_rank_bits[holes[:, 0]] | suit_rank_bits[holes[:, 1]]
+            # Cards of one suit have distinct ranks, so the bits count the cards in the suit.
+            # A flush beats any other hand of 7 cards or less.
+            flush = LookupTables.popcount[bits] >= 5
+            ranks[flush] = LookupTables.Seven.flush_rank_bits_to_rank[bits[flush]]
+        return ranks
+
+class BoardRanks(object):
+    """
+    The rank of every 2-card hand that can be dealt alongside one board of
+    3, 4 or 5 card codes, kept sorted so the number of opponent hands a rank
+    beats is a binary search away.
+    """
+    def __init__(self, board):
+        self.board = tuple(board)
+        remaining = np.setdiff1d(np.arange(52), self.board)
+        n = len(remaining)
+        self.index = np.full(52, -1, np.intp)
+        self.index[remaining] = np.arange(n)
+        first, second = np.triu_indices(n, 1)
+        holes = np.column_stack([remaining[first], remaining[second]])
+        ranks = BoardState(self.board).complete_rank_batch(holes).astype(np.int16)
+        # hand_ranks[i, j] is the rank of the hand holding remaining cards i and j
+        self.hand_ranks = np.full((n, n), NO_HAND, np.int16)
+        self.hand_ranks[first, second] = ranks
+        self.hand_ranks[second, first] = ranks
+        # Each row sorted, the diagonal sorts last and is dropped
+        self.card_ranks = np.sort(self.hand_ranks, axis=1)[:, :-1]
+        self.ranks = np.sort(ranks)
+        # Opponents can't hold either of our cards
+        self.opponent_count = (n - 2) * (n - 3) // 2
+        self.nbytes = self.index.nbytes + self.hand_ranks.nbytes + self.card_ranks.nbytes + self.ranks.nbytes
+
+    def beaten(ranks, rank):
+        """
+        Number of hands in sorted ranks that rank beats, ties counting half.
+        """
+        better = ranks.searchsorted(rank, 'left')
+        worse = ranks.searchsorted(rank, 'right')
+        return len(ranks) - worse + 0.5 * (worse - better)
+
+    def percentile(self, hand):
+        """
+        Fraction of opponent hands beaten by the 2 card codes in hand, as
+        HandEvaluator.evaluate_hand.
+        """
+        i, j = self.index[hand[0]], self.index[hand[1]]
+        rank = self.hand_ranks[i, j]
+        # Card removal: take out the hands holding either of our cards. Our
+        # own hand is in both rows, so add it back once, as a tie.
+        hands_beaten = BoardRanks.beaten(self.ranks, rank) - BoardRanks.beaten(self.card_ranks[i], rank) \
+            - BoardRanks.beaten(self.card_ranks[j], rank) + 0.5
+        return float(hands_beaten) / self.opponent_count
+
+    beaten = staticmethod(beaten)
+
 class HandEvaluator:
     
     class Two:
@@ -24,7 +130,19 @@ class HandEvaluator:
                     return LookupTables.Two.suited_ranks_to_percentile[hand[1].rank][hand[0].rank]
             else:
                 return LookupTables.Two.unsuited_ranks_to_percentile[hand[0].rank][hand[1].rank]
+
+        def evaluate_equity(hand, opponent):
+            """
+            Using lookup table, return the preflop all-in equity of the class
+            of your hand with two cards (e.g. AKs) against the class of
+            opponent's, see preflop_equity.py
+            """
+            if len(hand) != 2 or len(opponent) != 2:
+                raise HandLengthException("Only 2-card hands are supported by the Two evaluator")
+            return PreflopEquity.class_equity(hand, opponent)
+
         evaluate_percentile = staticmethod(evaluate_percentile)
+        evaluate_equity = staticmethod(evaluate_equity)
             
     class Five:
         def card_to_binary(card):
@@ -54,7 +172,7 @@ class HandEvaluator:
             return b_mask | r_mask | p_mask | cdhs_mask
 
         def card_to_binary_lookup(card):
-            return LookupTables.Five.card_to_binary[card.rank][card.suit]
+            return LookupTables.Five.card_to_binary_list[card.to_code()]
 
         # TODO: Return a class of hand too? Would be useful to see if we can make
         # a draw or something.
@@ -67,21 +185,20 @@ class HandEvaluator:
             
             # This implementation uses the binary representation from
             # card_to_binary
-            card_to_binary = HandEvaluator.Five.card_to_binary_lookup
-
             # bh stands for binary hand
-            bh = list(map(card_to_binary, hand))
+            card_to_binary = LookupTables.Five.card_to_binary_list
+            bh = [card_to_binary[card.to_code()] for card in hand]
             has_flush = reduce(__and__, bh, 0xF000)
             # This is a unique number based on the ranks if your cards,
             # assuming your cards are all different
             q = reduce(__or__, bh) >> 16
             if has_flush:
                 # Look up the rank of this flush
-                return LookupTables.Five.flushes[q]
+                return LookupTables.Five.flushes_list[q]
             else:
                 # The q still works as a key if you have 5 unique cards,
                 # so see if we can look it up
-                possible_rank = LookupTables.Five.unique5[q]
+                possible_rank = LookupTables.Five.unique5_list[q]
                 if possible_rank != 0:
                     return possible_rank
                 else:
@@ -89,14 +206,34 @@ class HandEvaluator:
                     # Compute the unique product of primes, because we have a pair
                     # or trips, etc. Use the product to look up the rank.
                     q = reduce(mul, [card & 0xFF for card in bh])
-                    # Here, use dict instead of sparse array (basically hashing)
-                    # I didn't bother using "perfect hash", the python hashing
-                    # shouldn't be terrible
-                    return LookupTables.Five.pairs.get(q)
+                    # Here, use a sorted sparse table instead of a dense array
+                    return LookupTables.Five.pairs_dict.get(q)
+
+        def evaluate_rank_batch(hands):
+            """
+            Vectorized evaluate_rank over an (N, 5) array of 0..51 card codes
+            (see Card.to_code). Returns an (N,) int32 array of ranks.
+            """
+            hands = np.asarray(hands, np.intp)
+            if hands.ndim != 2 or hands.shape[1] != 5:
+                raise HandLengthException("Only (N, 5) card code arrays are supported by the Five batch evaluator")
+            tables = LookupTables.Five
+
+            bh = tables.card_to_binary[hands]
+            has_flush = np.bitwise_and.reduce(bh, axis=1) & 0xF000 != 0
+            q = np.bitwise_or.reduce(bh, axis=1) >> 16
+            ranks = np.where(has_flush, tables.flushes[q], tables.unique5[q]).astype(np.int32)
+            # Pairs, trips etc. are keyed by the prime product as in evaluate_rank
+            paired = ranks == 0
+            if paired.any():
+                prime_product = np.prod(bh[paired] & 0xFF, axis=1)
+                ranks[paired] = lookup_batch(tables.pairs, prime_product)
+            return ranks
 
         card_to_binary = staticmethod(card_to_binary)
         card_to_binary_lookup = staticmethod(card_to_binary_lookup)
         evaluate_rank = staticmethod(evaluate_rank)
+        evaluate_rank_batch = staticmethod(evaluate_rank_batch)
     
     class Six:
         def card_to_binary(card):
@@ -126,7 +263,7 @@ class HandEvaluator:
             return b_mask | q_mask | r_mask | p_mask
         
         def card_to_binary_lookup(card):
-            return LookupTables.Six.card_to_binary[card.rank][card.suit]
+            return LookupTables.Six.card_to_binary_list[card.to_code()]
     
         def evaluate_rank(hand):
             """
@@ -137,17 +274,15 @@ class HandEvaluator:
                 raise HandLengthException("Only 6-card hands are supported by the Six evaluator")
             
             # bh stands for binary hand, map to that representation
-            card_to_binary = HandEvaluator.Six.card_to_binary_lookup
-            bh = list(map(card_to_binary, hand))
+            card_to_binary = LookupTables.Six.card_to_binary_list
+            bh = [card_to_binary[card.to_code()] for card in hand]
         
             # We can determine if it's a flush using a lookup table.
             # Basically use prime number trick but map to bool instead of rank
             # Once you have a flush, there is no other higher hand you can make
             # except straight flush, so just need to determine the highest flush
             flush_prime = reduce(mul, [(card >> 12) & 0xF for card in bh])
-            flush_suit = False
-            if flush_prime in LookupTables.Six.prime_products_to_flush:
-                flush_suit = LookupTables.Six.prime_products_to_flush[flush_prime]
+            flush_suit = LookupTables.Six.prime_products_to_flush_dict.get(flush_prime, False)
         
             # Now use ranks to determine hand via lookup
             odd_xor = reduce(__xor__, bh) >> 16
@@ -159,11 +294,11 @@ class HandEvaluator:
                     # There might be 0 or 1 cards in the wrong suit, so filter
                     # TODO: There might be a faster way?
                     bits = reduce(__or__, [(card >> 16) for card in [card for card in bh if (card >> 12) & 0xF == flush_suit]])
-                    return LookupTables.Six.flush_rank_bits_to_rank[bits]
+                    return LookupTables.Six.flush_rank_bits_to_rank_list[bits]
                 else:
                     # you have a pair, one card in the flush suit,
                     # so just use the ranks you have by or'ing the two
-                    return LookupTables.Six.flush_rank_bits_to_rank[odd_xor | even_xor]
+                    return LookupTables.Six.flush_rank_bits_to_rank_list[odd_xor | even_xor]
         
             # Otherwise, get ready for a wild ride:
         
@@ -196,31 +331,78 @@ class HandEvaluator:
                 odd_popcount = PopCount.popcount(odd_xor)
                 if odd_popcount == 4: # 4-0
                     prime_product = reduce(mul, [card & 0xFF for card in bh])
-                    return LookupTables.Six.prime_products_to_rank[prime_product]
+                    return LookupTables.Six.prime_products_to_rank_dict[prime_product]
                 else: # 6-0, 2-0
-                    return LookupTables.Six.odd_xors_to_rank[odd_xor]
+                    return LookupTables.Six.odd_xors_to_rank_list[odd_xor]
             elif odd_xor == 0: # 0-x
                 even_popcount = PopCount.popcount(even_xor)
                 if even_popcount == 2: # 0-2
                     prime_product = reduce(mul, [card & 0xFF for card in bh])
-                    return LookupTables.Six.prime_products_to_rank[prime_product]
+                    return LookupTables.Six.prime_products_to_rank_dict[prime_product]
                 else: # 0-3
-                    return LookupTables.Six.even_xors_to_rank[even_xor]
+                    return LookupTables.Six.even_xors_to_rank_list[even_xor]
             else: # odd_popcount is 4 or 2
                 odd_popcount = PopCount.popcount(odd_xor)
                 if odd_popcount == 4: # 4-1
-                    return LookupTables.Six.even_xors_to_odd_xors_to_rank[even_xor][odd_xor]
+                    return LookupTables.Six.even_xors_to_odd_xors_to_rank_dict[(even_xor << 13) | odd_xor]
                 else: # 2-x
                     even_popcount = PopCount.popcount(even_xor)
                     if even_popcount == 2: # 2-2
-                        return LookupTables.Six.even_xors_to_odd_xors_to_rank[even_xor][odd_xor]
+                        return LookupTables.Six.even_xors_to_odd_xors_to_rank_dict[(even_xor << 13) | odd_xor]
                     else: # 2-1
                         prime_product = reduce(mul, [card & 0xFF for card in bh])
-                        return LookupTables.Six.prime_products_to_rank[prime_product]
+                        return LookupTables.Six.prime_products_to_rank_dict[prime_product]
+
+        def evaluate_rank_batch(hands):
+            """
+            Vectorized evaluate_rank over an (N, 6) array of 0..51 card codes
+            (see Card.to_code). Returns an (N,) int32 array of ranks.
+            """
+            hands = np.asarray(hands, np.intp)
+            if hands.ndim != 2 or hands.shape[1] != 6:
+                raise HandLengthException("Only (N, 6) card code arrays are supported by the Six batch evaluator")
+            tables = LookupTables.Six
+            popcount = LookupTables.popcount
+
+            bh = tables.card_to_binary[hands]
+            rank_bits = bh >> 16
+            suit_primes = (bh >> 12) & 0xF
+            flush_suit = lookup_batch(tables.prime_products_to_flush, np.prod(suit_primes, axis=1))
+            odd_xor = np.bitwise_xor.reduce(rank_bits, axis=1)
+            even_xor = np.bitwise_or.reduce(rank_bits, axis=1) ^ odd_xor
+            odd_popcount = popcount[odd_xor]
+            even_popcount = popcount[even_xor]
+
+            ranks = np.zeros(len(hands), np.int32)
+
+            # Flushes: OR together the rank bits of the cards in the flush suit
+            flush = flush_suit != 0
+            if flush.any():
+                in_suit = suit_primes[flush] == flush_suit[flush, None]
+                bits = np.bitwise_or.reduce(np.where(in_suit, rank_bits[flush], 0), axis=1)
+                ranks[flush] = tables.flush_rank_bits_to_rank[bits]
+
+            # Same odd-even XOR cases as evaluate_rank, as masks over the batch
+            odd_only = ~flush & (even_xor == 0) & (odd_popcount != 4) # 6-0, 2-0
+            even_only = ~flush & (odd_xor == 0) & (even_popcount != 2) # 0-3
+            by_xors = ~flush & (even_xor != 0) & (odd_xor != 0) & ((odd_popcount == 4) # 4-1
+                | (even_popcount == 2)) # 2-2
+            by_primes = ~(flush | odd_only | even_only | by_xors) # 4-0, 0-2, 2-1
+
+            ranks[odd_only] = tables.odd_xors_to_rank[odd_xor[odd_only]]
+            ranks[even_only] = tables.even_xors_to_rank[even_xor[even_only]]
+            if by_xors.any():
+                keys = (even_xor[by_xors] << 13) | odd_xor[by_xors]
+                ranks[by_xors] = lookup_batch(tables.even_xors_to_odd_xors_to_rank, keys)
+            if by_primes.any():
+                prime_product = np.prod(bh[by_primes] & 0xFF, axis=1)
+                ranks[by_primes] = lookup_batch(tables.prime_products_to_rank, prime_product)
+            return ranks
 
         card_to_binary = staticmethod(card_to_binary)
         card_to_binary_lookup = staticmethod(card_to_binary_lookup)
         evaluate_rank = staticmethod(evaluate_rank)
+        evaluate_rank_batch = staticmethod(evaluate_rank_batch)
     
     class Seven:
         def card_to_binary(card):
@@ -236,7 +418,7 @@ class HandEvaluator:
             return b_mask | q_mask | r_mask | p_mask
 
         def card_to_binary_lookup(card):
-            return LookupTables.Seven.card_to_binary[card.rank][card.suit]
+            return LookupTables.Seven.card_to_binary_list[card.to_code()]
         
         def evaluate_rank(hand):
             """
@@ -247,14 +429,12 @@ class HandEvaluator:
                 raise HandLengthException("Only 7-card hands are supported by the Seven evaluator")
             
             # bh stands for binary hand, map to that representation
-            card_to_binary = HandEvaluator.Seven.card_to_binary_lookup
-            bh = list(map(card_to_binary, hand))
+            card_to_binary = LookupTables.Seven.card_to_binary_list
+            bh = [card_to_binary[card.to_code()] for card in hand]
         
             # Use a lookup table to determine if it's a flush as with 6 cards
             flush_prime = reduce(mul, [(card >> 12) & 0xF for card in bh])
-            flush_suit = False
-            if flush_prime in LookupTables.Seven.prime_products_to_flush:
-                flush_suit = LookupTables.Seven.prime_products_to_flush[flush_prime]
+            flush_suit = LookupTables.Seven.prime_products_to_flush_dict.get(flush_prime, False)
         
             # Now use ranks to determine hand via lookup
             odd_xor = reduce(__xor__, bh) >> 16
@@ -266,13 +446,13 @@ class HandEvaluator:
                 if even_xor == 0:
                     # TODO: There might be a faster way?
                     bits = reduce(__or__, [(card >> 16) for card in [card for card in bh if (card >> 12) & 0xF == flush_suit]])
-                    return LookupTables.Seven.flush_rank_bits_to_rank[bits]
+                    return LookupTables.Seven.flush_rank_bits_to_rank_list[bits]
                 else:
                     if even_popcount == 2:
-                        return LookupTables.Seven.flush_rank_bits_to_rank[odd_xor | even_xor]
+                        return LookupTables.Seven.flush_rank_bits_to_rank_list[odd_xor | even_xor]
                     else:
                         bits = reduce(__or__, [(card >> 16) for card in [card for card in bh if (card >> 12) & 0xF == flush_suit]])
-                        return LookupTables.Seven.flush_rank_bits_to_rank[bits]
+                        return LookupTables.Seven.flush_rank_bits_to_rank_list[bits]
             
             # Odd-even XOR again, see Six.evaluate_rank for details
             # 7 is odd, so you have to have an odd number of bits in odd_xor
@@ -289,33 +469,133 @@ class HandEvaluator:
             if even_xor == 0: # x-0                
                 odd_popcount = PopCount.popcount(odd_xor)
                 if odd_popcount == 7: # 7-0
-                    return LookupTables.Seven.odd_xors_to_rank[odd_xor]
+                    return LookupTables.Seven.odd_xors_to_rank_list[odd_xor]
                 else: # 5-0, 3-0
                     prime_product = reduce(mul, [card & 0xFF for card in bh])
-                    return LookupTables.Seven.prime_products_to_rank[prime_product]
+                    return LookupTables.Seven.prime_products_to_rank_dict[prime_product]
             else:
                 odd_popcount = PopCount.popcount(odd_xor)
                 if odd_popcount == 5: # 5-1
-                    return LookupTables.Seven.even_xors_to_odd_xors_to_rank[even_xor][odd_xor]
+                    return LookupTables.Seven.even_xors_to_odd_xors_to_rank_dict[(even_xor << 13) | odd_xor]
                 elif odd_popcount == 3:
                     even_popcount = PopCount.popcount(even_xor)
                     if even_popcount == 2: # 3-2
-                        return LookupTables.Seven.even_xors_to_odd_xors_to_rank[even_xor][odd_xor]
+                        return LookupTables.Seven.even_xors_to_odd_xors_to_rank_dict[(even_xor << 13) | odd_xor]
                     else: # 3-1
                         prime_product = reduce(mul, [card & 0xFF for card in bh])
-                        return LookupTables.Seven.prime_products_to_rank[prime_product]
+                        return LookupTables.Seven.prime_products_to_rank_dict[prime_product]
                 else:
                     even_popcount = PopCount.popcount(even_xor)
                     if even_popcount == 3: # 1-3
-                        return LookupTables.Seven.even_xors_to_odd_xors_to_rank[even_xor][odd_xor]
+                        return LookupTables.Seven.even_xors_to_odd_xors_to_rank_dict[(even_xor << 13) | odd_xor]
                     elif even_popcount == 2: # 1-2
                         prime_product = reduce(mul, [card & 0xFF for card in bh])
-                        return LookupTables.Seven.prime_products_to_rank[prime_product]
+                        return LookupTables.Seven.prime_products_to_rank_dict[prime_product]
                     else: # 1-1
-                        return LookupTables.Seven.even_xors_to_odd_xors_to_rank[even_xor][odd_xor]
+                        return LookupTables.Seven.even_xors_to_odd_xors_to_rank_dict[(even_xor << 13) | odd_xor]
+
+        def evaluate_rank_batch(hands):
+            """
+            Vectorized evaluate_rank over an (N, 7) array of 0..51 card codes
+            (see Card.to_code). Returns an (N,) int32 array of ranks.
+            """
+            hands = np.asarray(hands, np.intp)
+            if hands.ndim != 2 or hands.shape[1] != 7:
+                raise HandLengthException("Only (N, 7) card code arrays are supported by the Seven batch evaluator")
+            tables = LookupTables.Seven
+            popcount = LookupTables.popcount
+
+            bh = tables.card_to_binary[hands]
+            rank_bits = bh >> 16
+            suit_primes = (bh >> 12) & 0xF
+            flush_suit = lookup_batch(tables.prime_products_to_flush, np.prod(suit_primes, axis=1))
+            odd_xor = np.bitwise_xor.reduce(rank_bits, axis=1)
+            even_xor = np.bitwise_or.reduce(rank_bits, axis=1) ^ odd_xor
+            odd_popcount = popcount[odd_xor]
+            even_popcount = popcount[even_xor]
+
+            ranks = np.zeros(len(hands), np.int32)
+
+            # Flushes: OR together the rank bits of the cards in the flush suit.
+            # This covers every case evaluate_rank splits out by even_popcount.
+            flush = flush_suit != 0
+            if flush.any():
+                in_suit = suit_primes[flush] == flush_suit[flush, None]
+                bits = np.bitwise_or.reduce(np.where(in_suit, rank_bits[flush], 0), axis=1)
+                ranks[flush] = tables.flush_rank_bits_to_rank[bits]
+
+            # Same odd-even XOR cases as evaluate_rank, as masks over the batch
+            odd_only = ~flush & (even_xor == 0) & (odd_popcount == 7) # 7-0
+            by_xors = ~flush & (even_xor != 0) & ((odd_popcount == 5) # 5-1
+                | ((odd_popcount == 3) & (even_popcount == 2)) # 3-2
+                | ((odd_popcount == 1) & (even_popcount != 2))) # 1-3, 1-1
+            by_primes = ~(flush | odd_only | by_xors) # 5-0, 3-0, 3-1, 1-2
+
+            ranks[odd_only] = tables.odd_xors_to_rank[odd_xor[odd_only]]
+            if by_xors.any():
+                keys = (even_xor[by_xors] << 13) | odd_xor[by_xors]
+                ranks[by_xors] = lookup_batch(tables.even_xors_to_odd_xors_to_rank, keys)
+            if by_primes.any():
+                prime_product = np.prod(bh[by_primes] & 0xFF, axis=1)
+                ranks[by_primes] = lookup_batch(tables.prime_products_to_rank, prime_product)
+            return ranks
+
         card_to_binary = staticmethod(card_to_binary)
         card_to_binary_lookup = staticmethod(card_to_binary_lookup)
         evaluate_rank = staticmethod(evaluate_rank)
+        evaluate_rank_batch = staticmethod(evaluate_rank_batch)
+
+    class Omaha:
+        def reduce_board(board):
+            """
+            Reduce a board of 3, 4 or 5 card codes for the must-use-two rule.
+            Without a flush the best rank only depends on the ranks of the 2
+            hole cards, so the best over every board triple is kept for each
+            of the 13 x 13 pairs of hole ranks. A flush needs 3 board cards of
+            one suit, so the suited triples are kept as (suit, rank bits).
+            """
+            board = np.asarray(board, np.intp)
+            if len(board) not in (3, 4, 5):
+                raise HandLengthException("Only 3, 4 or 5-card boards are supported by the Omaha evaluator")
+            triples = board[np.array(list(combinations(range(len(board)), 3)), np.intp)]
+            ranks, suits = triples >> 2, triples & 3
+            bits = np.bitwise_or.reduce(1 << ranks, axis=1)
+            # (triples, 169) rank bits and prime products of each triple with each pair of hole ranks
+            hole_bits = (1 << np.arange(13))[:, None] | (1 << np.arange(13))
+            hand_bits = bits[:, None] | hole_bits.ravel()
+            prime_products = np.prod(RANK_PRIMES[ranks], axis=1)[:, None] * HOLE_RANK_PRIME_PRODUCTS
+            # Five distinct ranks are a straight or high card, anything else is paired
+            nonflush_ranks = LookupTables.Five.unique5[hand_bits].astype(np.int32)
+            paired = nonflush_ranks == 0
+            nonflush_ranks[paired] = lookup_batch(LookupTables.Five.pairs, prime_products[paired])
+            suited = np.flatnonzero((suits == suits[:, :1]).all(axis=1))
+            return nonflush_ranks.min(axis=0), [(int(suits[t, 0]), int(bits[t])) for t in suited]
+
+        def evaluate_rank_batch(holes, board):
+            """
+            Rank of the best hand of exactly 2 of the 4 hole cards and exactly
+            3 board cards, for each row of an (N, 4) array of hole card codes
+            and a board of 3, 4 or 5 card codes, the 60 five-card hands of an
+            Omaha river at once. Returns an (N,) int32 array of ranks.
+            """
+            holes = np.asarray(holes, np.intp)
+            if holes.ndim != 2 or holes.shape[1] != 4:
+                raise HandLengthException("Only (N, 4) hole card code arrays are supported by the Omaha evaluator")
+            nonflush_ranks, suited_triples = HandEvaluator.Omaha.reduce_board(board)
+            # (N, 6) for the 6 pairs of hole cards
+            pairs = holes[:, OMAHA_HOLE_PAIRS]
+            ranks = nonflush_ranks[(pairs[..., 0] >> 2) * 13 + (pairs[..., 1] >> 2)]
+            if suited_triples:
+                suits = pairs & 3
+                pair_suits = np.where(suits[..., 0] == suits[..., 1], suits[..., 0], -1)
+                pair_bits = (1 << (pairs[..., 0] >> 2)) | (1 << (pairs[..., 1] >> 2))
+                for suit, bits in suited_triples:
+                    flush = pair_suits == suit
+                    ranks[flush] = np.minimum(ranks[flush], LookupTables.Five.flushes[bits | pair_bits[flush]])
+            return ranks.min(axis=1, initial=NO_HAND)
+
+        reduce_board = staticmethod(reduce_board)
+        evaluate_rank_batch = staticmethod(evaluate_rank_batch)
 
     # These are the main functions
     def evaluate_hand(hand, board=[]):
@@ -331,31 +611,36 @@ class HandEvaluator:
         cards = list(hand) + list(board)
         if len(cards) == 2:
             return HandEvaluator.Two.evaluate_percentile(hand)
-        elif len(cards) == 5:
-            evaluator = HandEvaluator.Five
-        elif len(cards) == 6:
-            evaluator = HandEvaluator.Six
-        elif len(cards) == 7:
-            evaluator = HandEvaluator.Seven
-        else:
+        elif len(cards) not in (5, 6, 7):
             # wrong number of cards
             raise HandLengthException("Only 2, 5, 6, 7 cards total are supported by evaluate_hand")
 
-        # Default values in case we screw up
-        rank = 7463
-        percentile = 0.0
-        
-        rank = evaluator.evaluate_rank(cards)
-        
-        possible_opponent_hands = list(combinations(LookupTables.deck - set(cards), len(hand)))
-        hands_beaten = 0
-        for h in possible_opponent_hands:
-            possible_opponent_rank = evaluator.evaluate_rank(list(h) + board)
-            if rank < possible_opponent_rank:
-                # you beat this hand
-                hands_beaten += 1
-            elif rank == possible_opponent_rank:
-                hands_beaten += 0.5
-        return float(hands_beaten) / len(list(possible_opponent_hands))
-
-    evaluate_hand = staticmethod(evaluate_hand)
\ No newline at end of file
+        # Boards that only differ by suits share one cache entry
+        board_key, permutation = canonical_board(board)
+        codes = CODE_PERMUTATIONS[permutation]
+        return HandEvaluator.board_ranks.get(board_key).percentile([codes[card.to_code()] for card in hand])
+
+    def evaluate_rank_batch(hands):
+        """
+        Vectorized rank of an (N, 5), (N, 6) or (N, 7) array of card codes
+        using the matching Five, Six or Seven batch evaluator.
+        """
+        hands = np.asarray(hands, np.intp)
+        evaluators = { 5: HandEvaluator.Five, 6: HandEvaluator.Six, 7: HandEvaluator.Seven }
+        if hands.ndim != 2 or hands.shape[1] not in evaluators:
+            raise HandLengthException("Only (N, 5), (N, 6) or (N, 7) card code arrays are supported by evaluate_rank_batch")
+        return evaluators[hands.shape[1]].evaluate_rank_batch(hands)
+
+    def evaluate_board_batch(board, holes):
+        """
+        Rank a board of 3, 4 or 5 card codes completed by each row of an
+        (N, 2) array of hole card codes, see BoardState.
+        """
+        return BoardState(board).complete_rank_batch(holes)
+
+    evaluate_hand = staticmethod(evaluate_hand)
+    evaluate_rank_batch = staticmethod(evaluate_rank_batch)
+    evaluate_board_batch = staticmethod(evaluate_board_batch)
+
+    # Opponent ranks per board for evaluate_hand, see BoardRanks
+    board_ranks = BoardCache(BoardRanks, BOARD_CACHE_BYTES)
\ No newline at end of file
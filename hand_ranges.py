@@ -1,6 +1,37 @@
 from functools import lru_cache
+import numpy as np
 
 from card import Card
+from cardset import masks_batch
+from combinadic import HandIndexer
+
+# Hands of 2 or more hole cards are indexed among every hand of the full
+# 52-card deck, and single cards by their position in rules.deck. Either
+# way the index is the combinadic rank of the hand (see combinadic.HandIndexer).
+
+@lru_cache(maxsize=None)
+def hand_indexer(hole_count, deck=None):
+    """
+    The HandIndexer of hole_count-card hands, of deck (a tuple of card
+    codes) for single cards, or of the full deck.
+    """
+    if hole_count == 1:
+        return HandIndexer(deck, 1)
+    return HandIndexer(range(52), hole_count)
+
+def range_indexer(rules, hole_count=None):
+    hole_count = hole_count or rules.roundinfo[0].holecard_count
+    if hole_count == 1:
+        return hand_indexer(1, tuple(card.to_code() for card in rules.deck))
+    return hand_indexer(hole_count)
+
+# Card codes (see Card.to_code) of each 2-card range index, lower code first,
+# in the same order as cards_to_range_index_2
+RANGE_CODES_2 = hand_indexer(2).codes
+# Range index of the 2-card hand holding codes i and j, -1 when i == j
+RANGE_INDEX_2 = np.full((52, 52), -1, np.intp)
+RANGE_INDEX_2[RANGE_CODES_2[:, 0], RANGE_CODES_2[:, 1]] = np.arange(len(RANGE_CODES_2))
+RANGE_INDEX_2[RANGE_CODES_2[:, 1], RANGE_CODES_2[:, 0]] = np.arange(len(RANGE_CODES_2))
 
 def sort_cards(cards):
     if len(cards) == 1:
@@ -13,20 +44,14 @@ def sort_cards(cards):
     assert(False) # No support yet for true sorting beyond 2 cards
 
 def range_size(rules):
-    hole_count = rules.roundinfo[0].holecard_count
-    if hole_count == 1:
-        return len(rules.deck)
-    elif hole_count == 2:
-        return (52*51)/2
-
-    assert(False)
+    return range_indexer(rules).size
 
 def cards_to_range_index(rules, cards):
     if len(cards) == 2:
         return cards_to_range_index_2(cards)
     elif len(cards) == 1:
         return cards_to_range_index_1(rules, cards)
-    assert(False)
+    return hand_indexer(len(cards)).index([card.to_code() for card in cards])
 
 def range_index_to_cards(rules, index):
     hole_count = rules.roundinfo[0].holecard_count
@@ -34,95 +59,42 @@ def range_index_to_cards(rules, index):
         return range_index_to_cards_2(index)
     elif hole_count == 1:
         return range_index_to_cards_1(rules, index)
-    assert (False)
+    return tuple(Card.from_code(c) for c in hand_indexer(hole_count).cards(index))
 
-# Break down into 13 x 102 dual index (exclude Ace for left card)
-# Then map to a single index up to 1325
-@lru_cache(maxsize=int(52*51/2))
 def cards_to_range_index_2(cards):
-    index = 0
-    max_card_index = 12 * 4 + 4
-    sorted = sort_cards(cards)
-    c_indicies = [(((card.rank - 2) * 4) + (card.suit - 1)) for card in sorted]
-
-    count_so_far = 0
-    for i in range(0, 52):
-        for j in range(i+1, 52):
-            if c_indicies[0] == i and c_indicies[1] == j:
-                return count_so_far
-            count_so_far += 1
-
-    count_so_far = 0
-    for j in range(0, 52):
-        for i in range(j + 1, 52):
-            if c_indicies[0] == i and c_indicies[1] == j:
-                return count_so_far
-            count_so_far += 1
-
-    assert(False)
+    return int(RANGE_INDEX_2[cards[0].to_code(), cards[1].to_code()])
 
 @lru_cache(maxsize=int(52))
 def cards_to_range_index_1(rules, cards):
-    card = cards[0]
-    for i in range(0, len(rules.deck)):
-        if rules.deck[i] == card:
-            return i
-    assert(False)
-
-@lru_cache(maxsize=int(52*51/2))
-def range_index_to_cards_2(index):
-    count_so_far = 0
-    for i in range(0, 52):
-        for j in range(i + 1, 52):
-            if count_so_far == index:
-                i_suit = i % 4 + 1
-                j_suit = j % 4 + 1
-                i_rank = int((i >> 2)) + 2
-                j_rank = int((j >> 2)) + 2
-                return ( Card( i_rank, i_suit), Card( j_rank, j_suit ) )
-            count_so_far += 1
-
-    count_so_far = 0
-    for j in range(0, 52):
-        for i in range(j + 1, 52):
-            if count_so_far == index:
-                i_suit = i % 4 + 1
-                j_suit = j % 4 + 1
-                i_rank = int((i >> 2)) + 2
-                j_rank = int((j >> 2)) + 2
-                return (Card(i_rank, i_suit), Card(j_rank, j_suit))
-            count_so_far += 1
-
-    assert (False)
+    return range_indexer(rules, 1).index([cards[0].to_code()])
 
 @lru_cache(maxsize=int(52 * 51 / 2))
 def range_index_to_cards_2(index):
-    count_so_far = 0
-    for i in range(0, 52):
-        for j in range(i + 1, 52):
-            if count_so_far == index:
-                i_suit = i % 4 + 1
-                j_suit = j % 4 + 1
-                i_rank = int((i >> 2)) + 2
-                j_rank = int((j >> 2)) + 2
-                return (Card(i_rank, i_suit), Card(j_rank, j_suit))
-            count_so_far += 1
-
-    count_so_far = 0
-    for j in range(0, 52):
-        for i in range(j + 1, 52):
-            if count_so_far == index:
-                i_suit = i % 4 + 1
-                j_suit = j % 4 + 1
-                i_rank = int((i >> 2)) + 2
-                j_rank = int((j >> 2)) + 2
-                return (Card(i_rank, i_suit), Card(j_rank, j_suit))
-            count_so_far += 1
-
-@lru_cache(maxsize=52)
+    a, b = RANGE_CODES_2[index]
+    return (Card.from_code(a), Card.from_code(b))
+
 def range_index_to_cards_1(rules, index):
     return (rules.deck[index],)
 
+def range_masks(rules, hole_count=None):
+    """
+    The card set (see cardset) of every range index, as uint64.
+    """
+    return masks_batch(range_indexer(rules, hole_count).codes)
+
+def range_indexes(rules, codes):
+    """
+    Vectorized cards_to_range_index over an (N, hole cards) array of card codes.
+    """
+    codes = np.asarray(codes, np.intp)
+    return range_indexer(rules, codes.shape[1]).index_batch(codes)
+
+def range_codes(rules, indexes):
+    """
+    Vectorized range_index_to_cards, an (N, hole cards) array of card codes.
+    """
+    return range_indexer(rules).codes[np.asarray(indexes, np.intp)]
+
 # @lru_cache(maxsize=52*52)
 # def build_player_ranges(rules, known_cards):
 #     card_count = len(rules.deck)
@@ -0,0 +1,200 @@
+from hand_evaluator import HandEvaluator, HandLengthException
+from lookup_tables import TABLE_DIR, SPARSE_KEY_SHIFT, lookup_batch
+from generate_lookup_tables import rank_multisets
+from itertools import combinations
+import numpy as np
+import os
+import sys
+import time
+
+# Each state is a row of ROW_SIZE entries. Entry 0 holds the rank of the
+# 5 or 6 cards seen so far, entry 1 + code holds the offset of the next
+# row after dealing card code, or the final rank once 7 cards are dealt.
+ROW_SIZE = 53
+MAX_CARDS = 7
+POW5 = [5 ** r for r in range(13)]
+
+class HandRanks:
+    """
+    Two-Plus-Two style "perfect lookup" evaluator. Ranks any 5, 6 or 7-card
+    hand with at most seven integer reads from a precomputed state table,
+    which is memory-mapped from disk the first time it is needed.
+
+    A state is the rank counts of the cards seen so far plus, for every suit
+    that could still make a flush by the 7th card, the ranks seen in that suit.
+    Ranks are the same as HandEvaluator.Five.evaluate_rank (1 is best).
+    """
+    path = os.path.join(TABLE_DIR, 'hand_ranks.npy')
+    table = None
+    # Plain int reads through a memoryview are several times faster than numpy scalar indexing
+    table_view = None
+
+    def load(path=None):
+        """
+        Memory-map the state table, once per process.
+        """
+        if HandRanks.table is None or path is not None:
+            path = path or HandRanks.path
+            if not os.path.exists(path):
+                raise FileNotFoundError("No hand rank table at {0}, run `python hand_ranks.py` to generate it".format(path))
+            HandRanks.table = np.load(path, mmap_mode='r')
+            HandRanks.table_view = memoryview(HandRanks.table)
+        return HandRanks.table
+
+    def evaluate_rank(hand):
+        """
+        Return the rank of the best 5-card hand in this 5, 6 or 7-card hand.
+        """
+        if len(hand) not in (5, 6, 7):
+            raise HandLengthException("Only 5, 6 or 7-card hands are supported by HandRanks")
+        HandRanks.load()
+        table = HandRanks.table_view
+        p = 0
+        for card in hand:
+            p = table[p + 1 + card.to_code()]
+        if len(hand) < MAX_CARDS:
+            p = table[p]
+        return p
+
+    def evaluate_rank_batch(hands):
+        """
+        Vectorized evaluate_rank over an (N, 5), (N, 6) or (N, 7) array
+        of 0..51 card codes. Returns an (N,) int32 array of ranks.
+        """
+        hands = np.asarray(hands, np.intp)
+        if hands.ndim != 2 or hands.shape[1] not in (5, 6, 7):
+            raise HandLengthException("Only (N, 5), (N, 6) or (N, 7) card code arrays are supported by HandRanks")
+        table = HandRanks.load()
+        p = np.zeros(len(hands), np.intp)
+        for i in range(hands.shape[1]):
+            p = table[p + 1 + hands[:, i]].astype(np.intp)
+        if hands.shape[1] < MAX_CARDS:
+            p = table[p]
+        return p.astype(np.int32)
+
+    def generate(path=None):
+        """
+        Build the state table from HandEvaluator.Five.evaluate_rank and save it.
+        """
+        path = path or HandRanks.path
+        layers = [[(0, (0, 0, 0, 0))]]
+        transitions = []
+        for dealt in range(MAX_CARDS - 1):
+            next_layer = {}
+            layer_transitions = np.full((len(layers[dealt]), 52), -1, np.int64)
+            for i, state in enumerate(layers[dealt]):
+                for code in range(52):
+                    next_state = next_hand_state(state, dealt + 1, code)
+                    if next_state is not None:
+                        layer_transitions[i, code] = next_layer.setdefault(next_state, len(next_layer))
+            layers.append(list(next_layer))
+            transitions.append(layer_transitions)
+
+        rows = [len(layer) for layer in layers]
+        first_row = np.cumsum([0] + rows)
+        table = np.zeros(first_row[-1] * ROW_SIZE, np.int32)
+        grid = table.reshape(-1, ROW_SIZE)
+        for dealt, layer_transitions in enumerate(transitions):
+            offsets = (first_row[dealt + 1] + layer_transitions) * ROW_SIZE
+            grid[first_row[dealt]:first_row[dealt + 1], 1:] = np.where(layer_transitions < 0, 0, offsets)
+
+        nonflush, flushes = best_rank_tables()
+        for dealt in (5, 6):
+            counts, masks = state_arrays(layers[dealt])
+            grid[first_row[dealt]:first_row[dealt + 1], 0] = state_ranks(counts, masks, nonflush, flushes)
+
+        # The 7th card goes straight to a rank
+        counts, masks = state_arrays(layers[MAX_CARDS - 1])
+        last = grid[first_row[MAX_CARDS - 1]:first_row[MAX_CARDS]]
+        for code in range(52):
+            rank, suit = code >> 2, code & 3
+            valid = counts // POW5[rank] % 5 < 4
+            suit_masks = masks[:, suit]
+            valid &= (suit_masks < 0) | (suit_masks >> rank & 1 == 0)
+            next_masks = masks.copy()
+            next_masks[:, suit] = np.where(suit_masks < 0, -1, suit_masks | (1 << rank))
+            ranks = state_ranks(counts + POW5[rank], next_masks, nonflush, flushes)
+            last[:, 1 + code] = np.where(valid, ranks, 0)
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        np.save(path, table)
+        HandRanks.table = None
+        HandRanks.table_view = None
+        return table
+
+    load = staticmethod(load)
+    evaluate_rank = staticmethod(evaluate_rank)
+    evaluate_rank_batch = staticmethod(evaluate_rank_batch)
+    generate = staticmethod(generate)
+
+def next_hand_state(state, dealt, code):
+    """
+    Return the state after the dealt-th card, or None if the card cannot be in the hand.
+    Counts are packed base 5 and suits that can no longer flush are dropped (-1).
+    """
+    counts, masks = state
+    rank, suit = code >> 2, code & 3
+    if counts // POW5[rank] % 5 == 4:
+        return None
+    masks = list(masks)
+    if masks[suit] >= 0:
+        if masks[suit] >> rank & 1:
+            return None
+        masks[suit] |= 1 << rank
+    for s in range(4):
+        if masks[s] >= 0 and bin(masks[s]).count('1') + MAX_CARDS - dealt < 5:
+            masks[s] = -1
+    return (counts + POW5[rank], tuple(masks))
+
+def state_arrays(layer):
+    counts = np.array([state[0] for state in layer], np.int64)
+    masks = np.array([state[1] for state in layer], np.int64)
+    return counts, masks
+
+def state_ranks(counts, masks, nonflush, flushes):
+    """
+    Rank of each state: the best non-flush hand from its rank counts,
+    or the best flush from a suit holding 5 or more cards.
+    """
+    ranks = lookup_batch(nonflush, counts)
+    for suit in range(4):
+        flush_rank = flushes[np.maximum(masks[:, suit], 0)]
+        ranks = np.where((masks[:, suit] >= 0) & (flush_rank > 0), np.minimum(ranks, flush_rank), ranks)
+    return ranks
+
+def best_rank_tables():
+    """
+    Best 5-card rank of every 5, 6 and 7-card rank multiset (a sparse table
+    keyed by packed counts) and of every 5, 6 and 7-card flush (indexed by rank mask), taking
+    the minimum Five.evaluate_rank over every 5-card subset.
+    """
+    keys = []
+    ranks = []
+    for size in range(5, MAX_CARDS + 1):
+        sized = list(rank_multisets(size))
+        # Spread suits so no 5 cards share one; copies of a rank are adjacent so get distinct suits
+        hands = np.array([[rank * 4 + i % 4 for i, rank in enumerate(m)] for m in sized], np.int64)
+        keys += [sum(POW5[rank] for rank in m) for m in sized]
+        ranks.append(best_subset_ranks(hands))
+    nonflush = np.sort((np.array(keys, np.int64) << SPARSE_KEY_SHIFT) | np.concatenate(ranks))
+
+    flushes = np.zeros(1 << 13, np.int16)
+    for size in range(5, MAX_CARDS + 1):
+        sized = list(combinations(range(13), size))
+        hands = np.array([[rank * 4 for rank in ranks] for ranks in sized], np.int64)
+        for m, rank in zip(sized, best_subset_ranks(hands)):
+            flushes[sum(1 << r for r in m)] = rank
+    return nonflush, flushes
+
+def best_subset_ranks(hands):
+    subsets = list(combinations(range(hands.shape[1]), 5))
+    ranks = [HandEvaluator.Five.evaluate_rank_batch(hands[:, list(subset)]) for subset in subsets]
+    return np.min(ranks, axis=0)
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    start = time.time()
+    table = HandRanks.generate(path)
+    print('Generated {0} states ({1:.1f} MB) in {2:.1f}s'.format(len(table) // ROW_SIZE, table.nbytes / 1e6, time.time() - start))
@@ -0,0 +1,182 @@
+from equity import RANGE_SIZE, river_showdown_sums
+from hand_ranges import RANGE_INDEX_2
+from isomorphism import CODE_PERMUTATIONS, board_keys, canonical_board, canonical_boards
+from itertools import combinations
+from math import comb
+from multiprocessing import Pool
+import numpy as np
+import os
+import sys
+import time
+
+# Hand strength (HS) is the river showdown equity of a hand against a
+# uniformly random opponent hand, ties counting half, as evaluate_hand
+# gives. On the flop and turn E[HS] and E[HS^2] average it over every
+# runout, and the histogram counts runouts by HS in equal width bins.
+STREETS = { 'flop': 3, 'turn': 4, 'river': 5 }
+DEFAULT_BINS = 20
+# Boards per task handed to a worker, so each task takes about a second
+CHUNK_SIZES = { 'flop': 1, 'turn': 12, 'river': 512 }
+
+def board_strengths(board, bins):
+    """
+    E[HS], E[HS^2] and the HS histogram over every runout of board (card
+    codes) for each of the RANGE_SIZE hands, indexed like
+    hand_ranges.cards_to_range_index. Hands sharing a card with the board
+    get zeros.
+    """
+    board = [int(c) for c in board]
+    uniform = np.ones(RANGE_SIZE)
+    sums = np.zeros(RANGE_SIZE)
+    squares = np.zeros(RANGE_SIZE)
+    runouts = np.zeros(RANGE_SIZE)
+    histogram = np.zeros((RANGE_SIZE, bins), np.int64)
+    deck = [c for c in range(52) if c not in board]
+    for runout in combinations(deck, 5 - len(board)):
+        wins, totals = river_showdown_sums(board + list(runout), uniform)
+        live = np.flatnonzero(totals)
+        hs = wins[live] / totals[live]
+        sums[live] += hs
+        squares[live] += hs * hs
+        runouts[live] += 1
+        histogram[live, np.minimum((hs * bins).astype(np.intp), bins - 1)] += 1
+    runouts = runouts.clip(min=1)
+    return sums / runouts, squares / runouts, histogram
+
+def compute_chunk(task):
+    # Worker side of precompute_street: every board from start on
+    start, boards, bins = task
+    results = [board_strengths(board, bins) for board in boards]
+    return start, [np.stack(column) for column in zip(*results)]
+
+def street_path(directory, street, name):
+    return os.path.join(directory, '{0}_{1}.npy'.format(street, name))
+
+def open_table(path, shape, dtype):
+    """
+    Memory-map the table at path for writing, creating it zero filled if
+    it doesn't exist yet, so an interrupted run picks up where it stopped.
+    """
+    if os.path.exists(path):
+        table = np.load(path, mmap_mode='r+')
+        if table.shape != shape or table.dtype != dtype:
+            raise ValueError("{0} holds a {1} {2} table, expected {3} {4}".format(path, table.shape, table.dtype, shape, np.dtype(dtype)))
+        return table
+    return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+
+def precompute_street(directory, street, bins=DEFAULT_BINS, pool=None, max_boards=None):
+    """
+    Compute the hand strength tables of street ('flop', 'turn' or 'river')
+    for every canonical board (see isomorphism.canonical_boards) into
+    directory. Tables are written through memory maps, and each chunk of
+    boards is marked in <street>_done.npy once it has been flushed, so a run
+    that is interrupted, or stopped after max_boards boards, resumes from
+    the boards still missing. Returns the number of boards computed.
+    """
+    size = STREETS[street]
+    boards = canonical_boards(size)
+    path = street_path(directory, street, 'boards')
+    if not os.path.exists(path):
+        np.save(path, boards.astype(np.uint8))
+    done = open_table(street_path(directory, street, 'done'), (len(boards),), np.bool_)
+    ehs = open_table(street_path(directory, street, 'ehs'), (len(boards), RANGE_SIZE), np.float32)
+    ehs2 = open_table(street_path(directory, street, 'ehs2'), (len(boards), RANGE_SIZE), np.float32)
+    histogram = None
+    if size < 5:
+        # The river has one runout, its histogram is the bin of its HS
+        dtype = np.min_scalar_type(comb(52 - size - 2, 5 - size))
+        histogram = open_table(street_path(directory, street, 'histogram'), (len(boards), RANGE_SIZE, bins), dtype)
+
+    todo = np.flatnonzero(~done)
+    if max_boards is not None:
+        todo = todo[:max_boards]
+    # Runs of consecutive missing boards, cut into tasks of at most CHUNK_SIZES[street] boards
+    tasks = []
+    for run in np.split(todo, np.flatnonzero(np.diff(todo) != 1) + 1):
+        for start in range(0, len(run), CHUNK_SIZES[street]):
+            chunk = run[start:start + CHUNK_SIZES[street]]
+            tasks.append((int(chunk[0]), boards[chunk], bins))
+    results = pool.imap_unordered(compute_chunk, tasks) if pool else map(compute_chunk, tasks)
+    for start, (chunk_ehs, chunk_ehs2, chunk_histogram) in results:
+        stop = start + len(chunk_ehs)
+        ehs[start:stop] = chunk_ehs
+        ehs2[start:stop] = chunk_ehs2
+        tables = [ehs, ehs2]
+        if histogram is not None:
+            histogram[start:stop] = chunk_histogram
+            tables.append(histogram)
+        for table in tables:
+            table.flush()
+        # Only mark the boards done once their results are on disk
+        done[start:stop] = True
+        done.flush()
+    return len(todo)
+
+def precompute(directory, streets=('river', 'turn', 'flop'), bins=DEFAULT_BINS, processes=None, max_boards=None):
+    """
+    precompute_street for each of streets, fanning the boards out across a
+    pool of processes (one per CPU by default).
+    """
+    os.makedirs(directory, exist_ok=True)
+    with Pool(processes) as pool:
+        for street in streets:
+            start = time.time()
+            computed = precompute_street(directory, street, bins, pool, max_boards)
+            print('{0}: {1} boards in {2:.1f}s'.format(street, computed, time.time() - start))
+
+class HandStrengthTables(object):
+    """
+    Hand strength tables written by precompute, memory-mapped read-only the
+    first time each street is looked up.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.streets = {}
+
+    def load(self, street):
+        if street not in self.streets:
+            tables = { 'boards': np.load(street_path(self.directory, street, 'boards')) }
+            for name in ('done', 'ehs', 'ehs2', 'histogram'):
+                path = street_path(self.directory, street, name)
+                if os.path.exists(path):
+                    tables[name] = np.load(path, mmap_mode='r')
+            tables['keys'] = board_keys(tables['boards'])
+            self.streets[street] = tables
+        return self.streets[street]
+
+    def indexes(self, hole, board):
+        """
+        The street's tables, and the row of board's canonical board and
+        the column of hole (2 Cards) suit permuted the same way.
+        """
+        street = { size: name for name, size in STREETS.items() }[len(board)]
+        tables = self.load(street)
+        key, permutation = canonical_board(board)
+        row = int(np.searchsorted(tables['keys'], board_keys([key])[0]))
+        if not tables['done'][row]:
+            raise KeyError("Hand strengths of {0} board {1} have not been computed yet".format(street, key))
+        codes = CODE_PERMUTATIONS[permutation]
+        return tables, row, RANGE_INDEX_2[codes[hole[0].to_code()], codes[hole[1].to_code()]]
+
+    def ehs(self, hole, board):
+        tables, row, column = self.indexes(hole, board)
+        return float(tables['ehs'][row, column])
+
+    def ehs2(self, hole, board):
+        tables, row, column = self.indexes(hole, board)
+        return float(tables['ehs2'][row, column])
+
+    def histogram(self, hole, board):
+        """
+        The HS histogram of hole on a flop or turn board. Histograms stop at
+        the turn: a river board has a single runout, whose HS is ehs.
+        """
+        if len(board) == STREETS['river']:
+            raise ValueError("Hand strength histograms stop at the turn, a river board's single runout has HS ehs(hole, board)")
+        tables, row, column = self.indexes(hole, board)
+        return np.array(tables['histogram'][row, column])
+
+if __name__ == '__main__':
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'hand_strength'
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    precompute(directory, processes=processes)
@@ -0,0 +1,177 @@
+from card import Card
+from itertools import combinations, permutations
+from functools import lru_cache
+import numpy as np
+
+from hand_ranges import RANGE_CODES_2, RANGE_INDEX_2, cards_to_range_index, range_index_to_cards, range_size
+
+# Poker hands are unchanged by renaming suits, so a deal only matters up to
+# a permutation of the 4 suits. SUIT_PERMUTATIONS[p][s] is where permutation
+# p sends suit index s (Card.suit - 1), and permutation 0 is the identity.
+SUIT_PERMUTATIONS = np.array(list(permutations(range(4))), np.intp)
+# CODE_PERMUTATIONS[p][code] is the card code that p sends card code to
+CODE_PERMUTATIONS = (np.arange(52) & ~3) | SUIT_PERMUTATIONS[:, np.arange(52) & 3]
+IDENTITY = 0
+# COMPOSITIONS[p][q] is the permutation that applies q, then p
+COMPOSITIONS = np.array([[list(map(tuple, SUIT_PERMUTATIONS)).index(tuple(SUIT_PERMUTATIONS[p][SUIT_PERMUTATIONS[q]]))
+    for q in range(len(SUIT_PERMUTATIONS))] for p in range(len(SUIT_PERMUTATIONS))], np.intp)
+
+def permute_cards(cards, permutation):
+    """
+    Apply suit permutation (an index into SUIT_PERMUTATIONS) to a tuple of cards.
+    """
+    return tuple(Card(card.rank, int(SUIT_PERMUTATIONS[permutation][card.suit - 1]) + 1) for card in cards)
+
+def compose(outer, inner):
+    """
+    The suit permutation that applies inner, then outer.
+    """
+    return int(COMPOSITIONS[outer][inner])
+
+def group_key(groups, permutation):
+    """
+    The groups of card codes after permutation, each sorted, so that dealing
+    the same cards in a different order gives the same key.
+    """
+    codes = CODE_PERMUTATIONS[permutation]
+    return tuple(tuple(sorted(int(codes[c]) for c in group)) for group in groups)
+
+def canonical_groups(groups, allowed=None):
+    """
+    The canonical form of groups of card codes (e.g. board then hole cards)
+    under the allowed suit permutations (all 24 by default): the smallest
+    group_key over them. Returns the key and the permutation that makes it.
+    """
+    allowed = range(len(SUIT_PERMUTATIONS)) if allowed is None else allowed
+    return min((group_key(groups, p), p) for p in allowed)
+
+def canonical_board(board):
+    """
+    Canonical board, as a sorted tuple of card codes, and the suit
+    permutation that sends board to it. board holds Cards or card codes.
+    """
+    codes = [c.to_code() if isinstance(c, Card) else int(c) for c in board]
+    if len(codes) == 3:
+        canonical, permutation, canonical_flops, _ = flop_tables()
+        index = flop_index(codes)
+        return tuple(int(c) for c in canonical_flops[canonical[index]]), int(permutation[index])
+    # Every permutation of the board at once, sorted, compared as one base 52 number
+    permuted = np.sort(CODE_PERMUTATIONS[:, codes], axis=1)
+    permutation = int(np.argmin(board_keys(permuted)))
+    return tuple(int(c) for c in permuted[permutation]), permutation
+
+def canonical_hand(hole, board):
+    """
+    Canonical (hole cards, board) of Cards, isomorphic queries give the same
+    one, and its multiplicity weight: how many (hole cards, board) share it.
+    """
+    groups = [[c.to_code() for c in board], [c.to_code() for c in hole]]
+    key, permutation = canonical_groups(groups)
+    weight = len(set(group_key(groups, p) for p in range(len(SUIT_PERMUTATIONS))))
+    return permute_cards(hole, permutation), permute_cards(board, permutation), weight
+
+def flop_index(codes):
+    """
+    Index of a 3-card board among all 22100 (colexicographic combinadic).
+    """
+    a, b, c = sorted(codes)
+    return a + b * (b - 1) // 2 + c * (c - 1) * (c - 2) // 6
+
+@lru_cache(maxsize=1)
+def flop_tables():
+    """
+    Precomputed index tables for flops, built on first use. For each of the
+    22100 flop indexes, the index of its canonical flop and the suit
+    permutation that sends it there. Then the 1755 canonical flops (sorted
+    card codes) and their weights, the number of flops each stands for.
+    """
+    flops = np.array(sorted(combinations(range(52), 3), key=flop_index), np.intp)
+    # Every flop under every permutation, sorted, compared as one number
+    permuted = np.sort(CODE_PERMUTATIONS[:, flops], axis=2)
+    keys = (permuted[:, :, 0] * 52 + permuted[:, :, 1]) * 52 + permuted[:, :, 2]
+    permutation = np.argmin(keys, axis=0)
+    canonical_keys = keys[permutation, np.arange(len(flops))]
+    unique_keys, canonical, weights = np.unique(canonical_keys, return_inverse=True, return_counts=True)
+    canonical_flops = np.column_stack([unique_keys // (52 * 52), unique_keys // 52 % 52, unique_keys % 52])
+    return canonical, permutation, canonical_flops, weights
+
+def board_keys(boards):
+    """
+    Sorted boards of card codes, one per row, as base 52 numbers. Keys
+    order boards like the tuples canonical_board returns.
+    """
+    boards = np.asarray(boards, np.int64)
+    return boards.dot(52 ** np.arange(boards.shape[1] - 1, -1, -1))
+
+@lru_cache(maxsize=None)
+def canonical_boards(size):
+    """
+    Every canonical board of size cards, as sorted card codes, one per row
+    in increasing board_keys order.
+    """
+    if size == 3:
+        return flop_tables()[2]
+    keys = []
+    boards = np.array(list(combinations(range(52), size)), np.uint8)
+    # Every permutation of 2**16 boards at a time keeps memory use low
+    for start in range(0, len(boards), 1 << 16):
+        permuted = np.sort(CODE_PERMUTATIONS[:, boards[start:start + (1 << 16)]], axis=2)
+        keys.append(board_keys(permuted.reshape(-1, size)).reshape(len(SUIT_PERMUTATIONS), -1).min(axis=0))
+    keys = np.unique(np.concatenate(keys))
+    return np.column_stack([keys // 52 ** i % 52 for i in range(size - 1, -1, -1)])
+
+def deck_permutations(deck, groups=()):
+    """
+    Suit permutations that send the deck to itself and each group of
+    already dealt cards (a street of board cards, a player's hole cards)
+    to itself, so they can't be told apart by what has happened so far.
+    """
+    deck = set(deck)
+    allowed = []
+    for p in range(len(SUIT_PERMUTATIONS)):
+        if set(permute_cards(deck, p)) == deck and all(set(permute_cards(g, p)) == set(g) for g in groups):
+            allowed.append(p)
+    return allowed
+
+def canonical_deals(deals, allowed):
+    """
+    Group deals (tuples of card tuples, in the order they would be dealt)
+    into classes that the allowed suit permutations send to one another.
+    Returns the first deal of each class, with one permutation per member of
+    its class that sends it to that member, identity first, so the class
+    size is the multiplicity weight of the deal.
+    """
+    classes = {}
+    for deal in deals:
+        groups = [[c.to_code() for c in cards] for cards in deal]
+        key = canonical_groups(groups, allowed)[0]
+        if key not in classes:
+            classes[key] = (deal, groups, {})
+        classes[key][2][group_key(groups, IDENTITY)] = None
+    result = []
+    for deal, groups, members in classes.values():
+        symmetries = {}
+        for p in allowed:
+            symmetries.setdefault(group_key(groups, p), p)
+        result.append((deal, [symmetries[member] for member in members]))
+    return result
+
+@lru_cache(maxsize=None)
+def range_permutation(rules, permutation):
+    """
+    range_permutation(rules, p)[i] is the range index (see
+    hand_ranges.cards_to_range_index) of the hand p sends range index i to.
+    """
+    if rules.roundinfo[0].holecard_count == 2:
+        return hand_permutations()[permutation]
+    return np.array([cards_to_range_index(rules, permute_cards(range_index_to_cards(rules, i), permutation))
+        for i in range(int(range_size(rules)))], np.intp)
+
+@lru_cache(maxsize=1)
+def hand_permutations():
+    """
+    Range index permutation of every suit permutation, for 2-card hands.
+    """
+    codes = RANGE_CODES_2
+    return np.array([RANGE_INDEX_2[CODE_PERMUTATIONS[p][codes[:, 0]], CODE_PERMUTATIONS[p][codes[:, 1]]]
+        for p in range(len(SUIT_PERMUTATIONS))], np.intp)
@@ -0,0 +1,281 @@
+from pokertrees import FOLD, CALL, RAISE, Node, TerminalNode, HolecardChanceNode, BoardcardChanceNode, ActionNode, frame_infoset
+from isomorphism import IDENTITY, compose
+from board_cache import BoardCache
+from collections.abc import Mapping
+import sys
+
+# Bytes of expanded nodes a LazyTree keeps by default
+DEFAULT_MAX_BYTES = 256 << 20
+
+def value_nbytes(value):
+    # Approximate bytes of a value and the lists and tuples in it, not counting Cards, which are shared
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(value_nbytes(item) for item in value if isinstance(item, (list, tuple)))
+    return sys.getsizeof(value)
+
+def node_nbytes(node):
+    """
+    Approximate bytes of what a node holds on its own. Values it shares,
+    like the showdown.BoardHands of a PublicTree terminal, aren't counted.
+    """
+    nbytes = sys.getsizeof(node) + sys.getsizeof(vars(node)) + value_nbytes(node.committed) + sys.getsizeof(node.bet_history)
+    if not isinstance(node, TerminalNode) or node.hands is None:
+        nbytes += value_nbytes(node.holecards) + value_nbytes(node.board)
+    return nbytes
+
+class Children(list):
+    """
+    The children a LazyTree built for an action node, or the one child it
+    built for a deal of a chance node, with the child each action leads
+    to and their size for the cache.
+    """
+    def __init__(self):
+        list.__init__(self)
+        self.actions = [None] * 3
+        self.nbytes = 0
+
+class ChanceChildren(object):
+    """
+    The children of a chance node in a LazyTree, one for each deal, each
+    built the first time it is read so a traversal sampling deals only
+    builds the ones it samples. symmetries are those of each deal, see
+    BoardcardChanceNode.symmetries.
+    """
+    def __init__(self, lazy, node):
+        self.lazy = lazy
+        self.node = node
+        self.builds = []
+        self.symmetries = []
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self.builds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('chance child index out of range')
+        return self.lazy.get((self.node, index))[0]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+class LazyTree(BoardCache):
+    """
+    Builds the nodes of a GameTree built with lazy. Each node's children
+    are built the first time they are read, from the state the builder
+    had when it made the node: all at once for an action node, and one at
+    a time for a chance node (see ChanceChildren). They are kept in a
+    least recently used cache bounded by their approximate size in bytes
+    (see node_nbytes), keyed by the action node or by the chance node
+    and deal. Evicting children drops the subtree under them, which is
+    built again, as new nodes, if a traversal reaches it. The entries
+    holding the path to the children being built are never evicted.
+    """
+    def __init__(self, rules, max_bytes=None):
+        BoardCache.__init__(self, self.expand, DEFAULT_MAX_BYTES if max_bytes is None else max_bytes)
+        self.rules = rules
+        # The node whose children are being built, and where they go
+        self.expanding = None
+        self.expanding_children = None
+
+    # The builder interface of GameTree, see flattree.FlatTreeBuilder
+    def add(self, cls, root, committed, holecards, board, deck, bet_history, todeal=0, player=-1, payoffs=None, players_in=None, hands=None):
+        if cls is TerminalNode:
+            return TerminalNode(root, committed, holecards, board, deck, bet_history, payoffs, players_in, hands)
+        if cls is ActionNode:
+            return LazyActionNode(self, root, committed, holecards, board, deck, bet_history, player, self.rules.infoset_format)
+        return LAZY_CLASSES[cls](self, root, committed, holecards, board, deck, bet_history, todeal)
+
+    def set_action(self, root, action):
+        children = self.children(root)
+        children.actions[action] = children[-1]
+
+    def set_symmetries(self, bnode, symmetries):
+        self.children(bnode).symmetries.append(symmetries)
+
+    def defer(self, node, build):
+        # build makes the children of node, see GameTree.build_children
+        node.build_children = build
+
+    def defer_child(self, node, build):
+        # build makes the child of a deal of the chance node being expanded, see GameTree.build_chance_child
+        self.expanding_children.builds.append(build)
+
+    def children(self, node):
+        if node is self.expanding:
+            return self.expanding_children
+        return self.get(node)
+
+    def expand(self, key):
+        if isinstance(key, tuple):
+            # One deal of a chance node
+            node, index = key
+            build = self.children(node).builds[index]
+            children = Children()
+        else:
+            node, build = key, key.build_children
+            children = ChanceChildren(self, node) if isinstance(node, (HolecardChanceNode, BoardcardChanceNode)) else Children()
+        previous = self.expanding, self.expanding_children
+        self.expanding, self.expanding_children = node, children
+        try:
+            build()
+        finally:
+            self.expanding, self.expanding_children = previous
+        if isinstance(children, ChanceChildren):
+            # The deal each build is given
+            children.nbytes = sum(sys.getsizeof(build) + value_nbytes(build.args[1]) for build in children.builds)
+        else:
+            if isinstance(key, tuple):
+                for child in children:
+                    child.chance_index = key[1]
+            children.nbytes = sum(node_nbytes(child) for child in children)
+        return children
+
+    def path_keys(self, key):
+        # The keys of the entries holding the nodes above the children of key
+        node = key[0] if isinstance(key, tuple) else key
+        keys = { key, node }
+        while getattr(node, 'parent', None) is not None:
+            parent = node.parent
+            keys.add(parent)
+            if getattr(node, 'chance_index', None) is not None:
+                keys.add((parent, node.chance_index))
+            node = parent
+        return keys
+
+    def evict(self):
+        if self.nbytes <= self.max_bytes:
+            return
+        protected = self.path_keys(next(reversed(self.entries)))
+        for key in list(self.entries):
+            if self.nbytes <= self.max_bytes:
+                break
+            if key not in protected and key in self.entries:
+                self.drop(key)
+
+    def drop(self, key):
+        # Evict the entry of key and every entry under it
+        stack = [key]
+        while stack:
+            key = stack.pop()
+            children = self.entries.pop(key)
+            self.nbytes -= children.nbytes
+            self.evictions += 1
+            if isinstance(children, ChanceChildren):
+                stack.extend(deal for deal in ((key, i) for i in range(len(children))) if deal in self.entries)
+            else:
+                stack.extend(child for child in children if child in self.entries)
+
+class LazyNode(object):
+    """
+    A node of a LazyTree, whose children are built when first read.
+    Mixed in before the Node class of the node's kind.
+    """
+    def __init__(self, lazy, parent, committed, holecards, board, deck, bet_history):
+        self.lazy = lazy
+        self.build_children = None
+        # Which deal of its parent this node is, if the parent is a chance node
+        self.chance_index = None
+        Node.__init__(self, parent, committed, holecards, board, deck, bet_history)
+
+    @property
+    def children(self):
+        return self.lazy.children(self)
+
+class LazyHolecardChanceNode(LazyNode, HolecardChanceNode):
+    def __init__(self, lazy, parent, committed, holecards, board, deck, bet_history, todeal):
+        LazyNode.__init__(self, lazy, parent, committed, holecards, board, deck, bet_history)
+        self.todeal = todeal
+
+class LazyBoardcardChanceNode(LazyNode, BoardcardChanceNode):
+    def __init__(self, lazy, parent, committed, holecards, board, deck, bet_history, todeal):
+        LazyNode.__init__(self, lazy, parent, committed, holecards, board, deck, bet_history)
+        self.todeal = todeal
+
+    @property
+    def symmetries(self):
+        return self.lazy.children(self).symmetries
+
+class LazyActionNode(LazyNode, ActionNode):
+    def __init__(self, lazy, parent, committed, holecards, board, deck, bet_history, player, infoset_format):
+        LazyNode.__init__(self, lazy, parent, committed, holecards, board, deck, bet_history)
+        self.player = player
+        self.player_view = infoset_format(player, holecards[player], board, bet_history)
+
+    @property
+    def fold_action(self):
+        return self.lazy.children(self).actions[FOLD]
+
+    @property
+    def call_action(self):
+        return self.lazy.children(self).actions[CALL]
+
+    @property
+    def raise_action(self):
+        return self.lazy.children(self).actions[RAISE]
+
+class InfosetActions(object):
+    """
+    What seeding a strategy reads of the action nodes of an information
+    set (see pokerstrategy.Strategy.build_default): the player to act and
+    the valid actions, one per child.
+    """
+    def __init__(self, player, actions):
+        self.player = player
+        self.children = actions
+
+    def valid(self, action):
+        return action in self.children
+
+class LazyInformationSets(Mapping):
+    """
+    GameTree.information_sets of a lazy tree, built the first time it is
+    read by walking every node of the tree once, e.g. to seed a solver.
+    Each player view maps to a single InfosetActions instead of its nodes,
+    so the walk keeps no nodes and the LazyTree stays within its budget.
+    What it keeps are the player views, which a solver keeps anyway.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.sets = None
+
+    def table(self):
+        if self.sets is None:
+            self.sets = {}
+            self.walk(self.tree.root, [IDENTITY], {})
+        return self.sets
+
+    def walk(self, node, frames, records):
+        # Children are read by index, so only those on the path are held.
+        # records holds the nodes of every view, a 1-tuple of an InfosetActions, per player and actions
+        if isinstance(node, TerminalNode):
+            return
+        if isinstance(node, ActionNode):
+            actions = tuple(action for action in range(3) if node.valid(action))
+            record = records.setdefault((node.player, actions), (InfosetActions(node.player, actions),))
+            self.sets.setdefault(node.player_view, record)
+            for frame in frames[1:]:
+                view = frame_infoset(self.tree.rules, frame, node.player, node.holecards[node.player], node.board, node.bet_history)
+                self.sets.setdefault(view, record)
+        children = node.children
+        for index in range(len(children)):
+            child_frames = frames
+            if isinstance(node, BoardcardChanceNode):
+                child_frames = [compose(frame, permutation) for frame in frames for permutation in node.symmetries[index]]
+            self.walk(children[index], child_frames, records)
+
+    def __getitem__(self, key):
+        return self.table()[key]
+
+    def __iter__(self):
+        return iter(self.table())
+
+    def __len__(self):
+        return len(self.table())
+
+LAZY_CLASSES = { HolecardChanceNode: LazyHolecardChanceNode, BoardcardChanceNode: LazyBoardcardChanceNode }
@@ -0,0 +1,115 @@
+from flattree import FlatTreeBuilder, FlatTree
+from multiprocessing import get_context
+import numpy as np
+import os
+import shutil
+import tempfile
+
+# Tasks the deals are cut into for each process, so faster workers take on more of them
+TASKS_PER_PROCESS = 8
+
+# The ParallelTreeBuilder whose deals the forked workers build, see build_deals
+WORKER_BUILDER = None
+
+def build_deals(task):
+    """
+    Build the subtrees of deals start to stop of WORKER_BUILDER as one
+    flat forest, with the child of each deal as a root, and save it to
+    path, see FlatTree.save.
+    """
+    start, stop, path = task
+    tree = WORKER_BUILDER.tree
+    tree.parallel = None
+    tree.builder = FlatTreeBuilder(tree.rules)
+    for node, build, symmetries in WORKER_BUILDER.deals[start:stop]:
+        # Built without its chance node, which is in the parent's builder
+        build.func(None, *build.args[1:])
+    tree.builder.finish().save(path)
+    return path
+
+def remap(ids, table):
+    # table[ids], keeping -1 for no value
+    return np.append(np.asarray(table, np.int64), -1)[ids].tolist()
+
+class ParallelTreeBuilder(FlatTreeBuilder):
+    """
+    Builds a flat tree on a pool of processes, for GameTree.build with
+    processes. The nodes down to the first chance nodes that deal more
+    than one child (the holecards of a GameTree, the first board cards of
+    a PublicTree) are built here, and the deals of those chance nodes are
+    only recorded. finish then forks the workers, which inherit the tree
+    and the deals. Each builds the subtrees of a run of consecutive deals
+    and saves them as a FlatTree, and their rows are appended under their
+    chance nodes, so no Node objects are pickled.
+    """
+    def __init__(self, tree, processes):
+        FlatTreeBuilder.__init__(self, tree.rules)
+        self.tree = tree
+        self.processes = processes
+        # The chance node, build and symmetries of each deal, see GameTree.build_chance_child
+        self.deals = []
+
+    def defer_child(self, node, build):
+        if build.args[1] is None:
+            # A PublicTree deals every holecards at once, to a single child
+            build()
+        else:
+            self.deals.append([node, build, None])
+
+    def set_symmetries(self, bnode, symmetries):
+        # Every deal of a board card chance node built here is farmed out, and its symmetries come right after it
+        self.deals[-1][2] = symmetries
+
+    def finish(self):
+        global WORKER_BUILDER
+        if not self.deals:
+            return FlatTreeBuilder.finish(self)
+        size = -(-len(self.deals) // (self.processes * TASKS_PER_PROCESS))
+        directory = tempfile.mkdtemp()
+        tasks = [(start, min(start + size, len(self.deals)), os.path.join(directory, '{0}.tree'.format(start)))
+            for start in range(0, len(self.deals), size)]
+        WORKER_BUILDER = self
+        try:
+            with get_context('fork').Pool(self.processes) as pool:
+                # In order, so the children of each chance node are in the order they were dealt
+                for (start, stop, _), path in zip(tasks, pool.imap(build_deals, tasks)):
+                    self.graft(self.deals[start:stop], FlatTree.load(path, self.rules, mmap=False))
+                    os.remove(path)
+        finally:
+            WORKER_BUILDER = None
+            shutil.rmtree(directory)
+        return FlatTreeBuilder.finish(self)
+
+    def graft(self, deals, forest):
+        """
+        Add the rows of forest, whose roots are the children of deals,
+        under the chance nodes of deals, with the values they hold
+        interned in this builder's tables.
+        """
+        offset = len(self.columns['kind'])
+        parent = forest.parent.astype(np.int64) + offset
+        parent[:len(deals)] = [node.index for node, _, _ in deals]
+        # The board of each terminal hands, which a PublicTree shares them by
+        terminals = np.flatnonzero(forest.hands_id >= 0)
+        boards = dict(zip(forest.hands_id[terminals].tolist(), forest.board_id[terminals].tolist()))
+        hands = [self.tree.shared_hands(hands, forest.boards[boards[i]]) for i, hands in enumerate(forest.hands)]
+        symmetries = remap(forest.symmetries_id, [self.symmetries.index(list(s), tuple(s)) for s in forest.symmetries])
+        for i, (_, _, deal_symmetries) in enumerate(deals):
+            if deal_symmetries is not None:
+                symmetries[i] = self.symmetries.index(list(deal_symmetries), tuple(deal_symmetries))
+        columns = {
+            'kind': forest.kind.tolist(), 'parent': parent.tolist(), 'player': forest.player.tolist(),
+            'action': forest.action.tolist(), 'todeal': forest.todeal.tolist(),
+            'committed': remap(forest.committed_id, [self.committed.index(tuple(values)) for values in forest.committed_values.tolist()]),
+            'board': remap(forest.board_id, [self.boards.index(board) for board in forest.boards]),
+            'holecards': remap(forest.holecards_id, [self.holecards.index(holecards, tuple(tuple(hc) for hc in holecards)) for holecards in forest.holecards]),
+            'deck_mask': forest.deck_mask.tolist(),
+            'bet_history': remap(forest.bet_history_id, [self.bet_histories.index(bet_history) for bet_history in forest.bet_histories]),
+            'players_in': forest.players_in.tolist(),
+            'hands': remap(forest.hands_id, [self.hands.index(h, id(h)) for h in hands]),
+            'payoffs': remap(forest.payoffs_id, np.arange(len(forest.payoffs)) + len(self.payoffs)),
+            'symmetries': symmetries,
+        }
+        self.payoffs.extend(forest.payoffs)
+        for name, values in columns.items():
+            self.columns[name].extend(values)
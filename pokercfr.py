@@ -1,20 +1,29 @@
 from pokertrees import *
+from cardset import popcount
 from pokerstrategy import *
 from hand_ranges import *
+from isomorphism import IDENTITY, compose, range_permutation
+from showdown import terminal_payoffs
+from blockers import range_support
 import random
 import numpy as np
 
 
 class CounterfactualRegretMinimizer(object):
-    def __init__(self, rules):
+    def __init__(self, rules, tree=None):
         self.rules = rules
         self.profile = StrategyProfile(rules, [Strategy(i) for i in range(rules.players)])
         self.current_profile = StrategyProfile(rules, [Strategy(i) for i in range(rules.players)])
         self.iterations = 0
         self.counterfactual_regret = {}  # maps infosets to (player-1) # to action regrets
         self.action_reachprobs = {}  # maps infoset to (player-1) to action prob
-        self.tree = PublicTree(rules)
-        self.tree.build()
+        # The suit permutation that sends the cards of the nodes being walked to the deal they stand for, see pokertrees.suit_frames
+        self.frame = IDENTITY
+        # A PublicTree of the rules, built here unless one is given, e.g. a lazy one
+        self.tree = tree
+        if tree is None:
+            self.tree = PublicTree(rules)
+            self.tree.build()
         print('Information sets: {0}'.format(len(self.tree.information_sets)))
 
         for s in self.profile.strategies:
@@ -37,42 +46,26 @@ class CounterfactualRegretMinimizer(object):
         reachprobs = np.ones((self.rules.players, range_size(self.rules)))
         self.cfr_helper(self.tree.root, reachprobs)
 
+    def infoset_format(self, player, holecards, board, bet_history):
+        # The infoset of the deal being walked, see cfr_boardcard_node
+        return frame_infoset(self.rules, self.frame, player, holecards, board, bet_history)
+
     def cfr_helper(self, root, reachprobs):
-        if type(root) is TerminalNode:
+        if isinstance(root, TerminalNode):
             return self.cfr_terminal_node(root, reachprobs)
-        if type(root) is HolecardChanceNode:
+        if isinstance(root, HolecardChanceNode):
             return self.cfr_holecard_node(root, reachprobs)
-        if type(root) is BoardcardChanceNode:
+        if isinstance(root, BoardcardChanceNode):
             return self.cfr_boardcard_node(root, reachprobs)
         return self.cfr_action_node(root, reachprobs)
 
-    def is_possible(self, my_hand_index, opp_hand_index, board):
-        pass
-
-    def cfr_fast_terminal_node(self, root, reachprobs):
-        # payoffs = np.zeros((self.rules.players, range_size(self.rules)), np.longdouble)
-        for player in range(self.rules.players):
-            opps_reach_probs = np.ones((range_size(self.rules)), np.longdouble)
-            for opponent in range(self.rules.players):
-                if opponent != player:
-                    opps_reach_probs *= reachprobs[opponent]
-
-            # new_payoffs = np.ones( range_size(self.rules), np.longdouble )
-
-
-            win_sum = np.zeros((self.rules.players, range_size(self.rules)), np.longdouble)
-            counts = np.zeros((self.rules.players, range_size(self.rules)), np.longdouble)
-            for my_hand_index in range(range_size(self.rules)):
-                for opp_hand_index in range(range_size(self.rules)):
-                    if self.is_possible(my_hand_index, opp_hand_index, root.board):
-                        for opponent in range(self.rules.players):
-                            if opponent != player:
-                                counts[player, my_hand_index] += 1
-                                win_sum += root
-
-        return win_sum / counts
-
     def cfr_terminal_node(self, root, reachprobs):
+        if self.rules.players == 2 and root.hands is not None:
+            return terminal_payoffs(root, reachprobs, int(range_size(self.rules)))
+        return self.cfr_matchup_terminal_node(root, reachprobs)
+
+    def cfr_matchup_terminal_node(self, root, reachprobs):
+        # Sums the payoffs of every holecard matchup in root.payoffs one at a time
         payoffs = np.zeros((self.rules.players, range_size(self.rules)), np.longdouble)
         for player in range(self.rules.players):
             counts = np.zeros((range_size(self.rules)), np.longdouble)
@@ -96,64 +89,50 @@ class CounterfactualRegretMinimizer(object):
     def cfr_holecard_node(self, root, reachprobs):
         assert (len(root.children) == 1)
         prevlen = 0 # Old op was pricey: len(list(reachprobs[0].keys())[0])
-        possible_deals = float(choose(len(root.deck) - prevlen, root.todeal))
+        possible_deals = float(choose(popcount(root.deck_mask) - prevlen, root.todeal))
 
         next_reachprobs = reachprobs / possible_deals
         return self.cfr_helper(root.children[0], next_reachprobs)
 
     def cfr_boardcard_node(self, root, reachprobs):
         prevlen = 0 # Old op was pricey: len(list(reachprobs[0].keys())[0])
-        possible_deals = float(choose(len(root.deck) - prevlen, root.todeal))
+        possible_deals = float(choose(popcount(root.deck_mask) - prevlen, root.todeal))
         payoffs = np.zeros((self.rules.players, range_size(self.rules)), np.longdouble)
         next_reachprobs = reachprobs / possible_deals
-        for bc in root.children:
-            subpayoffs = self.cfr_helper(bc, next_reachprobs)
-            payoffs += subpayoffs
+        frame = self.frame
+        for bc, symmetries in zip(root.children, root.symmetries):
+            # The board stands for every board in symmetries. Its subtree is walked once
+            # for each, in that board's suits: hand i below holds the cards permutation
+            # sends it to, and its infosets are those of the permuted hands and board.
+            for permutation in symmetries:
+                hands = range_permutation(self.rules, permutation)
+                self.frame = compose(frame, permutation)
+                payoffs[:, hands] += self.cfr_helper(bc, next_reachprobs[:, hands])
+        self.frame = frame
         return payoffs
 
     def cfr_action_node(self, root, reachprobs):
         # Calculate strategy from counterfactual regret
         strategy = self.cfr_strategy_update(root, reachprobs)
+        # Hands the board blocks have no infoset, they keep no reach and no payoff
+        action_probs = np.zeros((range_size(self.rules), 3), np.longdouble)
+        for hand_index in np.flatnonzero(range_support(self.rules).board_mask(root.board)):
+            cards = range_index_to_cards(self.rules, hand_index)
+            p_view = self.infoset_format(root.player, cards, root.board, root.bet_history)
+            action_probs[hand_index] = strategy.probs(p_view)
         next_reachprobs = np.copy(reachprobs)
-        action_probs = np.empty((range_size(self.rules), 3), np.longdouble)
-
-        iter = np.nditer(reachprobs[root.player], flags=['f_index'])
-        for p in iter:
-            cards = range_index_to_cards(self.rules, iter.index)
-            p_view = self.rules.infoset_format(root.player, cards, root.board, root.bet_history)
-            action_probs[iter.index] = strategy.probs(p_view)
         action_payoffs = np.empty((3, self.rules.players, range_size(self.rules)), np.longdouble)
-
-        if root.fold_action:
-            iter = np.nditer(reachprobs[root.player], flags=['f_index'])
-            for p in iter:
-                hc = iter.index
-                next_reachprobs[root.player, hc] = action_probs[hc, FOLD] * p
-            action_payoffs[FOLD] = self.cfr_helper(root.fold_action, next_reachprobs)
-        if root.call_action:
-            iter = np.nditer(reachprobs[root.player], flags=['f_index'])
-            for p in iter:
-                hc = iter.index
-                next_reachprobs[root.player, hc] = action_probs[hc, CALL] * p
-            action_payoffs[CALL] = self.cfr_helper(root.call_action, next_reachprobs)
-        if root.raise_action:
-            iter = np.nditer(reachprobs[root.player], flags=['f_index'])
-            for p in iter:
-                hc = iter.index
-                next_reachprobs[root.player, hc] = action_probs[hc, RAISE] * p
-            action_payoffs[RAISE] = self.cfr_helper(root.raise_action, next_reachprobs)
+        for action, child in ((FOLD, root.fold_action), (CALL, root.call_action), (RAISE, root.raise_action)):
+            if child:
+                next_reachprobs[root.player] = action_probs[:, action] * reachprobs[root.player]
+                action_payoffs[action] = self.cfr_helper(child, next_reachprobs)
         payoffs = np.zeros((self.rules.players, range_size(self.rules)), np.longdouble)
-        for player in range(self.rules.players):
-            for action in range(3):
-                if not root.valid(action):
-                   continue
-                for hand_index in range( range_size(self.rules) ):
-                    winnings = action_payoffs[action, player, hand_index]
-                    # action_probs is baked into reachprobs for everyone except the acting player
-                    if player == root.player:
-                        payoffs[player, hand_index] += winnings * action_probs[hand_index, action]
-                    else:
-                        payoffs[player, hand_index] += winnings
+        for action in range(3):
+            if not root.valid(action):
+                continue
+            payoffs += action_payoffs[action]
+            # action_probs is baked into reachprobs for everyone except the acting player
+            payoffs[root.player] += action_payoffs[action, root.player] * (action_probs[:, action] - 1)
         # Update regret calculations
         self.cfr_regret_update(root, action_payoffs, payoffs[root.player])
         return payoffs
@@ -162,12 +141,12 @@ class CounterfactualRegretMinimizer(object):
         if self.iterations == 0:
             default_strat = self.profile.strategies[root.player]
             for hc in root.holecards[root.player]:
-                infoset = self.rules.infoset_format(root.player, hc, root.board, root.bet_history)
+                infoset = self.infoset_format(root.player, hc, root.board, root.bet_history)
                 probs = default_strat.probs(infoset)
                 self.action_reachprobs[infoset, root.player] = reachprobs[root.player, cards_to_range_index(self.rules, hc)] * probs
             return default_strat
         for hc in root.holecards[root.player]:
-            infoset = self.rules.infoset_format(root.player, hc, root.board, root.bet_history)
+            infoset = self.infoset_format(root.player, hc, root.board, root.bet_history)
             prev_cfr = self.counterfactual_regret[infoset][root.player]
             nonzero_prev_cfr = np.clip(prev_cfr, 0, sys.maxsize)
             sumpos_cfr = np.sum(nonzero_prev_cfr)
@@ -187,13 +166,11 @@ class CounterfactualRegretMinimizer(object):
         for action in range(3):
             if not root.valid(action):
                 continue
-            for hand_index in range( range_size(self.rules) ):
-                winnings = action_payoffs[action, root.player, hand_index]
-                immediate_cfr = winnings - ev[hand_index]
-                if immediate_cfr != 0:
-                    cards = range_index_to_cards(self.rules, hand_index)
-                    infoset = self.rules.infoset_format(root.player, cards, root.board, root.bet_history)
-                    self.counterfactual_regret[infoset][root.player][action] += immediate_cfr
+            immediate_cfrs = action_payoffs[action, root.player] - ev
+            for hand_index in np.flatnonzero(immediate_cfrs):
+                cards = range_index_to_cards(self.rules, hand_index)
+                infoset = self.infoset_format(root.player, cards, root.board, root.bet_history)
+                self.counterfactual_regret[infoset][root.player][action] += immediate_cfrs[hand_index]
 
     @lru_cache(3*2*2*2)
     def equal_probs(self, num_children, fold_action, call_action, raise_action):
@@ -207,22 +184,20 @@ class CounterfactualRegretMinimizer(object):
         return probs
 
 class CFR_Plus(CounterfactualRegretMinimizer):
-    def __init__(self, rules):
-        CounterfactualRegretMinimizer.__init__(self, rules)
+    def __init__(self, rules, tree=None):
+        CounterfactualRegretMinimizer.__init__(self, rules, tree)
 
     def cfr_regret_update(self, root, action_payoffs, ev):
         modified_infosets = set()
         for action in range(3):
             if not root.valid(action):
                 continue
-            for hand_index in range( range_size(self.rules) ):
-                winnings = action_payoffs[action, root.player, hand_index]
-                immediate_cfr = winnings - ev[hand_index]
-                if immediate_cfr != 0:
-                    cards = range_index_to_cards(self.rules, hand_index)
-                    infoset = self.rules.infoset_format(root.player, cards, root.board, root.bet_history)
-                    self.counterfactual_regret[infoset][root.player][action] += immediate_cfr
-                    modified_infosets.add(infoset)
+            immediate_cfrs = action_payoffs[action, root.player] - ev
+            for hand_index in np.flatnonzero(immediate_cfrs):
+                cards = range_index_to_cards(self.rules, hand_index)
+                infoset = self.infoset_format(root.player, cards, root.board, root.bet_history)
+                self.counterfactual_regret[infoset][root.player][action] += immediate_cfrs[hand_index]
+                modified_infosets.add(infoset)
 
         # Do CFR+
         for infoset in modified_infosets:
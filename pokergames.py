@@ -1,9 +1,15 @@
 from pokertrees import *
 from card import *
+from hand_evaluator import HandEvaluator
+import numpy as np
 
 def holdem_eval(hc, board):
-    assert(False) # Not supported yet
-    return hc[0].rank
+    # Higher wins, so negate the Cactus Kev rank of the best 5 cards
+    evaluators = { 5: HandEvaluator.Five, 6: HandEvaluator.Six, 7: HandEvaluator.Seven }
+    return -evaluators[len(hc) + len(board)].evaluate_rank(list(hc) + list(board))
+
+def holdem_eval_batch(hands, board):
+    return -HandEvaluator.evaluate_board_batch(board, hands)
 
 def holdem_rules(players):
     deck = []
@@ -16,7 +22,13 @@ def holdem_rules(players):
               RoundInfo(holecard_count=0, boardcard_count=3, betsize=1, maxbets=[1, 0]),
               RoundInfo(holecard_count=0, boardcard_count=1, betsize=1, maxbets=[1, 0]),
               RoundInfo(holecard_count=0, boardcard_count=1, betsize=1, maxbets=[1, 0])]
-    return GameRules(players, deck, rounds, ante, blinds, handeval=holdem_eval, infoset_format=holdem_format)
+    return GameRules(players, deck, rounds, ante, blinds, handeval=holdem_eval, handeval_batch=holdem_eval_batch, infoset_format=holdem_format)
+
+def holdem_abstraction_rules(players, abstraction):
+    # holdem_rules with infosets keyed on the buckets of an abstraction.CardAbstraction
+    rules = holdem_rules(players)
+    rules.infoset_format = abstraction.infoset_format
+    return rules
 
 def holdem_format(player, holecards, board, bet_history):
     cards = ""
@@ -27,13 +39,24 @@ def holdem_format(player, holecards, board, bet_history):
 def kuhn_eval(hc, board):
     return hc[0].rank
 
+def card_ranks(codes):
+    # Card.rank of each card code
+    return (np.asarray(codes, np.intp) >> 2) + 2
+
+def card_suits(codes):
+    # Card.suit of each card code
+    return (np.asarray(codes, np.intp) & 3) + 1
+
+def kuhn_eval_batch(hands, board):
+    return card_ranks(hands)[:, 0]
+
 def half_street_kuhn_rules():
     players = 2
     deck = [Card(14,1),Card(13,1),Card(12,1)]
     ante = 1
     blinds = None
     rounds = [RoundInfo(holecard_count=1, boardcard_count=0, betsize=1, maxbets=[1, 0])]
-    return GameRules(players, deck, rounds, ante, blinds, handeval=kuhn_eval, infoset_format=leduc_format)
+    return GameRules(players, deck, rounds, ante, blinds, handeval=kuhn_eval, handeval_batch=kuhn_eval_batch, infoset_format=leduc_format)
 
 def half_street_kuhn_gametree():
     rules = half_street_kuhn_rules()
@@ -53,7 +76,7 @@ def kuhn_rules():
     ante = 1
     blinds = None
     rounds = [RoundInfo(holecard_count=1, boardcard_count=0, betsize=1, maxbets=[1, 1])]
-    return GameRules(players, deck, rounds, ante, blinds, handeval=kuhn_eval, infoset_format=leduc_format) 
+    return GameRules(players, deck, rounds, ante, blinds, handeval=kuhn_eval, handeval_batch=kuhn_eval_batch, infoset_format=leduc_format) 
 
 def kuhn_gametree():
     rules = kuhn_rules()
@@ -79,13 +102,17 @@ def leduc_eval(hc,board):
         return 15*14+hand[0].rank
     return max(hand[0].rank, hand[1].rank) * 14 + min(hand[0].rank, hand[1].rank)
 
+def leduc_eval_batch(hands, board):
+    hole, shared = card_ranks(hands)[:, 0], card_ranks(board)[0]
+    return np.where(hole == shared, 15*14+hole, np.maximum(hole, shared) * 14 + np.minimum(hole, shared))
+
 def leduc_rules():
     players = 2
     deck = [Card(13,1),Card(13,2),Card(12,1),Card(12,2),Card(11,1),Card(11,2)]
     ante = 1
     blinds = None
     rounds = [RoundInfo(holecard_count=1, boardcard_count=0, betsize=2, maxbets=[2, 2]), RoundInfo(holecard_count=0, boardcard_count=1, betsize=4, maxbets=[2, 2])]
-    return GameRules(players, deck, rounds, ante, blinds, handeval=leduc_eval, infoset_format=leduc_format)
+    return GameRules(players, deck, rounds, ante, blinds, handeval=leduc_eval, handeval_batch=leduc_eval_batch, infoset_format=leduc_format)
 
 def leduc_gametree():
     rules = leduc_rules()
@@ -126,6 +153,18 @@ def royal_eval(hc,board):
         return 100+hand[0].rank
     return hand[0].rank
 
+def royal_eval_batch(hands, board):
+    hole = card_ranks(hands)[:, 0]
+    ranks = np.column_stack([hole, np.tile(card_ranks(board), (len(hole), 1))])
+    suits = np.column_stack([card_suits(hands)[:, 0], np.tile(card_suits(board), (len(hole), 1))])
+    flush = (suits[:, 0] == suits[:, 1]) & (suits[:, 0] == suits[:, 2])
+    broadway = (ranks == Card.RANK_QUEEN).any(axis=1) & (ranks == Card.RANK_KING).any(axis=1)
+    ace_high = broadway & (ranks == Card.RANK_ACE).any(axis=1)
+    jack_high = broadway & (ranks == Card.RANK_JACK).any(axis=1)
+    pair = (ranks[:, 0] == ranks[:, 1]) | (ranks[:, 0] == ranks[:, 2])
+    return np.select([flush, ace_high, jack_high, pair],
+        [10000 + hole, 1000 + Card.RANK_ACE, 1000 + Card.RANK_JACK, 100 + hole], hole)
+
 def royal_rules():
     players = 2
     deck = [Card(14,1),Card(14,2),Card(13,1),Card(13,2),Card(12,1),Card(12,2),Card(11,1),Card(11,2)]
@@ -135,7 +174,7 @@ def royal_rules():
     flop = RoundInfo(holecard_count=0, boardcard_count=1, betsize=4, maxbets=[2, 2])
     turn = RoundInfo(holecard_count=0, boardcard_count=1, betsize=4, maxbets=[2, 2])
     rounds = [preflop,flop,turn]
-    return GameRules(players, deck, rounds, ante, blinds, handeval=royal_eval, infoset_format=royal_format)
+    return GameRules(players, deck, rounds, ante, blinds, handeval=royal_eval, handeval_batch=royal_eval_batch, infoset_format=royal_format)
 
 def royal_gametree():
     rules = royal_rules()
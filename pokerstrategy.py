@@ -1,4 +1,7 @@
 from pokertrees import *
+from cardset import popcount
+from isomorphism import IDENTITY, compose
+from showdown import terminal_payoffs
 import random
 import numpy as np
 
@@ -25,6 +28,7 @@ class Strategy(object):
             self.load_from_file(filename)
 
     def build_default(self, gametree):
+        # By the key, as a node of a suit isomorphic tree has a view in each frame (see pokertrees.suit_frames)
         for key in gametree.information_sets:
             infoset = gametree.information_sets[key]
             test_node = infoset[0]
@@ -35,11 +39,11 @@ class Strategy(object):
                     for action in range(3):
                         if node.valid(action):
                             probs[action] = prob
-                    if type(node.player_view) is tuple:
-                        for pview in node.player_view:
+                    if type(key) is tuple:
+                        for pview in key:
                             self.policy[pview] = np.copy(probs)
                     else:
-                        self.policy[node.player_view] = probs
+                        self.policy[key] = probs
 
     def build_random(self, gametree):
         for key in gametree.information_sets:
@@ -54,11 +58,11 @@ class Strategy(object):
                             probs[action] = random.random()
                             total += probs[action]
                     probs /= total
-                    if type(node.player_view) is tuple:
-                        for pview in node.player_view:
+                    if type(key) is tuple:
+                        for pview in key:
                             self.policy[pview] = np.copy(probs)
                     else:
-                        self.policy[node.player_view] = probs
+                        self.policy[key] = probs
 
     def probs(self, infoset):
         assert(infoset in self.policy)
@@ -104,6 +108,8 @@ class StrategyProfile(object):
         self.strategies = strategies
         self.gametree = None
         self.publictree = None
+        # The suit permutation that sends the cards of the nodes being walked to the deal they stand for, see pokertrees.suit_frames
+        self.frame = IDENTITY
 
     def expected_value(self):
         """
@@ -120,15 +126,27 @@ class StrategyProfile(object):
         return tuple(next(iter(ev.values())) for ev in expected_values) # pull the EV from the dict returned
 
     def ev_helper(self, root, reachprobs):
-        if type(root) is TerminalNode:
+        if isinstance(root, TerminalNode):
             return self.ev_terminal_node(root, reachprobs)
-        if type(root) is HolecardChanceNode:
+        if isinstance(root, HolecardChanceNode):
             return self.ev_holecard_node(root, reachprobs)
-        if type(root) is BoardcardChanceNode:
+        if isinstance(root, BoardcardChanceNode):
             return self.ev_boardcard_node(root, reachprobs)
         return self.ev_action_node(root, reachprobs)
 
     def ev_terminal_node(self, root, reachprobs):
+        if self.rules.players != 2 or root.hands is None:
+            return self.ev_matchup_terminal_node(root, reachprobs)
+        # The same vectorized terminals as CFR, on reach probabilities indexed by range index
+        size = int(range_size(self.rules))
+        reach = np.zeros((self.rules.players, size))
+        for player in range(self.rules.players):
+            reach[player, root.hands.indexes] = [reachprobs[player][hc] for hc in root.hands.hands]
+        values = terminal_payoffs(root, reach, size)[:, root.hands.indexes]
+        return [dict(zip(root.hands.hands, values[player])) for player in range(self.rules.players)]
+
+    def ev_matchup_terminal_node(self, root, reachprobs):
+        # Sums the payoffs of every holecard matchup in root.payoffs one at a time
         payoffs = [None for _ in range(self.rules.players)]
         for player in range(self.rules.players):
             player_payoffs = {hc: 0 for hc in root.holecards[player]}
@@ -152,7 +170,7 @@ class StrategyProfile(object):
     def ev_holecard_node(self, root, reachprobs):
         assert(len(root.children) == 1)
         prevlen = len(list(reachprobs[0].keys())[0])
-        possible_deals = float(choose(len(root.deck) - prevlen,root.todeal))
+        possible_deals = float(choose(popcount(root.deck_mask) - prevlen,root.todeal))
         next_reachprobs = [{ hc: reachprobs[player][hc[0:prevlen]] / possible_deals for hc in root.children[0].holecards[player] } for player in range(self.rules.players)]
         subpayoffs = self.ev_helper(root.children[0], next_reachprobs)
         payoffs = [{ hc: 0 for hc in root.holecards[player] } for player in range(self.rules.players)]
@@ -164,20 +182,35 @@ class StrategyProfile(object):
 
     def ev_boardcard_node(self, root, reachprobs):
         prevlen = len(list(reachprobs[0].keys())[0])
-        possible_deals = float(choose(len(root.deck) - prevlen,root.todeal))
+        possible_deals = float(choose(popcount(root.deck_mask) - prevlen,root.todeal))
         payoffs = [{ hc: 0 for hc in root.holecards[player] } for player in range(self.rules.players)]
-        for bc in root.children:
-            next_reachprobs = [{ hc: reachprobs[player][hc] / possible_deals for hc in bc.holecards[player] } for player in range(self.rules.players)]
-            subpayoffs = self.ev_helper(bc, next_reachprobs)
-            for player,subpayoff in enumerate(subpayoffs):
-                for hand,winnings in list(subpayoff.items()):
-                    payoffs[player][hand] += winnings
+        frame = self.frame
+        for bc, symmetries in zip(root.children, root.symmetries):
+            # Each board bc stands for walks bc's subtree in its own suits, see CounterfactualRegretMinimizer.cfr_boardcard_node
+            for permutation in symmetries:
+                self.frame = compose(frame, permutation)
+                next_reachprobs = [{ hc: reachprobs[player][self.permute_hand(hc, permutation)] / possible_deals for hc in bc.holecards[player] } for player in range(self.rules.players)]
+                subpayoffs = self.ev_helper(bc, next_reachprobs)
+                for player,subpayoff in enumerate(subpayoffs):
+                    for hand,winnings in list(subpayoff.items()):
+                        payoffs[player][self.permute_hand(hand, permutation)] += winnings
+        self.frame = frame
         return payoffs
 
+    def permute_hand(self, hand, permutation):
+        # The suit permuted hand, with its cards in deck order like the tree's holecards
+        if permutation == IDENTITY:
+            return hand
+        return permute_dealt(self.rules, hand, permutation)
+
+    def infoset_format(self, player, holecards, board, bet_history):
+        # The infoset of the deal being walked, see ev_boardcard_node
+        return frame_infoset(self.rules, self.frame, player, holecards, board, bet_history)
+
     def ev_action_node(self, root, reachprobs):
         strategy = self.strategies[root.player]
         next_reachprobs = deepcopy(reachprobs)
-        action_probs = { hc: strategy.probs(self.rules.infoset_format(root.player, hc, root.board, root.bet_history)) for hc in root.holecards[root.player] }
+        action_probs = { hc: strategy.probs(self.infoset_format(root.player, hc, root.board, root.bet_history)) for hc in root.holecards[root.player] }
         action_payoffs = [None, None, None]
         if root.fold_action:
             next_reachprobs[root.player] = { hc: action_probs[hc][FOLD] * reachprobs[root.player][hc] for hc in root.holecards[root.player] }
@@ -220,18 +253,18 @@ class StrategyProfile(object):
         return (StrategyProfile(self.rules, responses), expected_values)
 
     def br_helper(self, root, reachprobs, responses):
-        if type(root) is TerminalNode:
+        if isinstance(root, TerminalNode):
             return self.ev_terminal_node(root, reachprobs)
-        if type(root) is HolecardChanceNode:
+        if isinstance(root, HolecardChanceNode):
             return self.br_holecard_node(root, reachprobs, responses)
-        if type(root) is BoardcardChanceNode:
+        if isinstance(root, BoardcardChanceNode):
             return self.br_boardcard_node(root, reachprobs, responses)
         return self.br_action_node(root, reachprobs, responses)
 
     def br_holecard_node(self, root, reachprobs, responses):
         assert(len(root.children) == 1)
         prevlen = len(list(reachprobs[0].keys())[0])
-        possible_deals = float(choose(len(root.deck) - prevlen,root.todeal))
+        possible_deals = float(choose(popcount(root.deck_mask) - prevlen,root.todeal))
         next_reachprobs = [{ hc: reachprobs[player][hc[0:prevlen]] / possible_deals for hc in root.children[0].holecards[player] } for player in range(self.rules.players)]
         subpayoffs = self.br_helper(root.children[0], next_reachprobs, responses)
         payoffs = [{ hc: 0 for hc in root.holecards[player] } for player in range(self.rules.players)]
@@ -243,20 +276,25 @@ class StrategyProfile(object):
 
     def br_boardcard_node(self, root, reachprobs, responses):
         prevlen = len(list(reachprobs[0].keys())[0])
-        possible_deals = float(choose(len(root.deck) - prevlen,root.todeal))
+        possible_deals = float(choose(popcount(root.deck_mask) - prevlen,root.todeal))
         payoffs = [{ hc: 0 for hc in root.holecards[player] } for player in range(self.rules.players)]
-        for bc in root.children:
-            next_reachprobs = [{ hc: reachprobs[player][hc] / possible_deals for hc in bc.holecards[player] } for player in range(self.rules.players)]
-            subpayoffs = self.br_helper(bc, next_reachprobs, responses)
-            for player,subpayoff in enumerate(subpayoffs):
-                for hand,winnings in list(subpayoff.items()):
-                    payoffs[player][hand] += winnings
+        frame = self.frame
+        for bc, symmetries in zip(root.children, root.symmetries):
+            # Each board bc stands for walks bc's subtree in its own suits, see CounterfactualRegretMinimizer.cfr_boardcard_node
+            for permutation in symmetries:
+                self.frame = compose(frame, permutation)
+                next_reachprobs = [{ hc: reachprobs[player][self.permute_hand(hc, permutation)] / possible_deals for hc in bc.holecards[player] } for player in range(self.rules.players)]
+                subpayoffs = self.br_helper(bc, next_reachprobs, responses)
+                for player,subpayoff in enumerate(subpayoffs):
+                    for hand,winnings in list(subpayoff.items()):
+                        payoffs[player][self.permute_hand(hand, permutation)] += winnings
+        self.frame = frame
         return payoffs
 
     def br_action_node(self, root, reachprobs, responses):
         strategy = self.strategies[root.player]
         next_reachprobs = deepcopy(reachprobs)
-        action_probs = { hc: strategy.probs(self.rules.infoset_format(root.player, hc, root.board, root.bet_history)) for hc in root.holecards[root.player] }
+        action_probs = { hc: strategy.probs(self.infoset_format(root.player, hc, root.board, root.bet_history)) for hc in root.holecards[root.player] }
         action_payoffs = [None, None, None]
         if root.fold_action:
             next_reachprobs[root.player] = { hc: action_probs[hc][FOLD] * reachprobs[root.player][hc] for hc in root.holecards[root.player] }
@@ -306,7 +344,7 @@ class StrategyProfile(object):
             probs = [0,0,0]
             for action in max_action:
                 probs[action] = 1.0 / float(len(max_action))
-            infoset = self.rules.infoset_format(root.player, hc, root.board, root.bet_history)
+            infoset = self.infoset_format(root.player, hc, root.board, root.bet_history)
             max_strategy.policy[infoset] = probs
             player_payoffs[hc] = max_value
         return player_payoffs
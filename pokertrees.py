@@ -4,6 +4,7 @@ from itertools import product
 from collections import Counter
 
 from card import Card
+from cardset import EMPTY, overlaps, remove_cards, to_cards, to_mask
 from hand_evaluator import HandEvaluator
 from copy import deepcopy
 from functools import partial
@@ -13,29 +14,52 @@ import math
 from functools import lru_cache
 
 from hand_ranges import cards_to_range_index, range_size, range_index_to_cards
+from isomorphism import IDENTITY, canonical_deals, compose, deck_permutations, permute_cards
+from showdown import BoardHands, ShowdownRanking, matchup_payoffs
+from board_ranks import BoardRankStore, board_ranks
+from blockers import range_support
 
 FOLD = 0
 CALL = 1
 RAISE = 2
 
 def overlap(t1, t2):
-    for x in t1:
-        if x in t2:
-            return True
-    return False
+    return overlaps(to_mask(t1), to_mask(t2))
 
 def all_unique(hc):
-    for i in range(len(hc)-1):
-        for j in range(i+1,len(hc)):
-            if overlap(hc[i], hc[j]):
-                return False
+    dealt = EMPTY
+    for cards in hc:
+        mask = to_mask(cards)
+        if overlaps(dealt, mask):
+            return False
+        dealt |= mask
     return True
 
 def default_infoset_format(player, holecards, board, bet_history):
     return "{0}{1}:{2}:".format("".join([str(x) for x in holecards]), "".join([str(x) for x in board]), bet_history)
 
 class GameRules(object):
-    def __init__(self, players, deck, rounds, ante, blinds, handeval = HandEvaluator.evaluate_hand, infoset_format=default_infoset_format):
+    """
+    With suit_isomorphism, board card chance nodes only deal one board of
+    each class that suit permutations send to one another, see
+    BoardcardChanceNode.symmetries. This needs handeval to treat suits
+    alike. The subtree of a board is walked in the suits of each board it
+    stands for, so infoset_format may tell suits apart (see suit_frames).
+
+    With rank_directory, PublicTree reads showdown hand ranks from the
+    board_ranks.BoardRankStore in that directory instead of evaluating hands.
+
+    handeval_batch(hands, board) scores every row of an (N, hole cards)
+    array of card codes (see Card.to_code) on a board of card codes at
+    once, as handeval would, and returns an int array. Without one,
+    handeval is called on each hand, see ScalarHandevalBatch.
+
+    With tree_directory, GameTree.build loads the tree from the
+    flattree.TreeCache in that directory, or builds it flat and saves it
+    there the first time, so later builds of the same tree by any process
+    only map the file.
+    """
+    def __init__(self, players, deck, rounds, ante, blinds, handeval = HandEvaluator.evaluate_hand, infoset_format=default_infoset_format, suit_isomorphism=False, rank_directory=None, handeval_batch=None, tree_directory=None):
         assert(players >= 2)
         assert(ante >= 0)
         assert(rounds != None)
@@ -53,7 +77,22 @@ class GameRules(object):
         self.ante = ante
         self.blinds = blinds
         self.handeval = handeval
+        self.handeval_batch = handeval_batch or ScalarHandevalBatch(handeval)
         self.infoset_format = infoset_format
+        self.suit_isomorphism = suit_isomorphism
+        self.rank_directory = rank_directory
+        self.tree_directory = tree_directory
+
+class ScalarHandevalBatch(object):
+    """
+    The handeval_batch protocol over a scalar handeval, one call per hand.
+    """
+    def __init__(self, handeval):
+        self.handeval = handeval
+
+    def __call__(self, hands, board):
+        board = tuple(Card.from_code(c) for c in board)
+        return np.array([self.handeval(tuple(Card.from_code(c) for c in hand), board) for hand in hands])
 
 class RoundInfo(object):
     def __init__(self, holecard_count, boardcard_count, betsize, maxbets):
@@ -69,8 +108,29 @@ class GameTree(object):
         self.root = None
         self.max_depth = max_street_depth
         self.max_depth_approx = max_depth_approximator
-
-    def build(self):
+        # While building with flat, the flattree.FlatTreeBuilder nodes are written to
+        self.builder = None
+        self.flat = None
+        # The lazytree.LazyTree of a tree built with lazy
+        self.lazy = None
+        # The holecards and board get_showdown_scores scored last, and their scores
+        self.showdown_scores = None
+        # While building with processes, the paralleltree.ParallelTreeBuilder the deals are farmed out by
+        self.parallel = None
+
+    def build(self, flat=False, lazy=False, max_bytes=None, processes=None):
+        """
+        Build the tree from the rules. With flat, the nodes are written to
+        a flattree.FlatTree (self.flat) instead of Node objects, and root
+        is a view of its root node. Trees loaded from the rules'
+        tree_directory are always flat. With lazy, only the root is built
+        and the children of each node are built when first read, keeping
+        about max_bytes of them, see lazytree.LazyTree. Reading the
+        information_sets of a lazy tree walks all of it. With processes, the
+        subtree of each deal of the first chance nodes is built by a pool of
+        that many forked processes and the tree is flat, see
+        paralleltree.ParallelTreeBuilder.
+        """
         # Assume everyone is in
         players_in = [True] * self.rules.players
         # Collect antes
@@ -81,7 +141,109 @@ class GameTree(object):
         holes = [()] * self.rules.players
         board = ()
         bet_history = ""
-        self.root = self.build_rounds(None, players_in, committed, holes, board, self.rules.deck, bet_history, 0, bets, next_player)
+        self.build_from(flat, lazy, max_bytes, processes, players_in, committed, holes, board, bet_history, bets, next_player)
+
+    def build_from(self, flat, lazy, max_bytes, processes, players_in, committed, holes, board, bet_history, bets, next_player):
+        if lazy:
+            if flat or processes is not None:
+                raise ValueError("A tree is either flat or lazy")
+            # lazytree builds on the node classes here
+            from lazytree import LazyTree, LazyInformationSets
+            self.lazy = self.builder = LazyTree(self.rules, max_bytes)
+            self.root = self.build_rounds(None, players_in, committed, holes, board, self.rules.deck, bet_history, 0, bets, next_player)
+            self.information_sets = LazyInformationSets(self)
+            return
+        if not flat and processes is None and self.rules.tree_directory is None:
+            self.root = self.build_rounds(None, players_in, committed, holes, board, self.rules.deck, bet_history, 0, bets, next_player)
+            if self.rules.suit_isomorphism:
+                add_frame_views(self.information_sets, self.root, self.rules)
+            return
+        # flattree builds on the node classes here
+        from flattree import FlatTreeBuilder, TreeCache
+        cache = TreeCache(self.rules.tree_directory) if self.rules.tree_directory is not None else None
+        loaded = cache.load(self) if cache else None
+        if loaded is not None:
+            self.use_flat(loaded)
+            return
+        if processes is None:
+            self.builder = FlatTreeBuilder(self.rules)
+        else:
+            from paralleltree import ParallelTreeBuilder
+            self.parallel = self.builder = ParallelTreeBuilder(self, processes)
+        self.build_rounds(None, players_in, committed, holes, board, self.rules.deck, bet_history, 0, bets, next_player)
+        self.use_flat(self.builder.finish())
+        self.builder = self.parallel = None
+        if cache:
+            cache.save(self)
+
+    def use_flat(self, flat):
+        from flattree import FlatInformationSets
+        self.flat = flat
+        self.root = flat.root
+        self.information_sets = FlatInformationSets(flat)
+
+    def save(self, path):
+        """
+        Save a flat tree to path, see flattree.FlatTree.save.
+        """
+        if self.flat is None:
+            raise ValueError("Only flat trees can be saved, build the tree with flat=True")
+        from flattree import tree_key
+        self.flat.save(path, tree_key(self))
+
+    def load(self, path, mmap=True):
+        """
+        Load the tree save wrote to path instead of building it. With mmap
+        the node arrays are read-only views of the file, shared by every
+        process that loads it. Raises ValueError if the tree was saved from
+        other rules.
+        """
+        from flattree import FlatTree, tree_key
+        self.use_flat(FlatTree.load(path, self.rules, mmap, tree_key(self)))
+
+    # Node construction, as Node objects or as rows of a flat tree
+    def new_holecard_node(self, root, committed, holes, board, deck, bet_history, todeal):
+        if self.builder is not None:
+            return self.builder.add(HolecardChanceNode, root, committed, holes, board, deck, bet_history, todeal=todeal)
+        return HolecardChanceNode(root, committed, holes, board, deck, bet_history, todeal)
+
+    def new_boardcard_node(self, root, committed, holes, board, deck, bet_history, todeal):
+        if self.builder is not None:
+            return self.builder.add(BoardcardChanceNode, root, committed, holes, board, deck, bet_history, todeal=todeal)
+        return BoardcardChanceNode(root, committed, holes, board, deck, bet_history, todeal)
+
+    def add_symmetries(self, bnode, symmetries):
+        # The suit permutations of the child just dealt, see BoardcardChanceNode.symmetries
+        if self.builder is not None:
+            self.builder.set_symmetries(bnode, symmetries)
+        else:
+            bnode.symmetries.append(symmetries)
+
+    def new_action_node(self, root, committed, holes, board, deck, bet_history, player):
+        if self.builder is not None:
+            return self.builder.add(ActionNode, root, committed, holes, board, deck, bet_history, player=player)
+        anode = ActionNode(root, committed, holes, board, deck, bet_history, player, self.rules.infoset_format)
+        # add the node to the information set
+        if not (anode.player_view in self.information_sets):
+            self.information_sets[anode.player_view] = []
+        self.information_sets[anode.player_view].append(anode)
+        return anode
+
+    def set_action_child(self, root, action):
+        # The child just built is the one action leads to
+        if self.builder is not None:
+            self.builder.set_action(root, action)
+        elif action == FOLD:
+            root.fold_action = root.children[-1]
+        elif action == CALL:
+            root.call_action = root.children[-1]
+        else:
+            root.raise_action = root.children[-1]
+
+    def new_terminal_node(self, root, committed, holes, board, deck, bet_history, payoffs, players_in, hands=None):
+        if self.builder is not None:
+            return self.builder.add(TerminalNode, root, committed, holes, board, deck, bet_history, payoffs=payoffs, players_in=players_in, hands=hands)
+        return TerminalNode(root, committed, holes, board, deck, bet_history, payoffs, players_in, hands)
 
     def collect_blinds(self, committed, bets, next_player):
         if self.rules.blinds != None:
@@ -120,40 +282,94 @@ class GameTree(object):
             next_player = (next_player + 1) % self.rules.players
         return next_player
 
+    def build_children(self, node, build, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
+        # In a lazy tree, the children are built when first read, from copies of the lists the builder changes in place
+        if self.lazy is None:
+            build(node, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
+        else:
+            self.lazy.defer(node, partial(build, node, next_player, list(players_in), list(committed), holes, board, deck, bet_history, round_idx,
+                min_actions_this_round, actions_this_round, list(bets)))
+
+    def build_chance_child(self, node, build, dealt, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
+        # In a lazy tree, each child of a chance node is built when first read, and in a parallel build by a worker process
+        deferring = self.lazy if self.lazy is not None else self.parallel
+        if deferring is None:
+            build(node, dealt, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
+        else:
+            deferring.defer_child(node, partial(build, node, dealt, next_player, list(players_in), list(committed), holes, board, deck, bet_history, round_idx,
+                min_actions_this_round, actions_this_round, list(bets)))
+
     def build_holecards(self, root, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
         cur_round = self.rules.roundinfo[round_idx]
-        hnode = HolecardChanceNode(root, committed, holes, board, self.rules.deck, "", cur_round.holecard_count)
+        hnode = self.new_holecard_node(root, committed, holes, board, self.rules.deck, "", cur_round.holecard_count)
+        self.build_children(hnode, self.build_holecard_children, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
+        return hnode
+
+    def build_holecard_children(self, hnode, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
+        cur_round = self.rules.roundinfo[round_idx]
         # Deal holecards
         all_hc = self.deal_holecards(deck, cur_round.holecard_count, players_in.count(True))
         # Create a child node for every possible distribution
         for cur_holes in all_hc:
-            dealt_cards = ()
-            cur_holes = list(cur_holes)
-            cur_idx = 0
-            for i,hc in enumerate(holes):
-                # Only deal cards to players who are still in
-                if players_in[i]:
-                    cur_holes[cur_idx] = hc + cur_holes[cur_idx]
-                    cur_idx += 1
-            for hc in cur_holes:
-                dealt_cards += hc
-            cur_deck = [x for x in deck if not (x in dealt_cards)]
-            if cur_round.boardcards:
-                self.build_boardcards(hnode, next_player, players_in, committed, cur_holes, board, cur_deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
-            else:
-                self.build_bets(hnode, next_player, players_in, committed, cur_holes, board, cur_deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
-        return hnode
+            self.build_chance_child(hnode, self.build_holecard_child, cur_holes, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
+
+    def build_holecard_child(self, hnode, cur_holes, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
+        cur_round = self.rules.roundinfo[round_idx]
+        dealt_cards = ()
+        cur_holes = list(cur_holes)
+        cur_idx = 0
+        for i,hc in enumerate(holes):
+            # Only deal cards to players who are still in
+            if players_in[i]:
+                cur_holes[cur_idx] = hc + cur_holes[cur_idx]
+                cur_idx += 1
+        for hc in cur_holes:
+            dealt_cards += hc
+        cur_deck = remove_cards(deck, to_mask(dealt_cards))
+        if cur_round.boardcards:
+            self.build_boardcards(hnode, next_player, players_in, committed, cur_holes, board, cur_deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
+        else:
+            self.build_bets(hnode, next_player, players_in, committed, cur_holes, board, cur_deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
 
     def build_boardcards(self, root, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
         cur_round = self.rules.roundinfo[round_idx]
-        bnode = BoardcardChanceNode(root, committed, holes, board, deck, bet_history, cur_round.boardcards)
-        all_bc = combinations(deck, cur_round.boardcards)
-        for bc in all_bc:
-            cur_board = board + bc
-            cur_deck = [x for x in deck if not (x in bc)]
-            self.build_bets(bnode, next_player, players_in, committed, holes, cur_board, cur_deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
+        bnode = self.new_boardcard_node(root, committed, holes, board, deck, bet_history, cur_round.boardcards)
+        self.build_children(bnode, self.build_boardcard_children, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
         return bnode
 
+    def build_boardcard_children(self, bnode, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
+        cur_round = self.rules.roundinfo[round_idx]
+        all_bc = self.deal_boardcards(deck, cur_round.boardcards, self.board_streets(board, round_idx) + list(holes))
+        for bc, symmetries in all_bc:
+            self.build_chance_child(bnode, self.build_boardcard_child, bc, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
+            self.add_symmetries(bnode, symmetries)
+
+    def build_boardcard_child(self, bnode, bc, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
+        cur_board = board + bc
+        cur_deck = remove_cards(deck, to_mask(bc))
+        self.build_bets(bnode, next_player, players_in, committed, holes, cur_board, cur_deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
+
+    def deal_boardcards(self, deck, boardcards, dealt):
+        """
+        Every deal of boardcards from deck, with the suit permutations it
+        stands for (see BoardcardChanceNode.symmetries). With suit_isomorphism
+        only one deal of each class that can't be told apart from the cards
+        already dealt is kept.
+        """
+        all_bc = combinations(deck, boardcards)
+        if not self.rules.suit_isomorphism:
+            return [(bc, [IDENTITY]) for bc in all_bc]
+        allowed = deck_permutations(self.rules.deck, dealt)
+        return [(deal[0], symmetries) for deal, symmetries in canonical_deals([(bc,) for bc in all_bc], allowed)]
+
+    def board_streets(self, board, round_idx):
+        # The board cards dealt in each round before round_idx
+        streets = []
+        for r in self.rules.roundinfo[:round_idx]:
+            if r.boardcards:
+                streets.append(board[sum(len(s) for s in streets):][:r.boardcards])
+        return streets
+
     def build_bets(self, root, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets_this_round):
         # if everyone else folded, end the hand
         if players_in.count(True) == 1:
@@ -163,12 +379,12 @@ class GameTree(object):
         if actions_this_round >= min_actions_this_round and self.all_called_last_raisor_or_folded(players_in, bets_this_round):
             self.build_rounds(root, players_in, committed, holes, board, deck, bet_history, round_idx + 1)
             return
+        anode = self.new_action_node(root, committed, holes, board, deck, bet_history, next_player)
+        self.build_children(anode, self.build_action_children, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets_this_round)
+        return anode
+
+    def build_action_children(self, anode, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets_this_round):
         cur_round = self.rules.roundinfo[round_idx]
-        anode = ActionNode(root, committed, holes, board, deck, bet_history, next_player, self.rules.infoset_format)
-        # add the node to the information set
-        if not (anode.player_view in self.information_sets):
-            self.information_sets[anode.player_view] = []
-        self.information_sets[anode.player_view].append(anode)
         # get the next player to act
         next_player = self.get_next_player(next_player, players_in)
         # add a folding option if someone has bet more than this player
@@ -179,7 +395,6 @@ class GameTree(object):
         # add a raising option if this player has not reached their max bet level
         if cur_round.maxbets[anode.player] > max(bets_this_round):
             self.add_raise_child(anode, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets_this_round)
-        return anode
 
     def all_called_last_raisor_or_folded(self, players_in, bets):
         betlevel = max(bets)
@@ -192,7 +407,7 @@ class GameTree(object):
         players_in[root.player] = False
         bet_history += 'f'
         self.build_bets(root, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round + 1, bets_this_round)
-        root.fold_action = root.children[-1]
+        self.set_action_child(root, FOLD)
         players_in[root.player] = True
 
     def add_call_child(self, root, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets_this_round):
@@ -202,7 +417,7 @@ class GameTree(object):
         bets_this_round[root.player] = max(bets_this_round)
         bet_history += 'c'
         self.build_bets(root, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round + 1, bets_this_round)
-        root.call_action = root.children[-1]
+        self.set_action_child(root, CALL)
         committed[root.player] = player_commit
         bets_this_round[root.player] = player_bets
 
@@ -214,31 +429,35 @@ class GameTree(object):
         committed[root.player] += (bets_this_round[root.player] - prev_betlevel) * cur_round.betsize
         bet_history += 'r'
         self.build_bets(root, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round + 1, bets_this_round)
-        root.raise_action = root.children[-1]
+        self.set_action_child(root, RAISE)
         bets_this_round[root.player] = prev_betlevel
         committed[root.player] = prev_commit
 
     def showdown(self, root, players_in, committed, holes, board, deck, bet_history):
-        assert (False)  # unsupported for now
-        # if players_in.count(True) == 1:
-        #     winners = [i for i,v in enumerate(players_in) if v]
-        # else:
-        #     scores = [self.rules.handeval(hc, board) for hc in holes]
-        #     winners = []
-        #     maxscore = -1
-        #     for i,s in enumerate(scores):
-        #         if players_in[i]:
-        #             if len(winners) == 0 or s > maxscore:
-        #                 maxscore = s
-        #                 winners = [i]
-        #             elif s == maxscore:
-        #                 winners.append(i)
-        # pot = sum(committed)
-        # payoff = pot / float(len(winners))
-        # payoffs = [-x for x in committed]
-        # for w in winners:
-        #     payoffs[w] += payoff
-        # return TerminalNode(root, committed, holes, board, deck, bet_history, payoffs, players_in)
+        # The pot is split between the players still in with the best hand
+        winners = np.array(players_in)
+        if winners.sum() > 1:
+            scores = self.get_showdown_scores(holes, board)
+            winners &= scores == scores[winners].max()
+        chips = np.array(committed, np.float64)
+        payoffs = winners * (chips.sum() / winners.sum()) - chips
+        return self.new_terminal_node(root, committed, holes, board, deck, bet_history, payoffs, players_in)
+
+    def get_showdown_scores(self, holes, board):
+        """
+        The handeval score of each player's holecards on board, scored at
+        once by rules.handeval_batch. The showdowns of a deal are built
+        one after another, so the scores of the last deal are kept.
+        """
+        key = (tuple(holes), board)
+        if self.showdown_scores is None or self.showdown_scores[0] != key:
+            hands = np.array([[card.to_code() for card in hc] for hc in holes], np.intp)
+            self.showdown_scores = (key, np.asarray(self.rules.handeval_batch(hands, np.array([card.to_code() for card in board], np.intp))))
+        return self.showdown_scores[1]
+
+    def shared_hands(self, hands, board):
+        # The hands of the terminals on board a worker of a parallel build made, see PublicTree.shared_hands
+        return hands
 
     # def holecard_distributions(self):
     #     x = Counter(combinations(self.rules.deck, self.holecards))
@@ -248,11 +467,70 @@ class GameTree(object):
 def multi_infoset_format(base_infoset_format, player, holecards, board, bet_history):
     return tuple([base_infoset_format(player, hc, board, bet_history) for hc in holecards])
 
+@lru_cache(maxsize=None)
+def permute_dealt(rules, cards, permutation):
+    # The suit permuted cards, in deck order like the tree deals them
+    if permutation == IDENTITY:
+        return tuple(cards)
+    return tuple(sorted(permute_cards(cards, permutation), key=rules.deck.index))
+
+def frame_infoset(rules, frame, player, holecards, board, bet_history):
+    """
+    rules.infoset_format of holecards, a hand or a range of them, on board
+    in the suits of the deal the suit permutation frame sends them to, see
+    suit_frames. Each hand and each street of the board is in deck order,
+    as the full game tree deals them.
+    """
+    if frame == IDENTITY:
+        return rules.infoset_format(player, holecards, board, bet_history)
+    if len(holecards) and not isinstance(holecards[0], Card):
+        # A range is in the order the tree deals its hands too
+        holecards = sorted((permute_dealt(rules, tuple(hc), frame) for hc in holecards), key=lambda hc: [rules.deck.index(card) for card in hc])
+    else:
+        holecards = permute_dealt(rules, tuple(holecards), frame)
+    streets = ()
+    for r in rules.roundinfo:
+        if r.boardcards and len(streets) < len(board):
+            streets += permute_dealt(rules, tuple(board[len(streets):len(streets) + r.boardcards]), frame)
+    return rules.infoset_format(player, holecards, streets, bet_history)
+
+def suit_frames(root):
+    """
+    Each action node under root, with its frames: the suit permutations
+    that send it to every node of the full game tree it stands for, made of
+    the BoardcardChanceNode.symmetries of the boards above it, identity
+    first. Without GameRules.suit_isomorphism each node only has identity.
+    """
+    stack = [(root, [IDENTITY])]
+    while stack:
+        node, frames = stack.pop()
+        if isinstance(node, ActionNode):
+            yield node, frames
+        if isinstance(node, BoardcardChanceNode):
+            for child, symmetries in zip(node.children, node.symmetries):
+                stack.append((child, [compose(frame, permutation) for frame in frames for permutation in symmetries]))
+        elif not isinstance(node, TerminalNode):
+            stack.extend((child, frames) for child in node.children)
+
+def add_frame_views(information_sets, root, rules):
+    """
+    Add every action node under root to information_sets under the player
+    view it has in each of its other frames (see suit_frames), so they hold
+    the information sets of the full game tree. rules are the tree's.
+    """
+    for node, frames in suit_frames(root):
+        for frame in frames[1:]:
+            view = frame_infoset(rules, frame, node.player, node.holecards[node.player], node.board, node.bet_history)
+            if view != node.player_view:
+                information_sets.setdefault(view, []).append(node)
+
 class PublicTree(GameTree):
     def __init__(self, rules):
-        GameTree.__init__(self, GameRules(rules.players, rules.deck, rules.roundinfo, rules.ante, rules.blinds, rules.handeval, partial(multi_infoset_format, rules.infoset_format)))
+        GameTree.__init__(self, GameRules(rules.players, rules.deck, rules.roundinfo, rules.ante, rules.blinds, rules.handeval, partial(multi_infoset_format, rules.infoset_format), rules.suit_isomorphism, rules.rank_directory, rules.handeval_batch, rules.tree_directory))
 
-    def build(self):
+    def build(self, flat=False, lazy=False, max_bytes=None, processes=None):
+        self.board_hands = {}
+        self.showdown_rankings = {}
         # Assume everyone is in
         players_in = [True] * self.rules.players
         # Collect antes
@@ -263,12 +541,15 @@ class PublicTree(GameTree):
         holes = [[()]] * self.rules.players
         board = ()
         bet_history = ""
-        self.root = self.build_rounds(None, players_in, committed, holes, board, self.rules.deck, bet_history, 0, bets, next_player)
+        self.build_from(flat, lazy, max_bytes, processes, players_in, committed, holes, board, bet_history, bets, next_player)
 
 
-    def build_holecards(self, root, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
+    def build_holecard_children(self, hnode, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
+        # Every player is dealt every holecards at once, so there is a single child
+        self.build_chance_child(hnode, self.build_holecard_child, None, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
+
+    def build_holecard_child(self, hnode, dealt, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
         cur_round = self.rules.roundinfo[round_idx]
-        hnode = HolecardChanceNode(root, committed, holes, board, self.rules.deck, "", cur_round.holecard_count)
         # Deal holecards
         all_hc = list(combinations(deck, cur_round.holecard_count))
         updated_holes = []
@@ -283,89 +564,83 @@ class PublicTree(GameTree):
                 updated_holes.append([])
                 # Filter holecards to valid combinations
                 # TODO: Speed this up by removing duplicate holecard combinations
+                old_masks = [to_mask(old_hc) for old_hc in holes[player]]
                 for new_hc in all_hc:
-                    for old_hc in holes[player]:
-                        if not overlap(old_hc, new_hc):
-                            updated_holes[player].append(old_hc + new_hc)         
+                    new_mask = to_mask(new_hc)
+                    for old_hc, old_mask in zip(holes[player], old_masks):
+                        if not overlaps(old_mask, new_mask):
+                            updated_holes[player].append(old_hc + new_hc)
         if cur_round.boardcards:
             self.build_boardcards(hnode, next_player, players_in, committed, updated_holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
         else:
             self.build_bets(hnode, next_player, players_in, committed, updated_holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
-        return hnode
 
-    def build_boardcards(self, root, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
+    def build_boardcard_children(self, bnode, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
         cur_round = self.rules.roundinfo[round_idx]
-        bnode = BoardcardChanceNode(root, committed, holes, board, deck, bet_history, cur_round.boardcards)
-        all_bc = combinations(deck, cur_round.boardcards)
-        for bc in all_bc:
-            cur_board = board + bc
-            cur_deck = [x for x in deck if not (x in bc)]
-            updated_holes = []
-            # Filter any holecards that are now impossible
-            for player in range(self.rules.players):
-                updated_holes.append([])
-                for hc in holes[player]:
-                    if not overlap(hc, bc):
-                        updated_holes[player].append(hc)
-            self.build_bets(bnode, next_player, players_in, committed, updated_holes, cur_board, cur_deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
-        return bnode
+        # Every player holds a range of all possible holecards, so only the board tells deals apart
+        all_bc = self.deal_boardcards(deck, cur_round.boardcards, self.board_streets(board, round_idx))
+        for bc, symmetries in all_bc:
+            self.build_chance_child(bnode, self.build_boardcard_child, bc, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
+            self.add_symmetries(bnode, symmetries)
+
+    def build_boardcard_child(self, bnode, bc, next_player, players_in, committed, holes, board, deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets):
+        cur_board = board + bc
+        cur_deck = remove_cards(deck, to_mask(bc))
+        # Filter any holecards that are now impossible
+        live = range_support(self.rules).board_mask(bc)
+        updated_holes = [[hc for hc in holes[player] if live[cards_to_range_index(self.rules, hc)]] for player in range(self.rules.players)]
+        self.build_bets(bnode, next_player, players_in, committed, updated_holes, cur_board, cur_deck, bet_history, round_idx, min_actions_this_round, actions_this_round, bets)
 
     def showdown(self, root, players_in, committed, holes, board, deck, bet_history):
-        # TODO: Speedup
-        # - Pre-order list of hands
-        pot = sum(committed)
-        showdowns_possible = self.showdown_combinations(holes)
-        hands_possible = range_size(self.rules)
+        # Terminals only keep what their payoffs depend on. Every player holds the
+        # same range, so one BoardHands of it serves them all, shared by all the
+        # terminals on the board. The payoffs are computed from it when needed.
         if players_in.count(True) == 1:
-            fold_payoffs = [-x for x in committed]
-            fold_payoffs[players_in.index(True)] += pot
-            payoffs = { hands: fold_payoffs for hands in showdowns_possible } #TODO
+            hands = self.get_board_hands(holes[0], board)
         else:
-            scores = self.get_terminal_win_probs(hands_possible, board)
-            payoffs = { hands: self.calc_payoffs(hands, scores, players_in, committed, pot) for hands in showdowns_possible }
-        return TerminalNode(root, committed, holes, board, deck, bet_history, payoffs, players_in)
-
-    @lru_cache(52*52)
-    def get_terminal_win_probs(self, hands_possible, board):
-        scores = np.zeros(hands_possible, np.longdouble)
-        for hand_index in range(0, hands_possible):
-            if scores[hand_index] == 0:
-                scores[hand_index] = self.rules.handeval(range_index_to_cards(self.rules, hand_index), board)
-        return scores
-
-    def showdown_combinations(self, holes):
-        # Get all the possible holecard matchups for a given showdown.
-        # Every card must be unique because two players cannot have the same holecard.
-        return list([x for x in product(*holes) if all_unique(x)])
-
-    def calc_payoffs(self, hands, scores, players_in, committed, pot):        
-        winners = []
-        maxscore = -1
-        for player,hand in enumerate(hands):
-            if players_in[player]:
-                s = scores[cards_to_range_index(self.rules, hand)]
-                if len(winners) == 0 or s > maxscore:
-                    maxscore = s
-                    winners = [player]
-                elif s == maxscore:
-                    winners.append(player)
-        payoff = pot / float(len(winners))
-        payoffs = [-x for x in committed]
-        for w in winners:
-            payoffs[w] += payoff
-        return payoffs    
+            hands = self.get_showdown_ranking(holes[0], board)
+        return self.new_terminal_node(root, committed, holes, board, deck, bet_history, None, players_in, hands)
+
+    def shared_hands(self, hands, board):
+        # The hands a worker of a parallel build gave terminals on board, or those of the terminals already on it
+        cache = self.showdown_rankings if isinstance(hands, ShowdownRanking) else self.board_hands
+        return cache.setdefault(board, hands)
+
+    def get_board_hands(self, hands, board):
+        if board not in self.board_hands:
+            self.board_hands[board] = BoardHands(self.rules, hands)
+        return self.board_hands[board]
+
+    def get_showdown_ranking(self, hands, board):
+        if board not in self.showdown_rankings:
+            self.showdown_rankings[board] = ShowdownRanking(self.rules, hands, self.get_terminal_win_probs(board))
+        return self.showdown_rankings[board]
+
+    def get_terminal_win_probs(self, board):
+        # Integer hand ranks of every range index on board, higher wins
+        if self.rules.rank_directory is None:
+            return board_ranks(self.rules, board)
+        return BoardRankStore.open(self.rules, self.rules.rank_directory).ranks(board)
 
 class Node(object):
-    def __init__(self, parent, committed, holecards, board, deck, bet_history):
+    def __init__(self, parent, committed, holecards, board, deck, bet_history, shared=False):
+        # With shared, holecards and board are kept rather than copied, for
+        # nodes that share them with their siblings and never change them
+        copy = (lambda x: x) if shared else deepcopy
         self.committed = deepcopy(committed)
-        self.holecards = deepcopy(holecards)
-        self.board = deepcopy(board)
-        self.deck = deepcopy(deck)
+        self.holecards = copy(holecards)
+        self.board = copy(board)
+        # The cards left to deal, as a cardset
+        self.deck_mask = to_mask(deck)
         self.bet_history = deepcopy(bet_history)
         if parent:
             self.parent = parent
             self.parent.add_child(self)
 
+    @property
+    def deck(self):
+        return to_cards(self.deck_mask)
+
     def add_child(self, child):
         if self.children is None:
             self.children = [child]
@@ -373,10 +648,21 @@ class Node(object):
             self.children.append(child)
 
 class TerminalNode(Node):
-    def __init__(self, parent, committed, holecards, board, deck, bet_history, payoffs, players_in):
-        Node.__init__(self, parent, committed, holecards, board, deck, bet_history)
-        self.payoffs = payoffs
+    def __init__(self, parent, committed, holecards, board, deck, bet_history, payoffs, players_in, hands=None):
+        Node.__init__(self, parent, committed, holecards, board, deck, bet_history, hands is not None)
+        self.stored_payoffs = payoffs
         self.players_in = deepcopy(players_in)
+        # In a PublicTree, the showdown.BoardHands of a fold or the
+        # showdown.ShowdownRanking of a showdown, shared by the terminals on
+        # the board, instead of stored payoffs. None otherwise.
+        self.hands = hands
+
+    @property
+    def payoffs(self):
+        # The payoffs of each holecard matchup, built from hands when there are no stored ones
+        if self.hands is None:
+            return self.stored_payoffs
+        return matchup_payoffs(self.hands, self.holecards, self.players_in, self.committed)
 
 class HolecardChanceNode(Node):
     def __init__(self, parent, committed, holecards, board, deck, bet_history, todeal):
@@ -389,6 +675,10 @@ class BoardcardChanceNode(Node):
         Node.__init__(self, parent, committed, holecards, board, deck, bet_history)
         self.todeal = todeal
         self.children = []
+        # symmetries[i] lists the suit permutations (see isomorphism.py) that send
+        # children[i]'s board to each board it stands for, identity first.
+        # Without GameRules.suit_isomorphism every child stands for itself alone.
+        self.symmetries = []
 
 class ActionNode(Node):
     def __init__(self, parent, committed, holecards, board, deck, bet_history, player, infoset_format):
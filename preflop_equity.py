@@ -0,0 +1,201 @@
+from hand_ranges import RANGE_CODES_2, RANGE_INDEX_2
+from isomorphism import CODE_PERMUTATIONS, SUIT_PERMUTATIONS, board_keys, canonical_boards, hand_permutations
+from lookup_tables import TABLE_DIR
+from math import comb
+from multiprocessing import Pool
+import numpy as np
+import os
+import sys
+import time
+
+# Preflop all-in equity of one hand against another is its chance of
+# winning, ties counting half, over every 5-card board that misses both
+# hands. Hands are indexed like hand_ranges.cards_to_range_index.
+RANGE_SIZE = len(RANGE_CODES_2)
+RUNOUTS = comb(48, 5)
+# Boards per task handed to a worker, a few seconds each. Must stay below
+# 2**16 so a worker can count wins in uint16.
+CHUNK_SIZE = 2048
+# Rank given to hands the board blocks, worse than any real rank
+DEAD = 1 << 14
+
+def hand_class(codes):
+    """
+    The class (0..168) of each row of an (N, 2) array of hole card codes,
+    as a 13 x 13 grid of rank codes (0 is a deuce): pairs on the diagonal,
+    suited hands at [high, low] and offsuit hands at [low, high].
+    """
+    codes = np.asarray(codes, np.intp)
+    ranks = codes >> 2
+    high, low = ranks.max(axis=1), ranks.min(axis=1)
+    suited = (codes[:, 0] & 3) == (codes[:, 1] & 3)
+    return np.where(suited, high * 13 + low, low * 13 + high)
+
+HAND_CLASSES = hand_class(RANGE_CODES_2)
+# 'AA', 'AKs', 'AKo' etc. of each class
+CLASS_NAMES = [None] * 169
+for high in range(13):
+    for low in range(high + 1):
+        name = '23456789TJQKA'[high] + '23456789TJQKA'[low]
+        if high == low:
+            CLASS_NAMES[high * 13 + low] = name
+        else:
+            CLASS_NAMES[high * 13 + low] = name + 's'
+            CLASS_NAMES[low * 13 + high] = name + 'o'
+
+def board_orbits(boards):
+    """
+    How many distinct boards the suit permutations send each board (a row
+    of card codes) to, the weight of a canonical board among all boards.
+    """
+    boards = np.asarray(boards, np.intp)
+    keys = np.sort(board_keys(np.sort(CODE_PERMUTATIONS[:, boards], axis=2).reshape(-1, boards.shape[1]))
+        .reshape(len(SUIT_PERMUTATIONS), -1), axis=0)
+    return 1 + (np.diff(keys, axis=0) != 0).sum(axis=0)
+
+def board_wins(boards):
+    """
+    wins[i, j] is the number of boards (5 card codes per row), weighted by
+    board_orbits, on which hand i ranks better than hand j. A hand the
+    board blocks loses to every live hand.
+    """
+    # hand_evaluator pulls in this module for HandEvaluator.Two
+    from hand_evaluator import BoardState
+    boards = np.asarray(boards, np.intp)
+    orbits = board_orbits(boards)
+    wins = np.zeros((RANGE_SIZE, RANGE_SIZE), np.int64)
+    beats = np.empty((RANGE_SIZE, RANGE_SIZE), np.bool_)
+    # Count each orbit size in uint16, then weight the counts once
+    for orbit in np.unique(orbits):
+        counts = np.zeros((RANGE_SIZE, RANGE_SIZE), np.uint16)
+        for board in boards[orbits == orbit]:
+            ranks = BoardState(board).complete_rank_batch(RANGE_CODES_2)
+            ranks[np.isin(RANGE_CODES_2, board).any(axis=1)] = DEAD
+            np.less.outer(ranks, ranks, out=beats)
+            np.add(counts, beats, out=counts)
+        wins += orbit * counts.astype(np.int64)
+    return wins
+
+def hand_equities(wins):
+    """
+    The RANGE_SIZE x RANGE_SIZE equity matrix from board_wins summed over
+    every canonical 5-card board. Summing over the suit permutations of
+    each canonical board turns that into every board 24 times. A blocked
+    hand's loss to a live one cancels in wins - wins.T, so the difference
+    counts the boards both hands see. Hands sharing a card get NaN.
+    """
+    permutations = hand_permutations()
+    total = np.zeros_like(wins)
+    for permutation in permutations:
+        total += wins[permutation][:, permutation]
+    assert(not (total % len(permutations)).any())
+    total //= len(permutations)
+    equities = 0.5 + (total - total.T) / (2.0 * RUNOUTS)
+    codes = RANGE_CODES_2
+    blocked = (codes[:, None, :, None] == codes[None, :, None, :]).any(axis=(2, 3))
+    equities[blocked] = np.nan
+    return equities
+
+def class_equities(equities):
+    """
+    The 169 x 169 class equity matrix: the mean equity over the hand pairs
+    of two classes that don't share a card.
+    """
+    members = np.zeros((RANGE_SIZE, 169))
+    members[np.arange(RANGE_SIZE), HAND_CLASSES] = 1
+    live = ~np.isnan(equities)
+    sums = members.T.dot(np.where(live, equities, 0)).dot(members)
+    counts = members.T.dot(live).dot(members)
+    return sums / counts
+
+def compute_chunk(boards):
+    return board_wins(boards)
+
+class PreflopEquity:
+    """
+    Exact preflop all-in equities between hand classes (169 x 169) and
+    between hands (1326 x 1326, with card removal), precomputed once by
+    generate and memory-mapped from tables/ the first time they are read.
+    Lookups are a single array read.
+    """
+    classes_path = os.path.join(TABLE_DIR, 'preflop_equity_classes.npy')
+    hands_path = os.path.join(TABLE_DIR, 'preflop_equity_hands.npy')
+    classes = None
+    hands = None
+
+    def load_table(path):
+        if not os.path.exists(path):
+            raise FileNotFoundError("No preflop equity table at {0}, run `python preflop_equity.py` to generate it".format(path))
+        return np.load(path, mmap_mode='r')
+
+    def load_classes(path=None):
+        if PreflopEquity.classes is None or path is not None:
+            PreflopEquity.classes = PreflopEquity.load_table(path or PreflopEquity.classes_path)
+        return PreflopEquity.classes
+
+    def load_hands(path=None):
+        if PreflopEquity.hands is None or path is not None:
+            PreflopEquity.hands = PreflopEquity.load_table(path or PreflopEquity.hands_path)
+        return PreflopEquity.hands
+
+    def class_index(hand):
+        """
+        The class of 2 Cards, see hand_class.
+        """
+        a, b = hand[0].rank - 2, hand[1].rank - 2
+        if hand[0].suit == hand[1].suit:
+            return max(a, b) * 13 + min(a, b)
+        return min(a, b) * 13 + max(a, b)
+
+    def class_equity(hand, opponent):
+        """
+        Equity of the class of hand (2 Cards) against the class of opponent.
+        """
+        table = PreflopEquity.load_classes()
+        return float(table[PreflopEquity.class_index(hand), PreflopEquity.class_index(opponent)])
+
+    def hand_equity(hand, opponent):
+        """
+        Equity of hand (2 Cards) against opponent, NaN if they share a card.
+        """
+        table = PreflopEquity.load_hands()
+        i = RANGE_INDEX_2[hand[0].to_code(), hand[1].to_code()]
+        j = RANGE_INDEX_2[opponent[0].to_code(), opponent[1].to_code()]
+        return float(table[i, j])
+
+    def generate(processes=None, classes_path=None, hands_path=None):
+        """
+        Compute both tables over every canonical 5-card board (see
+        isomorphism.canonical_boards) on a pool of processes, one per CPU by
+        default, and save them as float32.
+        """
+        boards = canonical_boards(5)
+        tasks = [boards[start:start + CHUNK_SIZE] for start in range(0, len(boards), CHUNK_SIZE)]
+        wins = np.zeros((RANGE_SIZE, RANGE_SIZE), np.int64)
+        with Pool(processes) as pool:
+            for chunk_wins in pool.imap_unordered(compute_chunk, tasks):
+                wins += chunk_wins
+        hands = hand_equities(wins)
+        classes = class_equities(hands)
+        for path, table in ((classes_path or PreflopEquity.classes_path, classes), (hands_path or PreflopEquity.hands_path, hands)):
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            np.save(path, table.astype(np.float32))
+        PreflopEquity.classes = None
+        PreflopEquity.hands = None
+        return classes, hands
+
+    load_table = staticmethod(load_table)
+    load_classes = staticmethod(load_classes)
+    load_hands = staticmethod(load_hands)
+    class_index = staticmethod(class_index)
+    class_equity = staticmethod(class_equity)
+    hand_equity = staticmethod(hand_equity)
+    generate = staticmethod(generate)
+
+if __name__ == '__main__':
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    start = time.time()
+    PreflopEquity.generate(processes)
+    print('Generated preflop equities over {0} canonical boards in {1:.1f}s'.format(len(canonical_boards(5)), time.time() - start))
@@ -0,0 +1,142 @@
+from hand_ranges import cards_to_range_index
+from blockers import range_support
+from itertools import product
+import numpy as np
+
+class BoardHands(object):
+    """
+    The holecards still possible on one board, shared by every terminal
+    on that board, with the per-card sums that take out the opponent hands
+    sharing a card with ours (card removal) in O(n) rather than O(n^2).
+    """
+    def __init__(self, rules, hands):
+        self.hands = list(hands)
+        self.indexes = np.array([cards_to_range_index(rules, hc) for hc in hands], np.intp)
+        self.support = range_support(rules, len(self.hands[0]))
+        self.codes = self.support.codes[self.indexes]
+        # Opponent hands holding both of a hand's cards are the hand itself, which the card sums take out too often
+        assert(self.codes.shape[1] <= 2)
+        self.live = np.zeros(self.support.size, np.bool_)
+        self.live[self.indexes] = True
+        # Number of opponent hands each hand can face, what the matchup payoffs are averaged over
+        self.counts = self.facing(np.ones(self.support.size)).clip(min=1)
+
+    def facing(self, reach):
+        """
+        For each hand, the opponent reach (indexed by range index) of the
+        hands that share no card with it.
+        """
+        return self.support.unblocked(np.where(self.live, reach, 0))[self.indexes]
+
+class ShowdownRanking(BoardHands):
+    """
+    BoardHands sorted by their handeval score (higher wins). With the hands
+    sorted, the opponent reach a hand beats or ties is a difference of
+    cumulative sums, and per-card cumulative sums do the card removal, so
+    a showdown costs O(n) after the O(n log n) sort.
+    """
+    def __init__(self, rules, hands, scores):
+        BoardHands.__init__(self, rules, hands)
+        self.scores = np.asarray(scores)[self.indexes]
+        self.order, self.lower, self.upper = score_positions(self.scores)
+
+    def sums(self, reach):
+        """
+        For each hand, the opponent reach (indexed by range index) it beats
+        and ties, leaving out opponent hands that share a card.
+        """
+        return card_removal_sums(self.order, self.lower, self.upper, self.codes, np.asarray(reach)[self.indexes])
+
+def score_positions(scores):
+    """
+    The order that sorts scores, and for each score where its ties start
+    and end in that order: the hands it beats come before lower.
+    """
+    order = np.argsort(scores, kind='stable')
+    sorted_scores = scores[order]
+    return order, np.searchsorted(sorted_scores, scores, 'left'), np.searchsorted(sorted_scores, scores, 'right')
+
+def card_removal_sums(order, lower, upper, codes, weights):
+    """
+    For each hand, with its card codes in a row of codes (at most 2 cards)
+    and positions from score_positions, the weight of the hands it beats
+    and ties, leaving out hands that share a card with it. Weights in
+    sorted order give prefix sums, so the weight beaten is one lookup, and
+    per-card prefix sums take out the hands holding each of its cards.
+    """
+    cumulative = np.concatenate([[0], np.cumsum(weights[order])])
+    holding = np.zeros((len(weights), 52), weights.dtype)
+    for column in codes.T:
+        holding[np.arange(len(weights)), column] = weights
+    card_cumulative = np.concatenate([np.zeros((1, 52), weights.dtype), np.cumsum(holding[order], axis=0)])
+
+    beaten = cumulative[lower]
+    tied = cumulative[upper] - beaten
+    for column in codes.T:
+        beaten = beaten - card_cumulative[lower, column]
+        tied = tied - (card_cumulative[upper, column] - card_cumulative[lower, column])
+    # A hand holding both our cards is our own, taken out of the ties once per card
+    tied += (codes.shape[1] - 1) * weights
+    return beaten, tied
+
+def showdown_payoffs(ranking, reachprobs, committed, size):
+    """
+    Counterfactual payoffs of a 2 player showdown: for each player and hand,
+    the payoffs against each opponent hand weighted by its reach, averaged
+    over the opponent hands it can face. The same values as summing
+    matchup_payoffs over every matchup.
+    """
+    pot = sum(committed)
+    payoffs = np.zeros((2, size), np.longdouble)
+    for player in range(2):
+        reach = np.asarray(reachprobs[1 - player], np.longdouble)
+        beaten, tied = ranking.sums(reach)
+        facing = ranking.facing(reach)
+        payoffs[player, ranking.indexes] = (pot * (beaten + 0.5 * tied) - committed[player] * facing) / ranking.counts
+    return payoffs
+
+def fold_payoffs(hands, reachprobs, committed, players_in, size):
+    """
+    Counterfactual payoffs of a 2 player terminal where one player folded.
+    The winnings don't depend on the cards, so each hand's payoff is the
+    winnings times the opponent reach it can face, over the hands it can face.
+    """
+    pot = sum(committed)
+    payoffs = np.zeros((2, size), np.longdouble)
+    for player in range(2):
+        winnings = (pot if players_in[player] else 0) - committed[player]
+        payoffs[player, hands.indexes] = winnings * hands.facing(np.asarray(reachprobs[1 - player], np.longdouble)) / hands.counts
+    return payoffs
+
+def terminal_payoffs(root, reachprobs, size):
+    """
+    fold_payoffs or showdown_payoffs of a TerminalNode with hands (see
+    TerminalNode.hands), reachprobs indexed by player then range index.
+    """
+    if root.players_in.count(True) == 1:
+        return fold_payoffs(root.hands, reachprobs, root.committed, root.players_in, size)
+    return showdown_payoffs(root.hands, reachprobs, root.committed, size)
+
+def matchup_payoffs(hands, holecards, players_in, committed):
+    """
+    The payoffs of a terminal for every holecard matchup, a dict from the
+    holecards of each player to the payoff of each player, with a
+    ShowdownRanking for showdowns and BoardHands for folds.
+    """
+    pot = sum(committed)
+    # Every card must be unique because two players cannot have the same holecard
+    matchups = [m for m in product(*holecards) if len(set(card for hc in m for card in hc)) == sum(len(hc) for hc in m)]
+    if players_in.count(True) == 1:
+        payoffs = [-x for x in committed]
+        payoffs[players_in.index(True)] += pot
+        return { m: payoffs for m in matchups }
+    scores = dict(zip(hands.hands, hands.scores))
+    result = {}
+    for m in matchups:
+        best = max(scores[hc] for player, hc in enumerate(m) if players_in[player])
+        winners = [player for player, hc in enumerate(m) if players_in[player] and scores[hc] == best]
+        payoffs = [-x for x in committed]
+        for w in winners:
+            payoffs[w] += pot / float(len(winners))
+        result[m] = payoffs
+    return result
@@ -0,0 +1,115 @@
+import sys
+import os
+sys.path.insert(0,os.path.realpath('.'))
+from abstraction import *
+from hand_strength import HandStrengthTables, precompute
+from hand_ranges import RANGE_INDEX_2
+from isomorphism import SUIT_PERMUTATIONS, permute_cards
+from card import Card
+from pokertrees import *
+from pokergames import holdem_abstraction_rules, holdem_eval, holdem_eval_batch
+from board_ranks import board_ranks
+from showdown import ShowdownRanking
+import random
+import shutil
+import tempfile
+import numpy as np
+
+print('Testing card abstraction')
+
+random.seed(0)
+
+print('k-means finds well separated clusters')
+rng = np.random.RandomState(0)
+means = np.array([[0.0, 0.0], [10.0, 0.0], [0.0, 10.0]])
+points = np.concatenate([m + rng.randn(100, 2) for m in means])
+centers, labels = kmeans(points, 3)
+for i in range(3):
+    assert(len(set(labels[i * 100:(i + 1) * 100])) == 1)
+assert(len(set(labels)) == 3)
+
+print('Preflop buckets')
+preflop = preflop_buckets()
+assert(len(set(preflop)) == 169)
+aces = [RANGE_INDEX_2[48 + a, 48 + b] for a in range(4) for b in range(a + 1, 4)]
+assert(len(set(preflop[aces])) == 1)
+
+directory = tempfile.mkdtemp()
+saved = tempfile.mkdtemp()
+try:
+    print('Buckets from hand strength tables')
+    precompute(directory, streets=['river'], processes=2, max_boards=1000)
+    precompute(directory, streets=['turn', 'flop'], processes=2, max_boards=1)
+    tables = HandStrengthTables(directory)
+    abstraction = CardAbstraction.build(tables, { 'flop': 5, 'turn': 8, 'river': 10 }, sample_size=20000)
+    river = abstraction.buckets['river']
+    assert(river.max() == NO_BUCKET and set(np.unique(river[:1000])) == set(range(10)) | set([NO_BUCKET]))
+    # River buckets are E[HS] intervals numbered from the weakest up
+    ehs = tables.load('river')['ehs']
+    for row in range(0, 1000, 50):
+        live = river[row] != NO_BUCKET
+        order = np.argsort(ehs[row][live], kind='stable')
+        assert((np.diff(river[row][live][order].astype(int)) >= 0).all())
+
+    print('Lookups are the same for isomorphic hands')
+    boards = tables.load('river')['boards']
+    for _ in range(50):
+        board = [Card.from_code(c) for c in boards[random.randrange(1000)]]
+        hole = random.sample([Card.from_code(c) for c in range(52) if c not in [card.to_code() for card in board]], 2)
+        bucket = abstraction.bucket(hole, board)
+        p = random.randrange(len(SUIT_PERMUTATIONS))
+        permuted_hole, permuted_board = list(permute_cards(hole, p)), list(permute_cards(board, p))
+        assert(abstraction.bucket(permuted_hole, permuted_board) == bucket)
+        assert(abstraction.board_buckets(permuted_board)[RANGE_INDEX_2[permuted_hole[0].to_code(), permuted_hole[1].to_code()]] == bucket)
+    try:
+        abstraction.bucket(hole, [Card.from_code(c) for c in boards[-1]])
+        assert(False)
+    except KeyError:
+        pass
+
+    print('Infoset format')
+    board = [Card(2,1), Card(2,2), Card(2,3), Card(2,4), Card(3,2)]
+    hole = [Card(14,1), Card(14,2)]
+    infoset = abstraction.infoset_format(0, hole, board, 'rc/c')
+    assert(infoset == '{0}.{1}.{2}.{3}:rc/c:'.format(*[abstraction.bucket(hole, board[:size]) for size in (0, 3, 4, 5)]))
+    # Renaming suits gives the same infoset
+    assert(abstraction.infoset_format(0, [Card(14,3), Card(14,4)], [Card(2,3), Card(2,4), Card(2,1), Card(2,2), Card(3,4)], 'rc/c') == infoset)
+
+    print('Save and load')
+    abstraction.save(saved)
+    loaded = CardAbstraction.load(saved)
+    assert(loaded.infoset_format(0, hole, board, 'rc/c') == infoset)
+
+    print('Trees share the abstraction instead of copying its tables')
+    for shared in (abstraction, loaded):
+        rules = holdem_abstraction_rules(2, shared)
+        assert(GameTree(rules).rules.infoset_format.__self__ is shared)
+        assert(PublicTree(rules).rules.infoset_format.args[0].__self__ is shared)
+
+    print('A Hold\'em tree with the abstraction plays down to a showdown')
+    rules = holdem_abstraction_rules(2, loaded)
+    tree = PublicTree(rules)
+    tree.build(lazy=True)
+    node = tree.root
+    # The first deal of each street is the first canonical board, which has buckets
+    while not isinstance(node, TerminalNode):
+        if isinstance(node, ActionNode):
+            assert(node.player_view[0] == loaded.infoset_format(node.player, node.holecards[node.player][0], node.board, node.bet_history))
+            node = node.call_action
+        else:
+            node = node.children[0]
+    assert(len(node.board) == 5 and isinstance(node.hands, ShowdownRanking))
+    # Showdowns score hands with holdem_eval and its batch version alike
+    codes = np.array([c.to_code() for c in node.board])
+    ranks = board_ranks(rules, node.board)
+    live = list(node.holecards[0])
+    for _ in range(200):
+        a, b = random.sample(live, 2)
+        expected = np.sign(holdem_eval(a, node.board) - holdem_eval(b, node.board))
+        assert(np.sign(int(ranks[cards_to_range_index(rules, a)]) - int(ranks[cards_to_range_index(rules, b)])) == expected)
+        assert(holdem_eval_batch(np.array([[c.to_code() for c in a]]), codes)[0] == holdem_eval(a, node.board))
+finally:
+    shutil.rmtree(directory)
+    shutil.rmtree(saved)
+
+print('All passed!')
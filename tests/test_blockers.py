@@ -0,0 +1,54 @@
+import sys
+import os
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import *
+from pokercfr import *
+from blockers import *
+from hand_ranges import RANGE_CODES_2
+import numpy as np
+
+print('Testing blockers')
+
+rng = np.random.RandomState(0)
+holdem = range_support(None, 2)
+hands = [range_index_to_cards_2(i) for i in range(1326)]
+
+print('Board masks and conflicts match overlap')
+for size in (1, 3, 5):
+    board = tuple(Card.from_code(c) for c in rng.choice(52, size, replace=False))
+    mask = holdem.board_mask(board)
+    assert(mask is holdem.board_mask(board[::-1]))
+    assert(mask is holdem.board_mask([c.to_code() for c in board]))
+    assert(list(mask) == [not overlap(hc, board) for hc in hands])
+for a in rng.choice(1326, 20, replace=False):
+    row = holdem.conflicts(a)
+    assert(list(row) == [overlap(hands[a], hc) for hc in hands])
+    assert(np.array_equal(row, holdem.conflicts()[a]))
+    assert(all(holdem.conflict(a, b) == row[b] for b in range(1326)))
+assert(np.array_equal(holdem.incidence.sum(axis=1), np.full(1326, 2)))
+
+print('Unblocked sums and renormalization')
+reach = rng.rand(1326)
+unblocked = holdem.unblocked(reach)
+for a in rng.choice(1326, 20, replace=False):
+    assert(np.isclose(unblocked[a], sum(reach[b] for b in range(1326) if not overlap(hands[a], hands[b]))))
+board = tuple(Card.from_code(c) for c in RANGE_CODES_2[7])
+normalized = holdem.normalize(reach, board)
+assert(np.isclose(normalized.sum(), 1.0))
+assert(not normalized[~holdem.board_mask(board)].any())
+for rules in [leduc_rules(), royal_rules()]:
+    support = range_support(rules)
+    assert(support is range_support(rules))
+    reach = rng.rand(support.size)
+    assert(np.allclose(support.unblocked(reach), reach.sum() - reach))
+three = RangeSupport(np.array(list(combinations(range(8), 3))))
+reach = rng.rand(three.size)
+expected = [sum(reach[j] for j in range(three.size) if not set(three.codes[i]) & set(three.codes[j])) for i in range(three.size)]
+assert(np.allclose(three.unblocked(reach), expected))
+
+print('Royal CFR only looks up infosets of hands the board leaves')
+cfr = CounterfactualRegretMinimizer(royal_rules())
+cfr.run(1)
+
+print('All passed!')
@@ -0,0 +1,99 @@
+import sys
+import os
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import *
+from board_ranks import *
+from itertools import combinations
+import numpy as np
+import shutil
+import tempfile
+
+def terminals(node):
+    if type(node) is TerminalNode:
+        yield node
+        return
+    for child in node.children:
+        yield from terminals(child)
+
+evaluations = [0]
+def counting_eval(hc, board):
+    evaluations[0] += 1
+    return leduc_eval(hc, board)
+
+print('Testing board ranks')
+
+print('Ranks order hands like handeval')
+for rules in [leduc_rules(), royal_rules()]:
+    for board in combinations(rules.deck, showdown_board_size(rules)):
+        ranks = board_ranks(rules, board)
+        live = [hc for hc in [(card,) for card in rules.deck] if not overlap(hc, board)]
+        assert(sorted(ranks[[cards_to_range_index(rules, hc) for hc in live]])[0] == 1)
+        for a in live:
+            for b in live:
+                ra = ranks[cards_to_range_index(rules, a)]
+                rb = ranks[cards_to_range_index(rules, b)]
+                sa = rules.handeval(a, board)
+                sb = rules.handeval(b, board)
+                assert((ra > rb) == (sa > sb) and (ra == rb) == (sa == sb))
+        dead = [cards_to_range_index(rules, (card,)) for card in board]
+        assert(not ranks[dead].any())
+print('Batch evaluators match handeval')
+for rules in [kuhn_rules(), leduc_rules(), royal_rules()]:
+    size = showdown_board_size(rules)
+    holes = np.array([[card.to_code()] for card in rules.deck])
+    for board in combinations(rules.deck, size):
+        scores = rules.handeval_batch(holes, np.array([card.to_code() for card in board], np.intp))
+        assert(list(scores) == [rules.handeval((card,), board) for card in rules.deck])
+        assert(np.array_equal(ScalarHandevalBatch(rules.handeval)(holes, [card.to_code() for card in board]), scores))
+
+print('Games with only a scalar handeval rank with the fallback')
+rules = royal_rules()
+scalar = GameRules(rules.players, rules.deck, rules.roundinfo, rules.ante, rules.blinds, handeval=royal_eval)
+assert(isinstance(scalar.handeval_batch, ScalarHandevalBatch))
+for board in combinations(rules.deck, 2):
+    assert(np.array_equal(board_ranks(scalar, board), board_ranks(rules, board)))
+assert(PublicTree(rules).rules.handeval_batch is royal_eval_batch)
+
+assert(showdown_board_size(leduc_rules()) == 1)
+assert(showdown_board_size(royal_rules()) == 2)
+assert(game_key(leduc_rules()) == game_key(leduc_rules()))
+assert(game_key(leduc_rules()) != game_key(royal_rules()))
+
+directory = tempfile.mkdtemp()
+try:
+    print('Rows are the colexicographic index of each board')
+    rules = royal_rules()
+    store = BoardRankStore(rules, directory)
+    rows = sorted(store.row(board) for board in combinations(rules.deck, 2))
+    assert(rows == list(range(len(rows))))
+
+    print('Precomputed stores resume and are shared')
+    rules = leduc_rules()
+    rules.handeval = counting_eval
+    rules.handeval_batch = ScalarHandevalBatch(counting_eval)
+    assert(BoardRankStore(rules, directory).precompute(max_boards=2) == 2)
+    store = BoardRankStore(rules, directory)
+    assert(store.precompute() == 4)
+    assert(store.precompute() == 0)
+    assert(BoardRankStore.open(rules, directory) is BoardRankStore.open(rules, directory))
+    for board in [(Card(13,2),), (Card(12,1),)]:
+        assert(np.array_equal(store.ranks(board), board_ranks(rules, board)))
+
+    print('Rebuilding a Leduc tree with a rank directory skips hand evaluation')
+    rules.rank_directory = directory
+    evaluations[0] = 0
+    tree = PublicTree(rules)
+    tree.build()
+    assert(evaluations[0] == 0)
+    rules.rank_directory = None
+    plain = PublicTree(rules)
+    plain.build()
+    assert(evaluations[0] > 0)
+    for stored, computed in zip(terminals(tree.root), terminals(plain.root)):
+        assert(stored.payoffs == computed.payoffs)
+finally:
+    BoardRankStore.stores.clear()
+    shutil.rmtree(directory)
+
+print('All passed!')
@@ -0,0 +1,74 @@
+import sys
+import os
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import *
+from cardset import *
+from hand_ranges import RANGE_CODES_2, range_masks
+import numpy as np
+
+print('Testing card sets')
+
+rng = np.random.RandomState(0)
+deck = [Card.from_code(c) for c in range(52)]
+assert(to_mask(deck) == FULL_DECK)
+assert(popcount(FULL_DECK) == 52)
+for _ in range(100):
+    codes = sorted(rng.choice(52, rng.randint(0, 8), replace=False))
+    mask = to_mask([Card.from_code(c) for c in codes])
+    assert(mask == to_mask(codes))
+    assert(to_codes(mask) == codes)
+    assert(to_cards(mask) == [Card.from_code(c) for c in codes])
+    assert(popcount(mask) == len(codes))
+    other = to_mask(rng.choice(52, 3, replace=False))
+    assert(overlaps(mask, other) == bool(set(codes) & set(to_codes(other))))
+    shuffled = [deck[c] for c in rng.permutation(52)]
+    assert(remove_cards(shuffled, mask) == [c for c in shuffled if c.to_code() not in codes])
+
+print('Batch masks and popcounts')
+codes = rng.randint(52, size=(1000, 3))
+masks = masks_batch(codes)
+assert(masks.dtype == np.uint64)
+assert([int(m) for m in masks] == [to_mask(row) for row in codes])
+assert(list(popcount_batch(masks)) == [len(set(row)) for row in codes])
+assert(list(BYTE_POPCOUNT[masks[:, None].view(np.uint8)].sum(axis=1)) == list(popcount_batch(masks)))
+assert([int(m) for m in range_masks(None, 2)] == [to_mask(row) for row in RANGE_CODES_2])
+rules = leduc_rules()
+assert([int(m) for m in range_masks(rules)] == [to_mask([card]) for card in rules.deck])
+
+print('Cards are interned')
+import copy
+import pickle
+for code in range(52):
+    card = Card.from_code(code)
+    assert(card is Card(code // 4 + 2, code % 4 + 1))
+    assert(card is copy.deepcopy(card) and card is pickle.loads(pickle.dumps(card)))
+    assert(card is Card.from_string(str(card)) and card is Card.from_repr('({0})'.format(card)))
+    assert(hash(card) == card.to_code() == code)
+assert(not hasattr(Card(14,1), '__dict__'))
+try:
+    Card(15, 1)
+    assert(False)
+except ValueError:
+    pass
+
+print('Card strings and infoset keys parse to code arrays')
+strings = ['AsKh', '2c', 'Td9d8d', '']
+assert(parse_codes(strings).tolist() == [[48, 45, -1], [3, -1, -1], [34, 30, 26], [-1, -1, -1]])
+hands = [tuple(Card.from_code(c) for c in rng.choice(52, 5, replace=False)) for _ in range(100)]
+keys = [holdem_format(0, hand[:2], hand[2:], '/cr/c') for hand in hands]
+assert(infoset_codes(keys).tolist() == [[card.to_code() for card in hand] for hand in hands])
+
+print('Tree nodes keep the cards left to deal as a card set')
+assert(overlap((Card(14,1), Card(13,1)), (Card(13,1),)) and not overlap((Card(14,1),), (Card(13,1),)))
+assert(all_unique([(Card(14,1),), (Card(13,1),)]) and not all_unique([(Card(14,1),), (Card(13,1), Card(14,1))]))
+tree = PublicTree(rules)
+tree.build()
+node = tree.root
+while type(node) is not BoardcardChanceNode:
+    node = node.children[-1]
+board = node.children[0]
+assert(set(board.deck) == set(rules.deck) - set(board.board))
+assert(popcount(board.deck_mask) == len(rules.deck) - 1)
+
+print('All passed!')
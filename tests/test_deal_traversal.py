@@ -0,0 +1,138 @@
+import sys
+import os
+import random
+import shutil
+import tempfile
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import *
+from pokerstrategy import *
+from dealtree import *
+import numpy as np
+
+def showdown_payoffs(rules, node):
+    # The pot goes to the players still in with the best handeval score, one hand at a time
+    if node.players_in.count(True) == 1:
+        winners = [i for i, v in enumerate(node.players_in) if v]
+    else:
+        scores = [rules.handeval(hc, node.board) for hc in node.holecards]
+        best = max(s for s, v in zip(scores, node.players_in) if v)
+        winners = [i for i, (s, v) in enumerate(zip(scores, node.players_in)) if v and s == best]
+    payoffs = [-x for x in node.committed]
+    for w in winners:
+        payoffs[w] += sum(node.committed) / float(len(winners))
+    return payoffs
+
+def terminals(node):
+    if isinstance(node, TerminalNode):
+        return [node]
+    return [t for child in node.children for t in terminals(child)]
+
+def walk(node, holes, board, strategies):
+    # A deal's expected payoffs, walking Node objects one at a time
+    if type(node) is TerminalNode:
+        return node.payoffs
+    if type(node) is ActionNode:
+        probs = strategies[node.player].probs(node.player_view)
+        return sum(probs[action] * walk(node.valid(action), holes, board, strategies) for action in range(3) if node.valid(action))
+    child = [c for c in node.children if all(set(hc) == set(hole[:len(hc)]) for hc, hole in zip(c.holecards, holes)) and set(c.board) == set(board[:len(c.board)])]
+    assert(len(child) == 1)
+    return walk(child[0], holes, board, strategies)
+
+three_player_rules = GameRules(players=3, deck=[Card(14,1),Card(14,2),Card(13,1),Card(13,2),Card(12,1)], rounds=[RoundInfo(holecard_count=1,
+    boardcard_count=0, betsize=1, maxbets=[1, 1, 1]), RoundInfo(holecard_count=0, boardcard_count=1, betsize=2, maxbets=[1, 1, 1])],
+    ante=1, blinds=None, handeval=leduc_eval, infoset_format=leduc_format)
+
+print('Testing GameTree showdowns and deal traversal')
+
+for name, rules in [('Kuhn', kuhn_rules()), ('Leduc', leduc_rules()), ('Leduc without a batch evaluator', leduc_rules()), ('3 player Leduc', three_player_rules)]:
+    print('{0} terminal payoffs split the pot between the best hands'.format(name))
+    if name.endswith('evaluator'):
+        rules = GameRules(rules.players, rules.deck, rules.roundinfo, rules.ante, rules.blinds, rules.handeval, rules.infoset_format)
+        assert(type(rules.handeval_batch) is ScalarHandevalBatch)
+    tree = GameTree(rules)
+    tree.build()
+    nodes = terminals(tree.root)
+    for node in nodes:
+        assert(isinstance(node.payoffs, np.ndarray) and node.payoffs.dtype == np.float64)
+        assert(np.allclose(node.payoffs, showdown_payoffs(rules, node)) and np.isclose(node.payoffs.sum(), 0))
+    print('{0} flat, saved and parallel trees store the same payoffs'.format(name))
+    flat = GameTree(rules)
+    flat.build(flat=True)
+    stored = flat.flat.payoffs[flat.flat.payoffs_id[flat.flat.kind == 0]]
+    # Rows are in another order than the Node tree's terminals
+    assert(stored.shape == (len(nodes), rules.players) and sorted(map(tuple, stored)) == sorted(tuple(node.payoffs) for node in nodes))
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'tree')
+        flat.save(path)
+        loaded = GameTree(rules)
+        loaded.load(path)
+        assert(np.array_equal(loaded.flat.payoffs, flat.flat.payoffs) and np.array_equal(loaded.flat.payoffs_id, flat.flat.payoffs_id))
+    finally:
+        shutil.rmtree(directory)
+    parallel = GameTree(rules)
+    parallel.build(processes=2)
+    assert(np.array_equal(parallel.flat.kind, flat.flat.kind) and np.array_equal(parallel.flat.action_child, flat.flat.action_child))
+    assert(np.array_equal(parallel.flat.payoffs[parallel.flat.payoffs_id], flat.flat.payoffs[flat.flat.payoffs_id]))
+
+print('Leduc deal values match walking the Node tree')
+rules = leduc_rules()
+objects = GameTree(rules)
+objects.build()
+tree = GameTree(rules)
+tree.build(flat=True)
+traversal = DealTraversal(tree)
+s0 = Strategy(0)
+s0.load_from_file('strategies/leduc/0.strat')
+s1 = Strategy(1)
+s1.load_from_file('strategies/leduc/1.strat')
+deals = list(traversal.deals())
+assert(len(deals) == 6 * 5 * 4 and len(set((tuple(h), b) for h, b in deals)) == len(deals))
+weights = traversal.child_weights([s0, s1])
+levels = traversal.walk(deals)
+values = traversal.values(levels, weights)
+assert(np.allclose(values[0], [walk(objects.root, holes, board, [s0, s1]) for holes, board in deals]))
+# Each level of a batch holds the nodes of the first deal, then those of the next
+singles = [traversal.walk([deal]) for deal in deals[:3]]
+for depth, (nodes, _) in enumerate(traversal.walk(deals[:3])):
+    assert(np.array_equal(nodes, np.concatenate([single[depth][0] for single in singles if depth < len(single)])))
+# A deal reaches one child of every chance node
+single = singles[0]
+for nodes, parents in single[1:]:
+    assert(all(np.bincount(parents[traversal.dealt[nodes]]) <= 1))
+rng = random.Random(0)
+for _ in range(20):
+    holes, board = traversal.sample_deal(rng)
+    sampled = traversal.walk([(holes, board)])
+    assert(np.isclose(traversal.values(sampled, weights)[0][0], walk(objects.root, holes, board, [s0, s1])).all())
+    # The terminals of a deal hold its cards
+    for nodes, _ in sampled:
+        for index in nodes[tree.flat.kind[nodes] == 0]:
+            node = tree.flat.node(index)
+            assert(all(set(hc) == set(hole[:len(hc)]) for hc, hole in zip(node.holecards, holes)) and set(node.board) <= set(board))
+
+print('Reach probabilities are the products of each player\'s own actions')
+reach = traversal.reach(single, weights)
+for (nodes, parents), level, above in zip(single[1:], reach[1:], reach):
+    for i, node in enumerate(nodes):
+        expected = above[parents[i]].copy()
+        if tree.flat.action[node] >= 0:
+            expected[tree.flat.player[tree.flat.parent[node]]] *= weights[node]
+        assert(np.allclose(level[i], expected))
+
+print('Leduc expected values over every deal match StrategyProfile')
+for strategies in ([s0, s1], [s0, Strategy(1, 'strategies/leduc/random.strat')]):
+    expected = StrategyProfile(rules, strategies).expected_value()
+    assert(np.allclose(traversal.expected_value(strategies), np.array(expected, np.float64)))
+assert(np.allclose(traversal.expected_value([s0, s1]), [-0.0856520141, 0.0856520141]))
+
+for tree in (PublicTree(leduc_rules()), GameTree(leduc_rules())):
+    tree.build()
+    try:
+        DealTraversal(tree)
+        assert(False)
+    except ValueError:
+        pass
+
+print('All passed!')
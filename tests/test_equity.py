@@ -0,0 +1,67 @@
+import sys
+import os
+sys.path.insert(0,os.path.realpath('.'))
+from equity import *
+from hand_evaluator import HandEvaluator
+from hand_ranges import RANGE_CODES_2
+from card import Card
+from itertools import combinations
+import random
+import numpy as np
+
+def brute_force_equity(hand, board, opp_range):
+    # Rank every runout and opponent hand one at a time
+    wins = 0.0
+    total = 0.0
+    opponents = [i for i in range(RANGE_SIZE) if opp_range[i] > 0]
+    deck = [c for c in range(52) if c not in hand and c not in board]
+    for runout in combinations(deck, 5 - len(board)):
+        full_board = board + list(runout)
+        rank = HandEvaluator.Seven.evaluate_rank([Card.from_code(c) for c in list(hand) + full_board])
+        for i in opponents:
+            opp_hand = list(RANGE_CODES_2[i])
+            if set(opp_hand) & set(list(hand) + full_board):
+                continue
+            opp_rank = HandEvaluator.Seven.evaluate_rank([Card.from_code(c) for c in opp_hand + full_board])
+            if rank < opp_rank:
+                wins += opp_range[i]
+            elif rank == opp_rank:
+                wins += 0.5 * opp_range[i]
+            total += opp_range[i]
+    return wins / total
+
+def sparse_range(count):
+    weights = np.zeros(RANGE_SIZE)
+    weights[random.sample(range(RANGE_SIZE), count)] = np.random.rand(count)
+    return weights
+
+print('Testing equity_vs_range')
+
+random.seed(0)
+np.random.seed(0)
+my_range = np.ones(RANGE_SIZE)
+
+for board_size, opp_count, hand_count in [(5, RANGE_SIZE, 30), (4, 100, 10), (3, 8, 3)]:
+    print('{0}-card board against {1} opponent hands'.format(board_size, opp_count))
+    board = random.sample(range(52), board_size)
+    opp_range = sparse_range(opp_count)
+    equity = equity_vs_range([Card.from_code(c) for c in board], my_range, opp_range)
+    assert(equity.shape == (RANGE_SIZE,))
+    live = [i for i in range(RANGE_SIZE) if not set(RANGE_CODES_2[i]) & set(board)]
+    for i in range(RANGE_SIZE):
+        if i not in live:
+            assert(equity[i] == 0)
+    for i in random.sample(live, hand_count):
+        assert(abs(equity[i] - brute_force_equity(RANGE_CODES_2[i], board, opp_range)) < 1e-9)
+
+print('Ties and hands outside my range')
+# Both players play the board's royal flush
+board = [Card(14,1),Card(13,1),Card(12,1),Card(11,1),Card(10,1)]
+equity = equity_vs_range(board, my_range, np.ones(RANGE_SIZE))
+live = ~np.isin(RANGE_CODES_2, [c.to_code() for c in board]).any(axis=1)
+assert(np.allclose(equity[live], 0.5))
+my_range[:100] = 0
+equity = equity_vs_range(board, my_range, np.ones(RANGE_SIZE))
+assert((equity[:100] == 0).all() and np.allclose(equity[100:][live[100:]], 0.5))
+
+print('All passed!')
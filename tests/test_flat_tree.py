@@ -0,0 +1,67 @@
+import sys
+import os
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import *
+from pokercfr import *
+from flattree import *
+import numpy as np
+
+def same_nodes(node, view):
+    # Walk a Node object tree and a FlatTree view of the same game together
+    assert(isinstance(view, FlatNode) and isinstance(view, type(node)))
+    assert(view.committed == node.committed and view.holecards == node.holecards and view.board == node.board)
+    assert(view.deck_mask == node.deck_mask and view.bet_history == node.bet_history)
+    if type(node) is TerminalNode:
+        assert(view.players_in == node.players_in and type(view.hands) is type(node.hands))
+        assert(view.payoffs == node.payoffs)
+        return 1
+    assert(len(view.children) == len(node.children))
+    if type(node) is ActionNode:
+        assert(view.player == node.player and view.player_view == node.player_view)
+        for action in range(3):
+            assert(bool(view.valid(action)) == bool(node.valid(action)))
+            if node.valid(action):
+                assert(view.valid(action).index == view.children[node.children.index(node.valid(action))].index)
+    else:
+        assert(view.todeal == node.todeal)
+    if type(node) is BoardcardChanceNode:
+        assert(view.symmetries == node.symmetries)
+    for child in view.children:
+        assert(child.parent == view)
+    return 1 + sum(same_nodes(a, b) for a, b in zip(node.children, view.children))
+
+print('Testing flat trees')
+
+for name, rules in [('Kuhn', kuhn_rules()), ('Leduc', leduc_rules()), ('Royal', royal_rules()), ('Leduc isomorphic', leduc_rules())]:
+    print('{0} flat tree matches the Node tree'.format(name))
+    rules.suit_isomorphism = name.endswith('isomorphic')
+    objects = PublicTree(rules)
+    objects.build()
+    tree = PublicTree(rules)
+    tree.build(flat=True)
+    flat = tree.flat
+    assert(tree.root == flat.root and set(tree.information_sets) == set(objects.information_sets))
+    assert(same_nodes(objects.root, tree.root) == len(flat))
+    # Children are consecutive rows, after their parent
+    for index in range(1, len(flat)):
+        parent = flat.parent[index]
+        assert(parent < index and index in flat.children(parent))
+    assert(flat.child_count.sum() == len(flat) - 1)
+    information_sets = flat.information_sets()
+    assert(set(information_sets) == set(objects.information_sets))
+    assert(all(len(information_sets[key]) == len(objects.information_sets[key]) for key in information_sets))
+    terminals = flat.kind == TERMINAL
+    assert(np.array_equal(flat.pot()[terminals], [sum(flat.node(i).committed) for i in np.flatnonzero(terminals)]))
+
+print('Leduc CFR regrets match on the flat tree')
+results = []
+for flat in (False, True):
+    cfr = CounterfactualRegretMinimizer(leduc_rules())
+    if flat:
+        cfr.tree.build(flat=True)
+    cfr.run(2)
+    results.append(cfr.counterfactual_regret)
+assert(all(np.array_equal(results[0][infoset], results[1][infoset]) for infoset in results[0]))
+
+print('All passed!')
@@ -63,7 +63,7 @@ assert(tree.root.children[0].children[1].children[0].children[0].children[0].pla
 # /cc/cc
 assert(type(tree.root.children[0].children[1].children[0].children[0].children[0].children[0]) == TerminalNode)
 assert(tree.root.children[0].children[1].children[0].children[0].children[0].children[0].bet_history == '/cc/cc')
-# assert(tree.root.children[0].children[1].children[0].children[0].children[0].children[0].payoffs == [-3,3])
+assert(np.array_equal(tree.root.children[0].children[1].children[0].children[0].children[0].children[0].payoffs, [-3,3]))
 # /cc/cr
 assert(type(tree.root.children[0].children[1].children[0].children[0].children[0].children[1]) == ActionNode)
 assert(tree.root.children[0].children[1].children[0].children[0].children[0].children[1].bet_history == '/cc/cr')
@@ -85,11 +85,11 @@ assert(tree.root.children[0].children[1].children[0].children[0].children[0].chi
 # /cc/crrf
 assert(type(tree.root.children[0].children[1].children[0].children[0].children[0].children[1].children[2].children[0]) == TerminalNode)
 assert(tree.root.children[0].children[1].children[0].children[0].children[0].children[1].children[2].children[0].bet_history == '/cc/crrf')
-# assert(tree.root.children[0].children[1].children[0].children[0].children[0].children[1].children[2].children[0].payoffs == [5,-5])
+assert(np.array_equal(tree.root.children[0].children[1].children[0].children[0].children[0].children[1].children[2].children[0].payoffs, [5,-5]))
 # /cc/crrc
 assert(type(tree.root.children[0].children[1].children[0].children[0].children[0].children[1].children[2].children[1]) == TerminalNode)
 assert(tree.root.children[0].children[1].children[0].children[0].children[0].children[1].children[2].children[1].bet_history == '/cc/crrc')
-# assert(tree.root.children[0].children[1].children[0].children[0].children[0].children[1].children[2].children[1].payoffs == [-7,7])
+assert(np.array_equal(tree.root.children[0].children[1].children[0].children[0].children[0].children[1].children[2].children[1].payoffs, [-7,7]))
 print('All passed!')
 
 print('Testing PublicTree')
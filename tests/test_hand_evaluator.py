@@ -0,0 +1,136 @@
+import sys
+import os
+sys.path.insert(0,os.path.realpath('.'))
+from hand_evaluator import *
+from lookup_tables import TABLE_DIR
+from isomorphism import canonical_board
+from card import Card
+import generate_lookup_tables
+from itertools import combinations
+import random
+import tempfile
+import numpy as np
+
+def random_hands(count, size, codes):
+    return np.array([random.sample(codes, size) for _ in range(count)], np.uint8)
+
+def uncached_evaluate_hand(hand, board):
+    # evaluate_hand without the board cache: rank every possible opponent hand
+    cards = hand + board
+    evaluator = { 5: HandEvaluator.Five, 6: HandEvaluator.Six, 7: HandEvaluator.Seven }[len(cards)]
+    rank = evaluator.evaluate_rank(cards)
+    opponent_hands = list(combinations(LookupTables.deck - set(cards), 2))
+    hands_beaten = 0
+    for h in opponent_hands:
+        opponent_rank = evaluator.evaluate_rank(list(h) + board)
+        if rank < opponent_rank:
+            hands_beaten += 1
+        elif rank == opponent_rank:
+            hands_beaten += 0.5
+    return float(hands_beaten) / len(opponent_hands)
+
+print('Testing HandEvaluator')
+
+random.seed(0)
+all_codes = list(range(52))
+# Two suits only to get plenty of flushes, and six ranks only to get plenty of pairs, trips and quads
+flushy_codes = [c for c in all_codes if c % 4 < 2]
+paired_codes = [c for c in all_codes if c // 4 >= 7]
+
+print('Lookup tables in tables/ match generate_lookup_tables.py')
+directory = tempfile.mkdtemp()
+generate_lookup_tables.generate(directory)
+for name in os.listdir(directory):
+    assert(np.array_equal(np.load(os.path.join(directory, name)), np.load(os.path.join(TABLE_DIR, name))))
+
+print('Best and worst hands')
+assert(HandEvaluator.Five.evaluate_rank([Card(14,2),Card(13,2),Card(12,2),Card(11,2),Card(10,2)]) == 1)
+assert(HandEvaluator.Five.evaluate_rank([Card(7,1),Card(5,2),Card(4,2),Card(3,2),Card(2,2)]) == 7462)
+assert(HandEvaluator.Six.evaluate_rank([Card(5,1),Card(4,1),Card(3,1),Card(2,1),Card(14,1),Card(14,2)]) == 10)
+assert(HandEvaluator.Seven.evaluate_rank([Card(9,1),Card(9,2),Card(9,3),Card(9,4),Card(14,1),Card(14,2),Card(14,3)]) == 11 + 12 * 5)
+
+print('Five.evaluate_rank_batch matches Five.evaluate_rank')
+for codes in [all_codes, flushy_codes, paired_codes]:
+    hands = random_hands(3000, 5, codes)
+    ranks = HandEvaluator.Five.evaluate_rank_batch(hands)
+    for hand, rank in zip(hands, ranks):
+        assert(rank == HandEvaluator.Five.evaluate_rank([Card.from_code(c) for c in hand]))
+
+print('Seven.evaluate_rank_batch matches Seven.evaluate_rank')
+for codes in [all_codes, flushy_codes, paired_codes]:
+    hands = random_hands(3000, 7, codes)
+    ranks = HandEvaluator.Seven.evaluate_rank_batch(hands)
+    assert(ranks.shape == (len(hands),))
+    for hand, rank in zip(hands, ranks):
+        assert(rank == HandEvaluator.Seven.evaluate_rank([Card.from_code(c) for c in hand]))
+
+print('Six.evaluate_rank_batch matches Six.evaluate_rank')
+for codes in [all_codes, flushy_codes, paired_codes]:
+    hands = random_hands(3000, 6, codes)
+    ranks = HandEvaluator.Six.evaluate_rank_batch(hands)
+    for hand, rank in zip(hands, ranks):
+        assert(rank == HandEvaluator.Six.evaluate_rank([Card.from_code(c) for c in hand]))
+
+print('BoardState.complete_rank_batch matches ranking the whole hand')
+for codes in [all_codes, flushy_codes, paired_codes]:
+    for board_size in (3, 4, 5):
+        for _ in range(20):
+            cards = random.sample(codes, board_size + 2 * 8)
+            board, holes = cards[:board_size], np.array(cards[board_size:]).reshape(-1, 2)
+            hands = np.column_stack([holes, np.tile(board, (len(holes), 1))])
+            assert(np.array_equal(BoardState(board).complete_rank_batch(holes), HandEvaluator.evaluate_rank_batch(hands)))
+
+print('Omaha.evaluate_rank_batch matches the best of every 2 hole and 3 board cards')
+for codes in [all_codes, flushy_codes, paired_codes]:
+    for board_size in (3, 4, 5):
+        for _ in range(5):
+            cards = random.sample(codes, board_size + 4 * 4)
+            board, holes = cards[:board_size], np.array(cards[board_size:]).reshape(-1, 4)
+            ranks = HandEvaluator.Omaha.evaluate_rank_batch(holes, board)
+            for hole, rank in zip(holes, ranks):
+                assert(rank == min(HandEvaluator.Five.evaluate_rank([Card.from_code(c) for c in pair + triple])
+                    for pair in combinations(hole.tolist(), 2) for triple in combinations(board, 3)))
+# Four of a suit in the hand and one on the board is no flush in Omaha
+spades = [Card(r, 1).to_code() for r in (14, 13, 12, 11)]
+board = [Card(10, 1).to_code(), Card(2, 2).to_code(), Card(7, 3).to_code()]
+assert(HandEvaluator.Omaha.evaluate_rank_batch([spades], board)[0] > 10)
+assert(HandEvaluator.Omaha.evaluate_rank_batch(np.zeros((0, 4), np.intp), board).shape == (0,))
+for holes, board in [(np.zeros((1, 2), np.intp), board), ([spades], board[:2])]:
+    try:
+        HandEvaluator.Omaha.evaluate_rank_batch(holes, board)
+        assert(False)
+    except HandLengthException:
+        pass
+
+royal_flush = [Card(14,1),Card(13,1),Card(12,1),Card(11,1),Card(10,1),Card(2,2),Card(3,3)]
+assert(HandEvaluator.Seven.evaluate_rank_batch([[c.to_code() for c in royal_flush]])[0] == 1)
+
+try:
+    HandEvaluator.Seven.evaluate_rank_batch(np.zeros((1, 6), np.uint8))
+    assert(False)
+except HandLengthException:
+    pass
+
+print('evaluate_hand with the board cache matches ranking every opponent hand')
+HandEvaluator.board_ranks.clear()
+for codes in [all_codes, flushy_codes, paired_codes]:
+    for board_size in (3, 4, 5):
+        board = [Card.from_code(c) for c in random.sample(codes, board_size)]
+        remaining = [Card.from_code(c) for c in all_codes if c not in [card.to_code() for card in board]]
+        for _ in range(3):
+            hand = random.sample(remaining, 2)
+            assert(HandEvaluator.evaluate_hand(hand, board) == uncached_evaluate_hand(hand, board))
+stats = HandEvaluator.board_ranks.stats()
+assert(stats['misses'] == 9 and stats['hits'] == 18 and stats['entries'] == 9)
+# The board is keyed regardless of card order
+HandEvaluator.evaluate_hand(hand, list(reversed(board)))
+assert(HandEvaluator.board_ranks.stats()['hits'] == 19)
+
+print('Board cache memory cap')
+HandEvaluator.board_ranks.resize(HandEvaluator.board_ranks.nbytes // 3)
+stats = HandEvaluator.board_ranks.stats()
+assert(stats['bytes'] <= stats['max_bytes'] and stats['evictions'] > 0)
+assert(canonical_board(board)[0] in HandEvaluator.board_ranks)
+HandEvaluator.board_ranks.resize(BOARD_CACHE_BYTES)
+
+print('All passed!')
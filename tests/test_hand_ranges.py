@@ -21,5 +21,36 @@ for i in range(0, 1326):
     assert(indicies[i] == i)
     as_cards = range_index_to_cards(rules, indicies[i])
     assert( cards_to_range_index( rules, as_cards ) == i )
+    assert( tuple(RANGE_CODES_2[i]) == tuple(card.to_code() for card in as_cards) )
+    assert( RANGE_INDEX_2[as_cards[1].to_code(), as_cards[0].to_code()] == i )
 
-print("2 hand ranges works")
\ No newline at end of file
+print("2 hand ranges works")
+
+from combinadic import HandIndexer
+from pokergames import leduc_rules
+from itertools import combinations
+
+rules = leduc_rules()
+assert(range_size(rules) == len(rules.deck))
+for i, card in enumerate(rules.deck):
+    assert(cards_to_range_index(rules, (card,)) == i)
+    assert(range_index_to_cards(rules, i) == (card,))
+assert(np.array_equal(range_indexes(rules, [[c.to_code()] for c in rules.deck]), np.arange(len(rules.deck))))
+print("1 hand ranges works")
+
+rng = np.random.RandomState(0)
+for n, k in [(8, 3), (12, 4), (52, 3)]:
+    deck = rng.permutation(52)[:n]
+    indexer = HandIndexer(deck, k)
+    hands = list(combinations(range(n), k))
+    assert(indexer.size == len(hands))
+    for i, positions in enumerate(hands):
+        codes = [int(deck[p]) for p in positions]
+        assert(indexer.rank(positions) == i)
+        assert(indexer.index(codes[::-1]) == i)
+        assert(indexer.cards(i) == tuple(codes))
+    codes = indexer.codes[rng.permutation(indexer.size)]
+    assert(np.array_equal(indexer.codes[indexer.index_batch(codes[:, ::-1])], codes))
+assert(np.array_equal(range_indexes(None, RANGE_CODES_2[:, ::-1]), np.arange(1326)))
+assert(np.array_equal(range_codes(holdem_rules(2), [5, 1325]), RANGE_CODES_2[[5, 1325]]))
+print("k hand ranges works")
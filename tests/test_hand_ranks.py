@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.insert(0,os.path.realpath('.'))
+from hand_evaluator import *
+from hand_ranks import HandRanks
+from card import Card
+import random
+import numpy as np
+import shutil
+import tempfile
+
+print('Testing HandRanks against HandEvaluator')
+
+# Without a generated table, generate one for the test
+directory = None
+if os.path.exists(HandRanks.path):
+    HandRanks.load()
+else:
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'hand_ranks.npy')
+    HandRanks.generate(path)
+    HandRanks.load(path)
+try:
+    random.seed(0)
+    hands = np.array([random.sample(range(52), 7) for _ in range(20000)], np.intp)
+
+    print('7-card ranks match Seven.evaluate_rank')
+    card_hands = [[Card.from_code(c) for c in hand] for hand in hands[:2000]]
+    assert([HandRanks.evaluate_rank(h) for h in card_hands] == [HandEvaluator.Seven.evaluate_rank(h) for h in card_hands])
+    assert(np.array_equal(HandRanks.evaluate_rank_batch(hands), HandEvaluator.Seven.evaluate_rank_batch(hands)))
+
+    print('5 and 6-card ranks match Five and Six')
+    assert(np.array_equal(HandRanks.evaluate_rank_batch(hands[:, :5]), HandEvaluator.Five.evaluate_rank_batch(hands[:, :5])))
+    assert(np.array_equal(HandRanks.evaluate_rank_batch(hands[:, :6]), HandEvaluator.Six.evaluate_rank_batch(hands[:, :6])))
+    assert([HandRanks.evaluate_rank(h[:5]) for h in card_hands[:200]] == [HandEvaluator.Five.evaluate_rank(h[:5]) for h in card_hands[:200]])
+    assert([HandRanks.evaluate_rank(h[:6]) for h in card_hands[:200]] == [HandEvaluator.Six.evaluate_rank(h[:6]) for h in card_hands[:200]])
+
+    print('A royal flush, a wheel and quads')
+    assert(HandRanks.evaluate_rank([Card.from_code(c) for c in [48, 44, 40, 36, 32, 0, 5]]) == 1)
+    for codes, evaluator in [([51, 0, 4, 8, 13, 22, 26], HandEvaluator.Seven), ([0, 1, 2, 3, 51], HandEvaluator.Five)]:
+        hand = [Card.from_code(c) for c in codes]
+        assert(HandRanks.evaluate_rank(hand) == evaluator.evaluate_rank(hand))
+
+    for hand in ([Card(14,1)] * 4, [Card(14,1)] * 8):
+        try:
+            HandRanks.evaluate_rank(hand)
+            assert(False)
+        except HandLengthException:
+            pass
+    try:
+        HandRanks.evaluate_rank_batch(hands[:, :4])
+        assert(False)
+    except HandLengthException:
+        pass
+finally:
+    HandRanks.table = None
+    HandRanks.table_view = None
+    if directory is not None:
+        shutil.rmtree(directory)
+
+print('All passed!')
@@ -0,0 +1,66 @@
+import sys
+import os
+sys.path.insert(0,os.path.realpath('.'))
+from hand_strength import *
+from hand_evaluator import HandEvaluator
+from isomorphism import SUIT_PERMUTATIONS, permute_cards
+from card import Card
+from itertools import combinations
+from multiprocessing import Pool
+import random
+import shutil
+import tempfile
+import numpy as np
+
+print('Testing hand strength precomputation')
+
+random.seed(0)
+directory = tempfile.mkdtemp()
+try:
+    print('Partial runs resume from the boards still missing')
+    with Pool(2) as pool:
+        assert(precompute_street(directory, 'river', pool=pool, max_boards=600) == 600)
+        river_ehs = np.load(street_path(directory, 'river', 'ehs'))[:600]
+        assert(precompute_street(directory, 'river', pool=pool, max_boards=600) == 600)
+        assert(precompute_street(directory, 'turn', pool=pool, max_boards=5) == 5)
+    done = np.load(street_path(directory, 'river', 'done'))
+    assert(done[:1200].all() and not done[1200:].any())
+    assert(np.array_equal(np.load(street_path(directory, 'river', 'ehs'))[:600], river_ehs))
+
+    print('River and turn tables match evaluate_hand')
+    tables = HandStrengthTables(directory)
+    for street, count in (('river', 1200), ('turn', 5)):
+        boards = tables.load(street)['boards']
+        for _ in range(20):
+            board = [Card.from_code(c) for c in boards[random.randrange(count)]]
+            hole = random.sample([Card.from_code(c) for c in range(52) if c not in [card.to_code() for card in board]], 2)
+            deck = [Card.from_code(c) for c in range(52) if Card.from_code(c) not in board + hole]
+            strengths = [HandEvaluator.evaluate_hand(hole, board + list(runout)) for runout in combinations(deck, 5 - len(board))]
+            assert(np.isclose(tables.ehs(hole, board), np.mean(strengths)))
+            assert(np.isclose(tables.ehs2(hole, board), np.mean(np.square(strengths))))
+            if street == 'turn':
+                assert(np.array_equal(tables.histogram(hole, board), np.bincount(np.minimum((np.array(strengths) * DEFAULT_BINS).astype(int), DEFAULT_BINS - 1), minlength=DEFAULT_BINS)))
+            # Isomorphic queries read the same entry
+            p = random.randrange(len(SUIT_PERMUTATIONS))
+            assert(tables.ehs(list(permute_cards(hole, p)), list(permute_cards(board, p))) == tables.ehs(hole, board))
+
+    print('Boards not computed yet')
+    board = [Card.from_code(c) for c in tables.load('turn')['boards'][-1]]
+    try:
+        tables.ehs([Card(14,1), Card(14,2)], board)
+        assert(False)
+    except KeyError:
+        pass
+
+    print('River boards have no histogram')
+    board = [Card.from_code(c) for c in tables.load('river')['boards'][0]]
+    hole = [card for card in (Card(14,1), Card(14,2), Card(13,1), Card(13,2)) if card not in board][:2]
+    try:
+        tables.histogram(hole, board)
+        assert(False)
+    except ValueError:
+        pass
+finally:
+    shutil.rmtree(directory)
+
+print('All passed!')
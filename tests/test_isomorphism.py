@@ -0,0 +1,141 @@
+import sys
+import os
+sys.path.insert(0,os.path.realpath('.'))
+from isomorphism import *
+from hand_evaluator import HandEvaluator
+from pokertrees import *
+from pokergames import *
+from pokerstrategy import *
+from pokercfr import *
+from card import Card
+import random
+import numpy as np
+
+def find_boardcard_node(node):
+    if type(node) is BoardcardChanceNode:
+        return node
+    for child in node.children or []:
+        found = find_boardcard_node(child)
+        if found:
+            return found
+
+print('Testing suit isomorphism')
+
+random.seed(0)
+
+print('Flop tables')
+canonical, permutation, canonical_flops, weights = flop_tables()
+assert(len(canonical_flops) == 1755)
+assert(weights.sum() == 22100)
+for _ in range(1000):
+    flop = random.sample(range(52), 3)
+    assert(canonical_board(flop)[0] == tuple(canonical_flops[canonical[flop_index(flop)]]))
+    # Every suit permutation of a flop has the same canonical flop
+    p = random.randrange(len(SUIT_PERMUTATIONS))
+    assert(canonical_board(CODE_PERMUTATIONS[p][flop])[0] == canonical_board(flop)[0])
+    board, p = canonical_board(flop)
+    assert(tuple(sorted(CODE_PERMUTATIONS[p][flop])) == board)
+
+print('Turn and river boards')
+for size in (4, 5):
+    for _ in range(200):
+        board = random.sample(range(52), size)
+        key, p = canonical_board(board)
+        assert(tuple(sorted(CODE_PERMUTATIONS[p][board])) == key)
+        assert(canonical_board(CODE_PERMUTATIONS[random.randrange(24)][board])[0] == key)
+
+print('Canonical hands and weights')
+for size in (3, 4, 5):
+    for _ in range(50):
+        cards = [Card.from_code(c) for c in random.sample(range(52), size + 2)]
+        hole, board = cards[:2], cards[2:]
+        canonical_hole, canonical_board_cards, weight = canonical_hand(hole, board)
+        p = random.randrange(len(SUIT_PERMUTATIONS))
+        assert(canonical_hand(permute_cards(hole, p), permute_cards(board, p)) == (canonical_hole, canonical_board_cards, weight))
+        # The weight is the number of distinct suit permutations of the (hole cards, board)
+        orbit = set((frozenset(permute_cards(hole, q)), frozenset(permute_cards(board, q))) for q in range(len(SUIT_PERMUTATIONS)))
+        assert(weight == len(orbit))
+
+print('evaluate_hand shares the board cache between isomorphic boards')
+HandEvaluator.board_ranks.clear()
+for _ in range(10):
+    cards = [Card.from_code(c) for c in random.sample(range(52), 7)]
+    hole, board = cards[:2], cards[2:5]
+    p = random.randrange(len(SUIT_PERMUTATIONS))
+    assert(HandEvaluator.evaluate_hand(hole, board) == HandEvaluator.evaluate_hand(list(permute_cards(hole, p)), list(permute_cards(board, p))))
+assert(HandEvaluator.board_ranks.stats()['hits'] == 10)
+
+print('Leduc public tree deals one board of each rank')
+rules = leduc_rules()
+rules.suit_isomorphism = True
+tree = PublicTree(rules)
+tree.build()
+bnode = find_boardcard_node(tree.root)
+assert(len(bnode.children) == 3)
+assert(all(len(symmetries) == 2 and symmetries[0] == IDENTITY for symmetries in bnode.symmetries))
+tree = PublicTree(leduc_rules())
+tree.build()
+assert(len(find_boardcard_node(tree.root).children) == 6)
+
+print('Leduc expected values and best responses match the full game tree')
+results = []
+for suit_isomorphism in (False, True):
+    rules = leduc_rules()
+    rules.suit_isomorphism = suit_isomorphism
+    s0 = Strategy(0)
+    s0.load_from_file('strategies/leduc/0.strat')
+    s1 = Strategy(1)
+    s1.load_from_file('strategies/leduc/1.strat')
+    profile = StrategyProfile(rules, [s0, s1])
+    results.append((profile.expected_value(), profile.best_response()[1]))
+for full, reduced in zip(results[0], results[1]):
+    assert(np.allclose(np.array(full, np.float64), np.array(reduced, np.float64)))
+
+print('Leduc CFR counterfactual values and regrets match the full public tree')
+results = []
+for suit_isomorphism in (False, True):
+    rules = leduc_rules()
+    rules.suit_isomorphism = suit_isomorphism
+    cfr = CounterfactualRegretMinimizer(rules)
+    payoffs = cfr.cfr_helper(cfr.tree.root, np.ones((rules.players, range_size(rules))))
+    results.append((payoffs, cfr.counterfactual_regret))
+assert(np.allclose(results[0][0], results[1][0]))
+assert(set(results[0][1]) == set(results[1][1]))
+for infoset in results[0][1]:
+    assert(np.allclose(results[0][1][infoset], results[1][1][infoset]))
+
+print('Royal suit isomorphic trees hold the information sets of the full tree')
+for infoset_format in (royal_format, default_infoset_format):
+    views = []
+    for suit_isomorphism in (False, True):
+        rules = royal_rules()
+        rules.infoset_format = infoset_format
+        rules.suit_isomorphism = suit_isomorphism
+        for flat in (False, True):
+            tree = PublicTree(rules)
+            tree.build(flat=flat)
+            views.append(set(tree.information_sets))
+    assert(all(v == views[0] for v in views))
+
+print('Royal CFR trains the full game with an infoset format that tells suits apart')
+results = []
+for suit_isomorphism in (False, True):
+    rules = royal_rules()
+    rules.infoset_format = default_infoset_format
+    rules.suit_isomorphism = suit_isomorphism
+    cfr = CounterfactualRegretMinimizer(rules)
+    cfr.run(2)
+    results.append((rules, cfr))
+assert(set(results[0][1].counterfactual_regret) == set(results[1][1].counterfactual_regret))
+for infoset, regrets in results[0][1].counterfactual_regret.items():
+    assert(np.allclose(regrets, results[1][1].counterfactual_regret[infoset]))
+# The profiles are as exploitable on the full tree, and the isomorphic tree finds the same best responses
+exploitability = []
+for rules, cfr in results:
+    strategies = cfr.profile.strategies
+    exploitability.append(sum(StrategyProfile(results[0][0], strategies).best_response()[1]))
+    assert(np.allclose(np.array(StrategyProfile(rules, strategies).best_response()[1], np.float64), np.array(StrategyProfile(results[0][0], strategies).best_response()[1], np.float64)))
+    assert(np.allclose(np.array(StrategyProfile(rules, strategies).expected_value(), np.float64), np.array(StrategyProfile(results[0][0], strategies).expected_value(), np.float64)))
+assert(np.isclose(float(exploitability[0]), float(exploitability[1])))
+
+print('All passed!')
@@ -0,0 +1,126 @@
+import sys
+import os
+import random
+import gc
+import tracemalloc
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import *
+from lazytree import *
+from pokercfr import *
+import numpy as np
+
+def same_nodes(node, lazy):
+    # Walk a Node object tree and a lazy tree of the same game together
+    assert(isinstance(lazy, type(node)))
+    assert(lazy.committed == node.committed and lazy.holecards == node.holecards and lazy.board == node.board)
+    assert(lazy.deck_mask == node.deck_mask and lazy.bet_history == node.bet_history)
+    if type(node) is TerminalNode:
+        assert(lazy.players_in == node.players_in and lazy.hands.hands == node.hands.hands)
+        return 1
+    assert(isinstance(lazy, LazyNode) and len(lazy.children) == len(node.children))
+    if type(node) is ActionNode:
+        assert(lazy.player == node.player and lazy.player_view == node.player_view)
+        for action in range(3):
+            assert(bool(lazy.valid(action)) == bool(node.valid(action)))
+            if node.valid(action):
+                assert(lazy.children.index(lazy.valid(action)) == node.children.index(node.valid(action)))
+    else:
+        assert(lazy.todeal == node.todeal)
+    if type(node) is BoardcardChanceNode:
+        assert(list(lazy.symmetries) == node.symmetries)
+    return 1 + sum(same_nodes(a, b) for a, b in zip(node.children, lazy.children))
+
+print('Testing lazy trees')
+
+for name, rules in [('Kuhn', kuhn_rules()), ('Leduc', leduc_rules()), ('Royal', royal_rules()), ('Leduc isomorphic', leduc_rules())]:
+    rules.suit_isomorphism = name.endswith('isomorphic')
+    objects = PublicTree(rules)
+    objects.build()
+    print('{0} lazy tree matches the Node tree'.format(name))
+    tree = PublicTree(rules)
+    tree.build(lazy=True)
+    assert(tree.lazy.stats()['misses'] == 0 and isinstance(tree.root, LazyNode))
+    count = same_nodes(objects.root, tree.root)
+    assert(tree.lazy.stats()['evictions'] == 0)
+    print('{0} lazy tree matches under a memory budget'.format(name))
+    tree = PublicTree(rules)
+    tree.build(lazy=True, max_bytes=100000)
+    assert(same_nodes(objects.root, tree.root) == count)
+    assert(tree.lazy.nbytes <= tree.lazy.max_bytes)
+    # Reading the information sets walks the whole tree, but keeps the actions of each instead of its nodes
+    assert(set(tree.information_sets) == set(objects.information_sets))
+    for key, nodes in objects.information_sets.items():
+        infoset = tree.information_sets[key]
+        assert(len(infoset) == 1 and isinstance(infoset[0], InfosetActions) and infoset[0].player == nodes[0].player)
+        assert(all(bool(infoset[0].valid(action)) == bool(nodes[0].valid(action)) for action in range(3)))
+        assert(len(infoset[0].children) == len(nodes[0].children))
+    assert(tree.lazy.nbytes <= tree.lazy.max_bytes)
+
+print('Reading a node builds its children only')
+tree = PublicTree(royal_rules())
+tree.build(lazy=True)
+root = tree.root
+assert(len(tree.lazy) == 0)
+# The deals of the root, then the one deal read
+deal = root.children[0]
+assert(len(tree.lazy) == 2 and type(deal) is LazyActionNode)
+assert(deal.fold_action is None and len(tree.lazy) == 3)
+flop = deal.call_action.call_action
+assert(type(flop) is LazyBoardcardChanceNode and len(tree.lazy) == 4)
+assert(len(flop.children) == 8 and len(tree.lazy) == 5)
+flop.children[3]
+assert(len(tree.lazy) == 6 and (flop, 3) in tree.lazy and (flop, 2) not in tree.lazy)
+assert(flop.children[3] is flop.children[-5] and len(flop.children[2:5]) == 3)
+
+print('Evicted subtrees are built again')
+random.seed(0)
+rules = leduc_rules()
+objects = PublicTree(rules)
+objects.build()
+tree = PublicTree(rules)
+tree.build(lazy=True, max_bytes=20000)
+for _ in range(200):
+    node, lazy = objects.root, tree.root
+    while type(node) is not TerminalNode:
+        i = random.randrange(len(node.children))
+        node, lazy = node.children[i], lazy.children[i]
+        assert(node.bet_history == lazy.bet_history and node.board == lazy.board)
+    assert(lazy.committed == node.committed)
+stats = tree.lazy.stats()
+assert(stats['evictions'] > 0 and stats['bytes'] <= stats['max_bytes'])
+
+print('Leduc CFR regrets match on a lazy tree')
+results = []
+held = []
+for lazy in (False, True):
+    rules = leduc_rules()
+    gc.collect()
+    tracemalloc.start()
+    tree = PublicTree(rules)
+    tree.build(lazy=lazy, max_bytes=20000)
+    cfr = CounterfactualRegretMinimizer(rules, tree)
+    cfr.run(2)
+    results.append(cfr.counterfactual_regret)
+    if lazy:
+        stats = tree.lazy.stats()
+        assert(stats['evictions'] > 0 and stats['bytes'] <= stats['max_bytes'])
+    # The memory the tree holds is what dropping it frees
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    cfr.tree = tree = None
+    gc.collect()
+    held.append(before - tracemalloc.get_traced_memory()[0])
+    tracemalloc.stop()
+assert(set(results[0]) == set(results[1]))
+assert(all(np.array_equal(results[0][infoset], results[1][infoset]) for infoset in results[0]))
+# The lazy tree holds its budget and the player views of its nodes, the Node tree holds every node
+assert(held[1] < held[0] / 3)
+
+try:
+    PublicTree(rules).build(flat=True, lazy=True)
+    assert(False)
+except ValueError:
+    pass
+
+print('All passed!')
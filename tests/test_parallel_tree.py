@@ -0,0 +1,70 @@
+import sys
+import os
+import shutil
+import tempfile
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import *
+from pokercfr import *
+from flattree import *
+import numpy as np
+
+def same_rows(a, b):
+    # Two FlatTrees have the same rows, with the same values, though their tables may be in another order
+    for name in ('kind', 'parent', 'first_child', 'child_count', 'player', 'action', 'action_child', 'todeal', 'deck_mask', 'players_in'):
+        assert(np.array_equal(getattr(a, name), getattr(b, name)))
+    assert(np.array_equal(a.committed_values[a.committed_id], b.committed_values[b.committed_id]))
+    for name, table in (('board', 'boards'), ('holecards', 'holecards'), ('bet_history', 'bet_histories'), ('symmetries', 'symmetries'),
+            ('payoffs', 'payoffs'), ('hands', 'hands')):
+        values = [[getattr(tree, table)[i] if i >= 0 else None for i in getattr(tree, name + '_id').tolist()] for tree in (a, b)]
+        if name == 'hands':
+            values = [[(type(hands), hands.hands) if hands is not None else None for hands in tree_values] for tree_values in values]
+        elif name == 'payoffs':
+            values = [[tuple(payoffs) if payoffs is not None else None for payoffs in tree_values] for tree_values in values]
+        assert(values[0] == values[1])
+    return len(a)
+
+print('Testing parallel tree building')
+
+for name, rules in [('Kuhn', kuhn_rules()), ('Leduc', leduc_rules()), ('Royal', royal_rules()), ('Leduc isomorphic', leduc_rules())]:
+    print('{0} parallel tree matches the flat tree'.format(name))
+    rules.suit_isomorphism = name.endswith('isomorphic')
+    flat = PublicTree(rules)
+    flat.build(flat=True)
+    for processes in (1, 2, 3):
+        tree = PublicTree(rules)
+        tree.build(processes=processes)
+        assert(tree.builder is None and tree.parallel is None)
+        assert(same_rows(flat.flat, tree.flat) == len(flat.flat))
+        assert(set(tree.information_sets) == set(flat.information_sets))
+        # Terminals on a board share its hands, as in a serial build
+        assert(len(tree.flat.hands) == len(flat.flat.hands))
+
+print('Leduc CFR regrets match on the parallel tree')
+results = []
+for processes in (None, 2):
+    cfr = CounterfactualRegretMinimizer(leduc_rules())
+    cfr.tree.build(flat=True, processes=processes)
+    cfr.run(2)
+    results.append(cfr.counterfactual_regret)
+assert(all(np.array_equal(results[0][infoset], results[1][infoset]) for infoset in results[0]))
+
+print('A parallel build saves to the tree cache')
+rules = royal_rules()
+rules.tree_directory = tempfile.mkdtemp()
+try:
+    tree = PublicTree(rules)
+    tree.build(processes=2)
+    cached = PublicTree(rules)
+    cached.build()
+    assert(isinstance(cached.flat.kind, np.memmap) and same_rows(tree.flat, cached.flat) == len(tree.flat))
+finally:
+    shutil.rmtree(rules.tree_directory)
+
+try:
+    PublicTree(leduc_rules()).build(lazy=True, processes=2)
+    assert(False)
+except ValueError:
+    pass
+
+print('All passed!')
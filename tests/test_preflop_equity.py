@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.insert(0,os.path.realpath('.'))
+from preflop_equity import *
+from hand_evaluator import HandEvaluator, HandLengthException
+from card import Card
+from itertools import combinations
+import numpy as np
+
+def all_in_equity(hand, opponent):
+    # Rank both hands on every board that misses them
+    codes = [c.to_code() for c in hand + opponent]
+    deck = [c for c in range(52) if c not in codes]
+    boards = np.array(list(combinations(deck, 5)), np.uint8)
+    ranks = [HandEvaluator.Seven.evaluate_rank_batch(np.column_stack([np.tile(codes[i:i + 2], (len(boards), 1)), boards])) for i in (0, 2)]
+    return (np.sum(ranks[0] < ranks[1]) + 0.5 * np.sum(ranks[0] == ranks[1])) / len(boards)
+
+print('Testing preflop equity')
+
+print('Hand classes')
+counts = np.bincount(HAND_CLASSES, minlength=169)
+assert(sorted(set(counts)) == [4, 6, 12] and counts.sum() == 1326)
+for i in range(1326):
+    hand = [Card.from_code(c) for c in RANGE_CODES_2[i]]
+    assert(PreflopEquity.class_index(hand) == HAND_CLASSES[i] == PreflopEquity.class_index(hand[::-1]))
+assert(CLASS_NAMES[PreflopEquity.class_index([Card(14,1), Card(13,1)])] == 'AKs')
+assert(CLASS_NAMES[PreflopEquity.class_index([Card(2,1), Card(7,2)])] == '72o')
+assert(board_orbits([[0, 4, 8, 12, 16], [0, 5, 10, 15, 16]]).tolist() == [4, 24])
+
+if not os.path.exists(PreflopEquity.hands_path):
+    print('Generating {0}'.format(PreflopEquity.hands_path))
+    PreflopEquity.generate()
+
+print('Equities are exact and sum to 1 across a matchup')
+classes = PreflopEquity.load_classes()
+hands = PreflopEquity.load_hands()
+assert(classes.shape == (169, 169) and hands.shape == (1326, 1326))
+assert(np.allclose(classes + classes.T, 1, atol=1e-6))
+live = ~np.isnan(hands)
+assert(live.sum() == 1326 * comb(50, 2))
+assert(np.allclose((hands + hands.T)[live], 1, atol=1e-6))
+aces = [Card(14,1), Card(14,2)]
+kings = { 2: [Card(13,1), Card(13,2)], 1: [Card(13,1), Card(13,3)], 0: [Card(13,3), Card(13,4)] }
+shared = {}
+for suits, opponent in kings.items():
+    shared[suits] = all_in_equity(aces, opponent)
+    assert(np.isclose(PreflopEquity.hand_equity(aces, opponent), shared[suits], atol=1e-6))
+# Of the 36 AA vs KK matchups, 6 share both suits, 24 one and 6 none
+assert(np.isclose(HandEvaluator.Two.evaluate_equity(aces, kings[0]), (6 * shared[2] + 24 * shared[1] + 6 * shared[0]) / 36, atol=1e-6))
+suited_connectors = [Card(8,1), Card(7,1)]
+overcards = [Card(14,2), Card(13,3)]
+assert(np.isclose(PreflopEquity.hand_equity(suited_connectors, overcards), all_in_equity(suited_connectors, overcards), atol=1e-6))
+assert(np.isnan(PreflopEquity.hand_equity(aces, [Card(14,1), Card(2,2)])))
+
+try:
+    HandEvaluator.Two.evaluate_equity(aces + [Card(2,2)], kings[0])
+    assert(False)
+except HandLengthException:
+    pass
+
+print('All passed!')
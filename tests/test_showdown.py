@@ -0,0 +1,114 @@
+import sys
+import os
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import *
+from pokercfr import *
+from showdown import *
+import numpy as np
+
+def terminals(node):
+    if type(node) is TerminalNode:
+        yield node
+        return
+    for child in node.children:
+        yield from terminals(child)
+
+print('Testing vectorized showdowns')
+
+rng = np.random.RandomState(0)
+for name, rules in [('Kuhn', kuhn_rules()), ('Leduc', leduc_rules()), ('Royal', royal_rules())]:
+    print('{0} fold and showdown terminals match summing every matchup'.format(name))
+    cfr = CounterfactualRegretMinimizer(rules)
+    folds = [t for t in terminals(cfr.tree.root) if t.players_in.count(True) == 1]
+    showdowns = [t for t in terminals(cfr.tree.root) if t.players_in.count(True) == 2]
+    assert(len(folds) > 0 and len(showdowns) > 0)
+    for terminal in folds + showdowns:
+        assert(terminal.hands is not None)
+        for _ in range(3):
+            reachprobs = rng.rand(rules.players, int(range_size(rules)))
+            assert(np.allclose(cfr.cfr_terminal_node(terminal, reachprobs), cfr.cfr_matchup_terminal_node(terminal, reachprobs)))
+            reach = [{ hc: reachprobs[player, cards_to_range_index(rules, hc)] for hc in terminal.holecards[player] } for player in range(rules.players)]
+            vectorized = cfr.profile.ev_terminal_node(terminal, reach)
+            matchups = cfr.profile.ev_matchup_terminal_node(terminal, reach)
+            for player in range(rules.players):
+                assert(set(vectorized[player]) == set(matchups[player]))
+                assert(all(np.isclose(float(vectorized[player][hc]), float(matchups[player][hc])) for hc in matchups[player]))
+
+print('Leduc CFR regrets match with and without the vectorized terminals')
+results = []
+for vectorized in (True, False):
+    cfr = CounterfactualRegretMinimizer(leduc_rules())
+    if not vectorized:
+        cfr.cfr_terminal_node = cfr.cfr_matchup_terminal_node
+    cfr.run(5)
+    results.append(cfr.counterfactual_regret)
+for infoset in results[0]:
+    assert(np.allclose(results[0][infoset], results[1][infoset]))
+
+print('Leduc expected values and best responses match with and without the vectorized terminals')
+results = []
+for vectorized in (True, False):
+    s0 = Strategy(0)
+    s0.load_from_file('strategies/leduc/0.strat')
+    s1 = Strategy(1)
+    s1.load_from_file('strategies/leduc/1.strat')
+    profile = StrategyProfile(leduc_rules(), [s0, s1])
+    profile.gametree = PublicTree(profile.rules)
+    profile.gametree.build()
+    profile.publictree = profile.gametree
+    if not vectorized:
+        profile.ev_terminal_node = profile.ev_matchup_terminal_node
+    results.append(np.array([profile.expected_value(), profile.best_response()[1]], np.float64))
+assert(np.allclose(results[0], results[1]))
+
+print('Leduc terminals share their hands and compute payoffs from them')
+rules = leduc_rules()
+tree = PublicTree(rules)
+tree.build()
+for terminal in terminals(tree.root):
+    assert(terminal.stored_payoffs is None)
+    shared = tree.board_hands if terminal.players_in.count(True) == 1 else tree.showdown_rankings
+    assert(terminal.hands is shared[terminal.board])
+    # A fold and the call that ends the round share the cards of the node before them
+    if terminal.parent.fold_action and type(terminal.parent.call_action) is TerminalNode:
+        assert(terminal.parent.fold_action.holecards is terminal.parent.call_action.holecards)
+    for matchup, payoffs in terminal.payoffs.items():
+        assert(not overlap(matchup[0], matchup[1]))
+        assert(sum(payoffs) == 0)
+        if terminal.players_in.count(True) == 2:
+            scores = [rules.handeval(hc, terminal.board) for hc in matchup]
+            winnings = [sum(terminal.committed) * (s == max(scores)) / float(scores.count(max(scores))) for s in scores]
+            assert(payoffs == [w - c for w, c in zip(winnings, terminal.committed)])
+
+print('Two card hands')
+# Hold'em hands on a board, with ties, against the matchup sums done by hand
+board = (Card(14,1), Card(13,1), Card(12,1), Card(11,1), Card(10,2))
+hands = [hc for hc in combinations([Card(r, s) for r in range(2, 15) for s in range(1, 5)], 2) if not overlap(hc, board)]
+hands = [hands[i] for i in rng.choice(len(hands), 60, replace=False)]
+scores = np.zeros(1326)
+for hc in hands:
+    scores[cards_to_range_index(None, hc)] = rng.randint(5)
+ranking = ShowdownRanking(None, hands, scores)
+reachprobs = rng.rand(2, 1326)
+committed = [3, 5]
+payoffs = showdown_payoffs(ranking, reachprobs, committed, 1326)
+for player in range(2):
+    for hc in hands:
+        i = cards_to_range_index(None, hc)
+        total = 0.0
+        count = 0
+        for opp in hands:
+            if overlap(hc, opp):
+                continue
+            j = cards_to_range_index(None, opp)
+            winnings = -committed[player]
+            if scores[i] > scores[j]:
+                winnings += sum(committed)
+            elif scores[i] == scores[j]:
+                winnings += sum(committed) / 2.0
+            total += reachprobs[1 - player, j] * winnings
+            count += 1
+        assert(np.isclose(payoffs[player, i], total / count))
+
+print('All passed!')
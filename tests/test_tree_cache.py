@@ -0,0 +1,99 @@
+import sys
+import os
+import shutil
+import tempfile
+sys.path.insert(0,os.path.realpath('.'))
+from pokertrees import *
+from pokergames import *
+from pokercfr import *
+from flattree import *
+import numpy as np
+
+def same_trees(a, b):
+    # Every array and table of two FlatTrees holds the same values
+    for name in NODE_ARRAYS:
+        assert(np.array_equal(getattr(a, name), getattr(b, name)) and getattr(a, name).dtype == getattr(b, name).dtype)
+    assert(a.boards == b.boards and a.holecards == b.holecards and a.bet_histories == b.bet_histories)
+    assert(a.symmetries == b.symmetries and np.array_equal(a.payoffs, b.payoffs))
+    for x, y in zip(a.hands, b.hands):
+        assert(type(x) is type(y) and x.hands == y.hands and np.array_equal(x.indexes, y.indexes))
+        if isinstance(x, ShowdownRanking):
+            assert(np.array_equal(x.scores, y.scores) and x.scores.dtype == y.scores.dtype)
+    return len(a.hands) == len(b.hands)
+
+print('Testing tree serialization')
+
+directory = tempfile.mkdtemp()
+try:
+    for name, rules in [('Kuhn', kuhn_rules()), ('Leduc', leduc_rules()), ('Royal', royal_rules()), ('Leduc isomorphic', leduc_rules())]:
+        print('{0} tree loads as it was saved'.format(name))
+        rules.suit_isomorphism = name.endswith('isomorphic')
+        tree = PublicTree(rules)
+        tree.build(flat=True)
+        path = os.path.join(directory, name)
+        tree.save(path)
+        for mmap in (True, False):
+            loaded = PublicTree(rules)
+            loaded.load(path, mmap)
+            assert(same_trees(tree.flat, loaded.flat))
+            assert(isinstance(loaded.flat.kind, np.memmap) == mmap)
+            assert(set(loaded.information_sets) == set(tree.information_sets))
+
+    print('Trees only load with the rules they were saved with')
+    path = os.path.join(directory, 'Leduc')
+    higher_ante = leduc_rules()
+    higher_ante.ante = 2
+    for rules in (royal_rules(), higher_ante):
+        try:
+            PublicTree(rules).load(path)
+            assert(False)
+        except ValueError:
+            pass
+    with open(os.path.join(directory, 'other'), 'wb') as f:
+        f.write(b'not a tree')
+    try:
+        PublicTree(leduc_rules()).load(os.path.join(directory, 'other'))
+        assert(False)
+    except ValueError:
+        pass
+    try:
+        PublicTree(leduc_rules()).save(path)
+        assert(False)
+    except ValueError:
+        pass
+    assert(tree_key(PublicTree(leduc_rules())) != tree_key(GameTree(leduc_rules())))
+
+    print('The tree cache builds a tree once and loads it after')
+    cache_directory = os.path.join(directory, 'trees')
+    rules = leduc_rules()
+    rules.tree_directory = cache_directory
+    first = PublicTree(rules)
+    first.build()
+    assert(first.flat is not None and os.listdir(cache_directory) == [tree_key(first) + '.tree'])
+    second = PublicTree(rules)
+    second.build()
+    assert(isinstance(second.flat.kind, np.memmap) and same_trees(first.flat, second.flat))
+    # A tree written by another format version is rebuilt
+    cache = TreeCache(cache_directory)
+    with open(cache.path(first), 'r+b') as f:
+        f.seek(len(FORMAT_MAGIC))
+        f.write(b'\xff')
+    assert(cache.load(first) is None)
+    third = PublicTree(rules)
+    third.build()
+    assert(cache.load(third) is not None)
+
+    print('Leduc CFR regrets match on a cached tree')
+    results = []
+    for tree_directory in (None, cache_directory):
+        rules = leduc_rules()
+        rules.tree_directory = tree_directory
+        cfr = CounterfactualRegretMinimizer(rules)
+        cfr.run(2)
+        results.append(cfr.counterfactual_regret)
+    assert(set(results[0]) == set(results[1]))
+    assert(all(np.array_equal(results[0][infoset], results[1][infoset]) for infoset in results[0]))
+finally:
+    shutil.rmtree(directory)
+
+print('All passed!')